@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""
+Loopback vs HTTP for A2A messages between agents in one process.
+
+Serves an echo agent (no LLM) with uvicorn on a free local port and sends
+the same messages to it over HTTP (pooled client) and through the
+in-process loopback transport.
+
+    python benchmarks/bench_loopback.py [--messages 500] [--size 200]
+"""
+
+import os
+import time
+import socket
+import asyncio
+import argparse
+import statistics
+
+import uvicorn
+
+from agentbeats.agent_executor import BeatsAgent
+from agentbeats.utils.agents import send_message_to_agent, get_a2a_client_manager
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _echo_agent(port: int) -> BeatsAgent:
+    agent = BeatsAgent("bench", "127.0.0.1", port, "openai", "o4-mini")
+    agent.agent_card_json = {
+        "name": "Echo Agent",
+        "description": "Echoes its input.",
+        "url": f"http://127.0.0.1:{port}/",
+        "version": "1.0.0",
+        "defaultInputModes": ["text"],
+        "defaultOutputModes": ["text"],
+        "capabilities": {"streaming": True},
+        "skills": [],
+    }
+    agent._make_app()
+
+    async def _echo(context):
+        return context.get_user_input()
+
+    agent.request_handler.agent_executor.invoke_agent = _echo
+    return agent
+
+
+async def _measure(url: str, payload: str, count: int) -> list:
+    await send_message_to_agent(url, payload)       # warm-up (card fetch, connect)
+    latencies = []
+    for _ in range(count):
+        start = time.perf_counter()
+        await send_message_to_agent(url, payload)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def _report(name: str, latencies: list) -> None:
+    total = sum(latencies)
+    p99 = sorted(latencies)[int(len(latencies) * 0.99) - 1]
+    print(f"{name:10s} {len(latencies) / total:9.0f} msg/s   "
+          f"p50 {statistics.median(latencies) * 1000:7.3f} ms   p99 {p99 * 1000:7.3f} ms")
+
+
+async def main(messages: int, size: int) -> None:
+    port = _free_port()
+    agent = _echo_agent(port)
+    server = uvicorn.Server(uvicorn.Config(agent.get_app(), host="127.0.0.1",
+                                           port=port, log_level="warning"))
+    serve_task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+
+    url = f"http://127.0.0.1:{port}"
+    payload = "x" * size
+    try:
+        os.environ["AGENTBEATS_DISABLE_LOOPBACK"] = "1"
+        http = await _measure(url, payload, messages)
+        os.environ.pop("AGENTBEATS_DISABLE_LOOPBACK")
+        loopback = await _measure(url, payload, messages)
+    finally:
+        server.should_exit = True
+        await serve_task
+        await get_a2a_client_manager().close()
+
+    print(f"{messages} sequential messages, {size}-byte payload")
+    _report("http", http)
+    _report("loopback", loopback)
+    print(f"speedup    {statistics.median(http) / statistics.median(loopback):.1f}x (p50)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--messages", type=int, default=500)
+    parser.add_argument("--size", type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(main(args.messages, args.size))
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""
+Streaming vs non-streaming (short=True) A2A sends for small exchanges.
+
+Serves an echo agent (no LLM) with uvicorn on a free local port and sends
+the same short messages to it over HTTP, once through the SSE streaming
+path and once as a single message/send round trip.
+
+    python benchmarks/bench_short_path.py [--messages 500] [--size 64]
+"""
+
+import os
+import time
+import asyncio
+import argparse
+import statistics
+
+import uvicorn
+
+from agentbeats.utils.agents import send_message_to_agent, get_a2a_client_manager
+
+from bench_loopback import _echo_agent, _free_port, _report
+
+
+async def _measure(url: str, payload: str, count: int, short: bool) -> list:
+    await send_message_to_agent(url, payload, short=short)     # warm-up
+    latencies = []
+    for _ in range(count):
+        start = time.perf_counter()
+        await send_message_to_agent(url, payload, short=short)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+async def main(messages: int, size: int) -> None:
+    port = _free_port()
+    agent = _echo_agent(port)
+    server = uvicorn.Server(uvicorn.Config(agent.get_app(), host="127.0.0.1",
+                                           port=port, log_level="warning"))
+    serve_task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+
+    url = f"http://127.0.0.1:{port}"
+    payload = "x" * size
+    os.environ["AGENTBEATS_DISABLE_LOOPBACK"] = "1"     # measure the HTTP paths
+    try:
+        streaming = await _measure(url, payload, messages, short=False)
+        short = await _measure(url, payload, messages, short=True)
+    finally:
+        os.environ.pop("AGENTBEATS_DISABLE_LOOPBACK")
+        server.should_exit = True
+        await serve_task
+        await get_a2a_client_manager().close()
+
+    print(f"{messages} sequential messages, {size}-byte payload")
+    _report("streaming", streaming)
+    _report("short", short)
+    print(f"speedup    {statistics.median(streaming) / statistics.median(short):.1f}x (p50)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--messages", type=int, default=500)
+    parser.add_argument("--size", type=int, default=64)
+    args = parser.parse_args()
+    asyncio.run(main(args.messages, args.size))
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""
+SSH command, transfer and password-check throughput against LocalSSHServer.
+
+Runs entirely offline: an in-process paramiko SSH server with an artificial
+round-trip latency stands in for the arena container.
+
+    python benchmarks/bench_ssh.py [--latency 0.01] [--commands 50]
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+from agentbeats.utils.commands import SSHClient, SSHConnectionPool, check_passwords
+
+# the server is test scaffolding, not part of the package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from tests.ssh_server import LocalSSHServer  # noqa: E402
+
+
+def _timed(func) -> float:
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def _report(name: str, count: int, seconds: float, unit: str = "cmd") -> None:
+    print(f"{name:28s} {count / seconds:9.0f} {unit}/s   {seconds / count * 1000:8.2f} ms/{unit}")
+
+
+def main(latency: float, commands: int) -> None:
+    pool = SSHConnectionPool()
+    with tempfile.TemporaryDirectory() as tmp, \
+            LocalSSHServer(tmp, credentials={"root": "toor"}, local_shell=True, latency=latency,
+                           max_auth_tries=6) as server:
+        ssh = SSHClient(server.host, server.client_credentials(), pool=pool)
+        connect = _timed(ssh.connect)
+        print(f"latency {latency * 1000:.0f} ms per round trip; connect + auth {connect * 1000:.1f} ms")
+
+        probe = "echo ok"
+        _report("execute (channel per cmd)", commands,
+                _timed(lambda: [ssh.execute(probe) for _ in range(commands)]))
+        _report("run_in_shell (persistent)", commands,
+                _timed(lambda: [ssh.run_in_shell(probe) for _ in range(commands)]))
+        _report("execute_many script", commands,
+                _timed(lambda: ssh.execute_many([probe] * commands)))
+        _report("execute_many parallel", commands,
+                _timed(lambda: ssh.execute_many([probe] * commands, mode="parallel")))
+
+        data = os.urandom(4 * 1024 * 1024)
+        path = "payload.bin"
+        mib = len(data) / (1024 * 1024)
+        first = _timed(lambda: ssh.upload_bytes(data, path))
+        again = _timed(lambda: ssh.upload_bytes(data, path))
+        fetch = _timed(lambda: ssh.download_bytes(path))
+        print(f"{'upload 4 MiB':28s} {mib / first:9.1f} MiB/s")
+        print(f"{'upload unchanged (skipped)':28s} {again * 1000:9.1f} ms")
+        print(f"{'download 4 MiB':28s} {mib / fetch:9.1f} MiB/s")
+
+        candidates = [f"wrong{i}" for i in range(39)] + ["toor"]
+        rates = []
+        for workers in (1, 4):
+            result = check_passwords(server.host, "root", candidates, port=server.port,
+                                     workers=workers)
+            assert result.password == "toor"
+            rates.append(result.attempts_per_second)
+            print(f"{f'check_passwords x{workers}':28s} {result.attempts_per_second:9.0f} "
+                  f"tries/s   {result.connections} connections")
+        print(f"password check speedup {rates[1] / rates[0]:.1f}x")
+        pool.close_all()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--latency", type=float, default=0.01)
+    parser.add_argument("--commands", type=int, default=50)
+    args = parser.parse_args()
+    main(args.latency, args.commands)
@@ -1,22 +1,65 @@
 # -*- coding: utf-8 -*-
 
-from .agent_executor import *
-from .agent_launcher import *
-from .utils.agents import (
-    create_a2a_client, send_message_to_agent, send_message_to_agents, send_messages_to_agents
-)
-from .utils.environment import (
-    setup_container, cleanup_container, check_container_health
-)
-from .utils.commands import (
-    SSHClient, create_ssh_connect_tool
-)
-from .logging import (
-    BattleContext, log_ready, log_error, log_startup, log_shutdown,
-    record_battle_event, record_battle_result, record_agent_action
-)
+import importlib
+import contextlib
+import contextvars
+
+# Public names are resolved on first access, so that `import agentbeats`
+# (done by every tools.py) does not pull in openai-agents, a2a, FastAPI or
+# paramiko until they are actually used.
+_SUBMODULES = ("agent_executor", "agent_launcher", "cache", "cli", "logging",
+               "multi_agent", "resource_limits", "startup_profiler", "utils")
+_LAZY_ATTRS = {
+    # agent_executor / agent_launcher
+    "BeatsAgent":               ".agent_executor",
+    "AgentBeatsExecutor":       ".agent_executor",
+    "BeatsAgentLauncher":       ".agent_launcher",
+    # utils
+    "create_a2a_client":        ".utils.agents",
+    "send_message_to_agent":    ".utils.agents",
+    "send_message_to_agents":   ".utils.agents",
+    "send_messages_to_agents":  ".utils.agents",
+    "setup_container":          ".utils.environment",
+    "cleanup_container":        ".utils.environment",
+    "check_container_health":   ".utils.environment",
+    "SSHClient":                ".utils.commands",
+    "create_ssh_connect_tool":  ".utils.commands",
+    # logging
+    "BattleContext":            ".logging",
+    "log_ready":                ".logging",
+    "log_error":                ".logging",
+    "log_startup":              ".logging",
+    "log_shutdown":             ".logging",
+    "record_battle_event":      ".logging",
+    "record_battle_result":     ".logging",
+    "record_agent_action":      ".logging",
+}
+
+__all__ = [*_LAZY_ATTRS, "tool", "get_registered_tools", "tool_registry_scope"]
+
+
+def __getattr__(name):
+    if name in _SUBMODULES:
+        return importlib.import_module(f".{name}", __name__)
+    module_name = _LAZY_ATTRS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    globals()[name] = value     # cache, so __getattr__ runs once per name
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_ATTRS) | set(_SUBMODULES))
+
 
 _TOOL_REGISTRY = [] # global register for tools
+# registry used instead of _TOOL_REGISTRY inside tool_registry_scope()
+_scoped_registry = contextvars.ContextVar("agentbeats_tool_registry", default=None)
+
+def _current_registry():
+    registry = _scoped_registry.get()
+    return _TOOL_REGISTRY if registry is None else registry
 
 def tool(func=None):
     """
@@ -25,7 +68,7 @@ def tool(func=None):
     This function can be used to register any callable that should be treated as a tool.
     """
     def _decorator(func):
-        _TOOL_REGISTRY.append(func)
+        _current_registry().append(func)
         return func
 
     if func is not None and callable(func):
@@ -34,4 +77,18 @@ def tool(func=None):
     return _decorator
 
 def get_registered_tools():
-    return list(_TOOL_REGISTRY)
+    return list(_current_registry())
+
+@contextlib.contextmanager
+def tool_registry_scope(registry=None):
+    """
+    Usage: with agentbeats.tool_registry_scope() as tools: ...
+    Collect @agentbeats.tool registrations made inside the block into a
+    separate list, so several agents can be loaded in one process.
+    """
+    registry = [] if registry is None else registry
+    token = _scoped_registry.set(registry)
+    try:
+        yield registry
+    finally:
+        _scoped_registry.reset(token)
@@ -7,12 +7,15 @@ AgentBeats SDK implementation for the AgentBeats platform.
 import tomllib
 import uvicorn
 import os
-from typing import Dict, List, Any, Optional, Callable
+import httpx
+import asyncio
+from uuid import uuid4
+from collections import OrderedDict
+from typing import Dict, List, Any, Optional, Callable, Tuple
 
 from agents import (
     Agent, 
     Runner, 
-    function_tool, 
     Model, 
     ModelProvider, 
     OpenAIChatCompletionsModel, 
@@ -22,18 +25,45 @@ from agents.mcp import MCPServerSse
 from openai import AsyncOpenAI
 
 from a2a.server.apps import A2AStarletteApplication
-from a2a.server.tasks import TaskUpdater, InMemoryTaskStore
+from a2a.server.tasks import (
+    TaskUpdater,
+    InMemoryTaskStore,
+    InMemoryPushNotificationConfigStore,
+    BasePushNotificationSender,
+)
 from a2a.server.agent_execution import AgentExecutor, RequestContext
 from a2a.server.request_handlers import DefaultRequestHandler
 from a2a.server.events import EventQueue
 from a2a.utils import new_task, new_agent_text_message
-from a2a.types import Part, TextPart, TaskState, AgentCard
+from a2a.types import Part, TextPart, TaskState, AgentCard, TaskNotCancelableError
+from a2a.utils.errors import ServerError
+
+from .cache import cached_function_tool
+from .utils.agents.a2a import SHORT_REPLY_METADATA_KEY
+from .utils.agents.artifacts import ARTIFACTS_PATH, ArtifactStore, truncate_text
+from .utils.agents.card_cache import AgentCardETag
+from .utils.agents.compression import CompressionMiddleware
+from .utils.agents.loopback import (
+    LoopbackLifespan, register_local_agent, unregister_local_agent,
+)
 
 __all__ = [
     "BeatsAgent",
     "AgentBeatsExecutor",
+    "AgentBeatsRequestHandler",
 ]
 
+# Model API clients shared by every agent in the process, one per endpoint,
+# so co-hosted agents (agentbeats run_many) reuse one connection pool.
+_model_clients: Dict[tuple, AsyncOpenAI] = {}
+
+
+def _shared_model_client(base_url: str, api_key: str) -> AsyncOpenAI:
+    key = (base_url, api_key)
+    if key not in _model_clients:
+        _model_clients[key] = AsyncOpenAI(base_url=base_url, api_key=api_key)
+    return _model_clients[key]
+
 
 def create_agent(
         agent_name: str,
@@ -69,8 +99,8 @@ def create_agent(
         print("[AgentBeats] Using OpenRouter model:", model_name)
         set_tracing_disabled(True)  # Disable tracing for OpenRouter models
         os.environ["OPENAI_TRACING_V2"] = "false"
-        openrouter_client = AsyncOpenAI(base_url="https://openrouter.ai/api/v1", 
-                                        api_key=OPENROUTER_API_KEY)
+        openrouter_client = _shared_model_client("https://openrouter.ai/api/v1", 
+                                                 OPENROUTER_API_KEY)
         openrouter_model_provider = OpenRouterModelProvider()
         return Agent(**agent_args, model=openrouter_model_provider.get_model(model_name, openrouter_client))
 
@@ -88,6 +118,42 @@ class OpenRouterModelProvider(ModelProvider):
         )
 
 
+class AgentBeatsRequestHandler(DefaultRequestHandler):
+    """
+    DefaultRequestHandler that honours `blocking: false` on message/send: the
+    task is returned as soon as it is created, the turn keeps running in the
+    background and every state change, including the final result, is pushed
+    to the caller's webhook (pushNotificationConfig).
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._background_runs: set = set()
+
+    async def on_message_send(self, params, context=None):
+        config = params.configuration
+        if config is None or config.blocking is not False:
+            return await super().on_message_send(params, context)
+
+        events = super().on_message_send_stream(params, context)
+        first = await events.__anext__()
+        run = asyncio.create_task(self._drain(events))
+        self._background_runs.add(run)
+        run.add_done_callback(self._background_runs.discard)
+        return first
+
+    @staticmethod
+    async def _drain(events) -> None:
+        # on_message_send_stream sends a push notification for every event
+        try:
+            async for _ in events:
+                pass
+        except asyncio.CancelledError:
+            pass        # task cancelled through tasks/cancel
+        except Exception as e:
+            print(f"[AgentBeats] Background task failed: {type(e).__name__}: {e}")
+
+
 class BeatsAgent:
     def __init__(self, 
                  name: str, 
@@ -105,6 +171,13 @@ class BeatsAgent:
         self.mcp_url_list: List[str] = []
         self.agent_card_json = None
         self.app = None
+        self.request_handler = None
+
+        # payload limits, applied by _make_app (None: unlimited)
+        self.max_request_size: Optional[int] = 16 * 1024 * 1024
+        self.max_artifact_bytes: Optional[int] = None
+        self.compression_min_size = 1024
+        self.artifact_store = ArtifactStore()
     
     def load_agent_card(self, card_path: str):
         """Load agent card from a TOML file."""
@@ -138,19 +211,53 @@ class BeatsAgent:
     
     def _make_app(self) -> None:
         """Asynchronously create the application instance for the agent."""
-        self.app = A2AStarletteApplication(
-            agent_card=AgentCard(**self.agent_card_json),
-            http_handler=DefaultRequestHandler(
-                agent_executor=AgentBeatsExecutor(
-                    agent_card_json=self.agent_card_json,
-                    model_type=self.model_type,
-                    model_name=self.model_name,
-                    mcp_url_list=self.mcp_url_list,
-                    tool_list=self.tool_list,
-                ),
-                task_store=InMemoryTaskStore(),
+        push_config_store = InMemoryPushNotificationConfigStore()
+        # closed by _shutdown() once the server stops
+        self._push_client = httpx.AsyncClient(timeout=10)
+        self.request_handler = AgentBeatsRequestHandler(
+            agent_executor=AgentBeatsExecutor(
+                agent_card_json=self.agent_card_json,
+                model_type=self.model_type,
+                model_name=self.model_name,
+                mcp_url_list=self.mcp_url_list,
+                tool_list=self.tool_list,
+                max_artifact_bytes=self.max_artifact_bytes,
+                artifact_store=self.artifact_store,
             ),
+            task_store=InMemoryTaskStore(),
+            push_config_store=push_config_store,
+            push_sender=BasePushNotificationSender(self._push_client,
+                                                   push_config_store),
+        )
+        agent_card = AgentCard(**self.agent_card_json)
+        if agent_card.capabilities.push_notifications is None:
+            agent_card.capabilities.push_notifications = True
+        app = A2AStarletteApplication(
+            agent_card=agent_card,
+            http_handler=self.request_handler,
         ).build()
+        # full texts of truncated artifacts
+        app.add_route(ARTIFACTS_PATH + "/{artifact_id}", self.artifact_store.endpoint,
+                      methods=["GET"])
+        # card responses carry an ETag so clients can revalidate them cheaply
+        app = CompressionMiddleware(AgentCardETag(app),
+                                    minimum_size=self.compression_min_size,
+                                    max_request_size=self.max_request_size)
+        # while served, in-process callers reach this agent without HTTP
+        self.app = LoopbackLifespan(app, self)
+
+    def _register_loopback(self, mount_path: str = "") -> None:
+        """Register the running agent for in-process (loopback) A2A calls."""
+        register_local_agent(
+            [self.agent_card_json.get("url", ""),
+             f"http://{self.agent_host}:{self.agent_port}{mount_path}"],
+            self.request_handler,
+        )
+
+    async def _shutdown(self) -> None:
+        """Unregister the stopped agent and close its push notification client."""
+        unregister_local_agent(self.request_handler)
+        await self._push_client.aclose()
 
     def tool(self, name: str = None):
         """Decorator to register a function as a tool for the agent."""
@@ -160,7 +267,8 @@ class BeatsAgent:
             
             # Apply the @function_tool decorator from agents library
             # This creates the proper tool format for openai-agents
-            tool_func = function_tool(name_override=tool_name)(func)
+            # (schema is cached on disk, keyed by the tool's source)
+            tool_func = cached_function_tool(func, name_override=tool_name)
             
             # Add to the tool list
             self.tool_list.append(tool_func)
@@ -170,23 +278,39 @@ class BeatsAgent:
 
     def register_tool(self, func: Callable, *, name: str | None = None):
         tool_name = name or func.__name__
-        wrapped_tool = function_tool(name_override=tool_name)(func)
+        wrapped_tool = cached_function_tool(func, name_override=tool_name)
         self.tool_list.append(wrapped_tool)
         return wrapped_tool
 
 
+_TERMINAL_STATES = (TaskState.completed, TaskState.canceled,
+                    TaskState.failed, TaskState.rejected)
+
+
+def _wants_short_reply(context: RequestContext) -> bool:
+    metadata = context.message.metadata if context.message else None
+    return bool(metadata and metadata.get(SHORT_REPLY_METADATA_KEY))
+
+
 class AgentBeatsExecutor(AgentExecutor):
     def __init__(self, agent_card_json: Dict[str, Any], 
                         model_type: str,
                         model_name: str,
                         mcp_url_list: Optional[List[str]] = None, 
-                        tool_list: Optional[List[Any]] = None):
+                        tool_list: Optional[List[Any]] = None,
+                        max_artifact_bytes: Optional[int] = None,
+                        artifact_store: Optional[ArtifactStore] = None,
+                        max_conversations: int = 256):
         """ (Shouldn't be called directly) 
             Initialize the AgentBeatsExecutor with the MCP URL and agent card JSON. """
         self.agent_card_json = agent_card_json
         self.model_type = model_type
         self.model_name = model_name
-        self.chat_history: List[Dict[str, str]] = []
+
+        # contextId -> chat history of that conversation; the least recently
+        # used one is dropped beyond max_conversations
+        self.chat_histories: "OrderedDict[str, List[Dict[str, Any]]]" = OrderedDict()
+        self.max_conversations = max_conversations
 
         self.mcp_url_list = mcp_url_list or []
         self.mcp_list = [MCPServerSse(params={"url": url}) 
@@ -201,6 +325,25 @@ class AgentBeatsExecutor(AgentExecutor):
 
         self.main_agent = None
 
+        # task id -> asyncio task running execute(), for cancel()
+        self._running_tasks: Dict[str, asyncio.Task] = {}
+
+        # replies above max_artifact_bytes are truncated, the full text is
+        # kept in artifact_store and served under <card url>/artifacts/<id>
+        self.max_artifact_bytes = max_artifact_bytes
+        self.artifact_store = artifact_store or ArtifactStore()
+
+    def _limit_reply(self, reply_text: str) -> Tuple[str, Optional[str], Optional[Dict[str, Any]]]:
+        """Return (text, artifact_id, metadata), truncating replies over max_artifact_bytes."""
+        if self.max_artifact_bytes is None or len(reply_text.encode()) <= self.max_artifact_bytes:
+            return reply_text, None, None
+        artifact_id = uuid4().hex
+        self.artifact_store.put(artifact_id, reply_text)
+        base_url = str(self.agent_card_json.get("url", "")).rstrip("/")
+        text, metadata = truncate_text(reply_text, self.max_artifact_bytes,
+                                       f"{base_url}{ARTIFACTS_PATH}/{artifact_id}")
+        return text, artifact_id, metadata
+
     async def _init_agent_and_mcp(self):
         """Initialize the main agent with the provided tools and MCP servers."""
         for mcp_server in self.mcp_list:
@@ -230,14 +373,18 @@ class AgentBeatsExecutor(AgentExecutor):
         # print agent input
         print(f"[AgentBeatsExecutor] Agent input: {context.get_user_input()}")
 
-        # Build contextual chat input for the runner
-        query_ctx = self.chat_history + [{
+        # Build contextual chat input for the runner, from this conversation only
+        context_id = context.context_id or ""
+        query_ctx = self.chat_histories.get(context_id, []) + [{
             "content": context.get_user_input(),
             "role": "user",
         }]
 
         result = await Runner.run(self.main_agent, query_ctx, max_turns=30)
-        self.chat_history = result.to_input_list()
+        self.chat_histories[context_id] = result.to_input_list()
+        self.chat_histories.move_to_end(context_id)
+        while len(self.chat_histories) > self.max_conversations:
+            self.chat_histories.popitem(last=False)
 
         # print agent output
         print(f"[AgentBeatsExecutor] Agent output: {result.final_output}")
@@ -249,6 +396,15 @@ class AgentBeatsExecutor(AgentExecutor):
         context: RequestContext,
         event_queue: EventQueue,
     ) -> None:
+        # short exchange (e.g. a flag submission): answer with one Message,
+        # no task, status updates or artifacts
+        if context.current_task is None and _wants_short_reply(context):
+            reply_text, _, metadata = self._limit_reply(await self.invoke_agent(context))
+            message = new_agent_text_message(reply_text, context.context_id)
+            message.metadata = metadata
+            await event_queue.enqueue_event(message)
+            return
+
         # make / get current task
         task = context.current_task
         if task is None: # first chat
@@ -256,27 +412,49 @@ class AgentBeatsExecutor(AgentExecutor):
             await event_queue.enqueue_event(task)
         updater = TaskUpdater(event_queue, task.id, task.contextId)
 
-        # push "working now" status
-        await updater.update_status(
-            TaskState.working,
-            new_agent_text_message("working...", task.contextId, task.id),
-        )
-
-        # await llm response
-        reply_text = await self.invoke_agent(context)
-
-        # push final response
-        await updater.add_artifact(
-            [Part(root=TextPart(text=reply_text))],
-            name="response",
-        )
-        await updater.complete()
+        self._running_tasks[task.id] = asyncio.current_task()
+        try:
+            # push "working now" status
+            await updater.update_status(
+                TaskState.working,
+                new_agent_text_message("working...", task.contextId, task.id),
+            )
+
+            # await llm response
+            reply_text, artifact_id, metadata = self._limit_reply(
+                await self.invoke_agent(context))
+
+            # push final response
+            await updater.add_artifact(
+                [Part(root=TextPart(text=reply_text))],
+                artifact_id=artifact_id,
+                name="response",
+                metadata=metadata,
+            )
+            await updater.complete()
+        except asyncio.CancelledError:
+            # publish on this task's own queue so open message/stream
+            # consumers (and the cancel request's tap) see the final state
+            await updater.cancel()
+            raise
+        finally:
+            self._running_tasks.pop(task.id, None)
 
     async def cancel(
         self, context: RequestContext, event_queue: EventQueue
     ) -> None:
-        """Cancel the current task (not implemented yet)."""
-        raise NotImplementedError("cancel not supported")
+        """Cancel a running task: stop its agent run and publish the canceled state."""
+        task = context.current_task
+        if task is not None and task.status.state in _TERMINAL_STATES:
+            raise ServerError(error=TaskNotCancelableError())
+
+        running = self._running_tasks.pop(context.task_id, None)
+        if running is not None and not running.done():
+            running.cancel()        # execute() publishes the canceled state
+            return
+
+        updater = TaskUpdater(event_queue, context.task_id, context.context_id)
+        await updater.cancel()
 
     async def cleanup(self) -> None:
         """Clean up MCP connections."""
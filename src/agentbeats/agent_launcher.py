@@ -13,6 +13,8 @@ from typing import List, Optional
 from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
 
+from .resource_limits import AgentResourceLimits, AgentResourceGuard
+
 __all__ = ["BeatsAgentLauncher"]
 
 
@@ -52,6 +54,7 @@ class BeatsAgentLauncher:
         mcp_list: List[str],
         tool_list: List[str],
         backend_url: str,
+        resource_limits: Optional[AgentResourceLimits] = None,
     ) -> None:
         # agent settings
         self.agent_card = Path(agent_card).expanduser().resolve()
@@ -71,10 +74,21 @@ class BeatsAgentLauncher:
         self.model_type = model_type
         self.model_name = model_name
 
+        # agent resource limits (None means unlimited)
+        self.resource_limits = resource_limits
+        self._resource_guard: Optional[AgentResourceGuard] = None
+        if resource_limits and not resource_limits.is_empty():
+            self._resource_guard = AgentResourceGuard(str(agent_port), resource_limits)
+            for warning in self._resource_guard.warnings:
+                print(f"[Launcher] WARN {warning}")
+
         # runtime
         self._app: Optional[FastAPI] = None
         self._agent_proc: Optional[subprocess.Popen] = None
         self._state_lock = asyncio.Lock()
+        self._agent_started_at: Optional[float] = None
+        self._restart_count = 0
+        self._last_exit_code: Optional[int] = None
 
     def _agent_cmd(self) -> List[str]:
         """
@@ -101,16 +115,43 @@ class BeatsAgentLauncher:
 
     def _start_agent(self) -> subprocess.Popen:
         print("[Launcher] Starting agent with command:", " ".join(self._agent_cmd()))
-        return subprocess.Popen(self._agent_cmd())
+        self._agent_started_at = time.time()
+        if self._resource_guard is None:
+            return subprocess.Popen(self._agent_cmd())
+
+        print("[Launcher] Applying resource limits via "
+              f"{self._resource_guard.mechanism}: {self.resource_limits.to_dict()}")
+        proc = subprocess.Popen(self._agent_cmd(),
+                                preexec_fn=self._resource_guard.preexec_fn())
+        if not self._resource_guard.confirm_cgroup(proc.pid):
+            print(f"[Launcher] WARN {self._resource_guard.warnings[-1]}")
+        return proc
 
     def _terminate_agent(self) -> None:
-        if self._agent_proc and self._agent_proc.poll() is None:
+        if self._agent_proc is None:
+            return
+        if self._agent_proc.poll() is None:
             self._agent_proc.terminate()
             try:
                 self._agent_proc.wait(timeout=self.AGENT_KILL_TIMEOUT)
             except subprocess.TimeoutExpired:
                 self._agent_proc.kill()
                 self._agent_proc.wait()
+        self._last_exit_code = self._agent_proc.returncode
+
+    def _agent_running(self) -> bool:
+        return self._agent_proc is not None and self._agent_proc.poll() is None
+
+    def _resource_status(self) -> dict:
+        """Limits and memory state of the agent process, if limits are set."""
+        if self._resource_guard is None:
+            return {}
+        pid = self._agent_proc.pid if self._agent_running() else None
+        return {
+            "limits": self.resource_limits.to_dict(),
+            "limit_mechanism": self._resource_guard.mechanism,
+            "memory": self._resource_guard.memory_status(pid),
+        }
 
     # reset router
     async def _reset_endpoint(self, payload: _SignalPayload):
@@ -120,6 +161,7 @@ class BeatsAgentLauncher:
         async with self._state_lock:
             self._terminate_agent()
             self._agent_proc = self._start_agent()
+            self._restart_count += 1
 
             time.sleep(2) # wait for agent to start, TODO: use a better impl
 
@@ -144,11 +186,29 @@ class BeatsAgentLauncher:
         
         @app.get("/status")
         async def _status():
-            if self._agent_proc and self._agent_proc.poll() is None:
-                return {"status":   "server up, with agent running", 
-                        "pid":      self._agent_proc.pid}
+            if self._agent_running():
+                status = {"status":   "server up, with agent running", 
+                          "pid":      self._agent_proc.pid}
             else:
-                return {"status": "server up, no agents running"}
+                status = {"status": "server up, no agents running"}
+            status.update(self._resource_status())
+            return status
+
+        @app.get("/metrics")
+        async def _metrics():
+            running = self._agent_running()
+            if self._agent_proc is not None and not running:
+                self._last_exit_code = self._agent_proc.returncode
+            metrics = {
+                "agent_running":  running,
+                "pid":            self._agent_proc.pid if running else None,
+                "uptime_seconds": (time.time() - self._agent_started_at
+                                   if running and self._agent_started_at else 0.0),
+                "restart_count":  self._restart_count,
+                "last_exit_code": self._last_exit_code,
+            }
+            metrics.update(self._resource_status())
+            return metrics
 
         return app
 
@@ -168,3 +228,5 @@ class BeatsAgentLauncher:
 
     def shutdown(self) -> None:
         self._terminate_agent()
+        if self._resource_guard is not None:
+            self._resource_guard.cleanup()
@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+
+"""
+On-disk caches for AgentBeats.
+
+Everything lives under $AGENTBEATS_CACHE_DIR (default: $XDG_CACHE_HOME/agentbeats
+or ~/.cache/agentbeats). Set AGENTBEATS_DISABLE_CACHE=1 to bypass all caches.
+The caches are best-effort: if the directory cannot be created, read or
+written, the cached work is simply done again.
+"""
+
+from __future__ import annotations
+
+import os
+import json
+import inspect
+import hashlib
+import tempfile
+from pathlib import Path
+from importlib import metadata
+from typing import Any, Callable, Dict, Optional
+
+__all__ = [
+    "get_cache_dir",
+    "cache_disabled",
+    "cached_function_tool",
+    "tool_schema_cache_stats",
+]
+
+_TOOL_SCHEMA_DIR = "tool_schemas"
+_tool_schema_stats = {"hits": 0, "misses": 0, "uncacheable": 0}
+
+
+def cache_disabled() -> bool:
+    return os.getenv("AGENTBEATS_DISABLE_CACHE", "").lower() in ("1", "true", "yes")
+
+
+def get_cache_dir(*parts: str) -> Path:
+    """Return (and create) a directory inside the AgentBeats cache root; raises OSError if it can't."""
+    root = os.getenv("AGENTBEATS_CACHE_DIR")
+    if not root:
+        xdg = os.getenv("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+        root = os.path.join(xdg, "agentbeats")
+    path = Path(root, *parts)
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def read_json(path: Path) -> Optional[Dict[str, Any]]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write_json_atomic(path: Path, data: Dict[str, Any]) -> None:
+    """
+    Write JSON through a temp file so concurrent readers never see partial
+    data. Failures are ignored: the entry is just not cached.
+    """
+    try:
+        fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+    except OSError:
+        return
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp, path)
+    except OSError:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+
+
+def _package_version(name: str) -> str:
+    try:
+        return metadata.version(name)
+    except metadata.PackageNotFoundError:
+        return "unknown"
+
+
+def _tool_cache_key(func: Callable, name: str) -> Optional[str]:
+    """
+    Key = hash of the defining source file + qualified name + tool name +
+    SDK versions. Types imported from other files are not part of the key.
+    Returns None for functions without a readable source file.
+    """
+    try:
+        source_file = inspect.getsourcefile(func)
+        with open(source_file, "rb") as f:
+            source = f.read()
+    except (TypeError, OSError):
+        return None
+
+    digest = hashlib.sha256()
+    for part in (source,
+                 func.__module__.encode(),
+                 func.__qualname__.encode(),
+                 name.encode(),
+                 _package_version("agentbeats").encode(),
+                 _package_version("openai-agents").encode(),
+                 _package_version("pydantic").encode()):
+        digest.update(part)
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def cached_function_tool(func: Callable, name_override: Optional[str] = None):
+    """
+    Drop-in for `function_tool(func, name_override=...)` that caches the
+    generated schema on disk. On a hit the tool is built from the cached
+    schema, and the real function_tool (signature inspection, pydantic
+    model) is only created on the first invocation.
+    """
+    from agents import function_tool, FunctionTool
+
+    name = name_override or func.__name__
+    key = None if cache_disabled() else _tool_cache_key(func, name)
+    path = None
+    if key is not None:
+        try:
+            path = get_cache_dir(_TOOL_SCHEMA_DIR) / f"{key}.json"
+        except OSError:
+            pass        # no usable cache dir (read-only HOME, bad AGENTBEATS_CACHE_DIR)
+    if path is None:
+        _tool_schema_stats["uncacheable"] += 1
+        return function_tool(func, name_override=name_override)
+
+    entry = read_json(path)
+    if entry is None:
+        _tool_schema_stats["misses"] += 1
+        tool = function_tool(func, name_override=name_override)
+        write_json_atomic(path, {
+            "name": tool.name,
+            "description": tool.description,
+            "params_json_schema": tool.params_json_schema,
+            "strict_json_schema": tool.strict_json_schema,
+        })
+        return tool
+
+    _tool_schema_stats["hits"] += 1
+    real_tool = None
+
+    async def _on_invoke_tool(ctx, input: str):
+        nonlocal real_tool
+        if real_tool is None:
+            real_tool = function_tool(func, name_override=name_override)
+        return await real_tool.on_invoke_tool(ctx, input)
+
+    return FunctionTool(
+        name=entry["name"],
+        description=entry["description"],
+        params_json_schema=entry["params_json_schema"],
+        on_invoke_tool=_on_invoke_tool,
+        strict_json_schema=entry["strict_json_schema"],
+    )
+
+
+def tool_schema_cache_stats() -> Dict[str, int]:
+    """Hits, misses and uncacheable tools since process start."""
+    return dict(_tool_schema_stats)
@@ -3,20 +3,20 @@
 import sys
 import pathlib
 import argparse
+import contextlib
 import importlib.util
 
-from .agent_executor import *
-from .agent_launcher import *
+from .resource_limits import AgentResourceLimits, parse_memory_size
 from . import get_registered_tools, tool
 
 
-def _import_tool_file(path: str | pathlib.Path):
+def _import_tool_file(path: str | pathlib.Path, module_name: str | None = None):
     """import a Python file as a module, triggering @agentbeats.tool() decorators."""
     path = pathlib.Path(path).expanduser().resolve()
     if not path.exists():
         raise FileNotFoundError(path)
 
-    spec = importlib.util.spec_from_file_location(path.stem, path)
+    spec = importlib.util.spec_from_file_location(module_name or path.stem, path)
     if spec is None:
         raise ImportError(f"Could not create spec for {path}")
     
@@ -27,32 +27,61 @@ def _import_tool_file(path: str | pathlib.Path):
     
     spec.loader.exec_module(mod)
 
-def _run_agent(card_path: str, 
-               agent_host: str,
-               agent_port: int,
-               model_type: str,
-               model_name: str,
-               tool_files: list[str], 
-               mcp_urls: list[str], 
-               ):
+@contextlib.contextmanager
+def _no_phase(name: str):
+    yield
+
+
+def _build_agent(card_path: str,
+                 agent_host: str,
+                 agent_port: int,
+                 model_type: str,
+                 model_name: str,
+                 tool_files: list[str],
+                 mcp_urls: list[str],
+                 phase=_no_phase,
+                 module_prefix: str | None = None,
+                 ):
+    """Build a BeatsAgent from card, tool files and MCP urls (without serving).
+    *phase* is a context manager factory used to time each startup step.
+    *module_prefix* keeps tool modules of co-hosted agents apart in sys.modules."""
     # 1. Import tool files, triggering @tool decorators
     for file in tool_files:
-        _import_tool_file(file)
+        module_name = f"{module_prefix}_{pathlib.Path(file).stem}" if module_prefix else None
+        with phase(f"tool file: {pathlib.Path(file).name}"):
+            _import_tool_file(file, module_name=module_name)
 
     # 2. Instantiate agent and register tools
+    # (imported here so that `agentbeats --help` stays fast)
+    with phase("sdk imports"):
+        from .agent_executor import BeatsAgent
     agent = BeatsAgent(__name__, 
                        agent_host=agent_host, 
                        agent_port=agent_port, 
                        model_type=model_type,
                        model_name=model_name,)
-    for func in get_registered_tools():
-        agent.register_tool(func)       # suppose @tool() decorator adds to agent
+    with phase("tool schemas"):
+        for func in get_registered_tools():
+            agent.register_tool(func)       # suppose @tool() decorator adds to agent
 
-    # 3. Load agent card / MCP, and run
-    agent.load_agent_card(card_path)
+    # 3. Load agent card / MCP
+    with phase("agent card"):
+        agent.load_agent_card(card_path)
     for url in mcp_urls:
         if url:                         # Allow empty string as placeholder
             agent.add_mcp_server(url)
+    return agent
+
+def _run_agent(card_path: str, 
+               agent_host: str,
+               agent_port: int,
+               model_type: str,
+               model_name: str,
+               tool_files: list[str], 
+               mcp_urls: list[str], 
+               ):
+    agent = _build_agent(card_path, agent_host, agent_port,
+                         model_type, model_name, tool_files, mcp_urls)
     agent.run()
 
 def main():
@@ -92,6 +121,40 @@ def main():
     run_parser.add_argument("--tool", action="append", default=[],
                        help="Python file(s) that define @agentbeats.tool()")
     run_parser.add_argument("--reload", action="store_true")
+    run_parser.add_argument("--memory_limit", type=parse_memory_size, default=None,
+                       help="Agent memory limit, e.g. '512M', '2G' (Linux only)")
+    run_parser.add_argument("--cpu_limit", type=float, default=None,
+                       help="Agent CPU limit in cores, e.g. 0.5 (needs cgroup v2)")
+    run_parser.add_argument("--fd_limit", type=int, default=None,
+                       help="Maximum open file descriptors for the agent (Linux only)")
+
+    # run_many command
+    run_many_parser = sub_parser.add_parser("run_many",
+                       help="Host several agents from a manifest in one process")
+    run_many_parser.add_argument("manifest", help="path/to/manifest.toml")
+    run_many_parser.add_argument("--host", default=None,
+                       help="Override the manifest's bind host")
+
+    # profile_startup command
+    profile_parser = sub_parser.add_parser("profile_startup", aliases=["profile-startup"],
+                       help="Time each agent startup phase up to readiness")
+    profile_parser.add_argument("card", help="path/to/agent_card.toml")
+    profile_parser.add_argument("--agent_host", default="127.0.0.1")
+    profile_parser.add_argument("--agent_port", type=int, default=0,
+                       help="Port to boot uvicorn on (0 picks a free port)")
+    profile_parser.add_argument("--model_type", default="openai")
+    profile_parser.add_argument("--model_name", default="o4-mini")
+    profile_parser.add_argument("--tool", action="append", default=[],
+                       help="Python file(s) that define @agentbeats.tool()")
+    profile_parser.add_argument("--mcp",  action="append", default=[],
+                       help="One or more MCP SSE server URLs")
+    profile_parser.add_argument("--profile_out", default=None,
+                       help="Write a profile: *.prof for cProfile stats, "
+                            "anything else for collapsed flame-graph stacks")
+    profile_parser.add_argument("--import_depth", type=int, default=3,
+                       help="Depth of the printed import tree")
+    profile_parser.add_argument("--import_top", type=int, default=10,
+                       help="Imports shown per tree level")
 
     args = parser.parse_args()
 
@@ -104,6 +167,7 @@ def main():
                    tool_files=args.tool, 
                    mcp_urls=args.mcp)
     elif args.cmd == "run":
+        from .agent_launcher import BeatsAgentLauncher
         launcher = BeatsAgentLauncher(
             agent_card=args.card,
             launcher_host=args.launcher_host,
@@ -115,5 +179,25 @@ def main():
             mcp_list=args.mcp,
             tool_list=args.tool,
             backend_url=args.backend,
+            resource_limits=AgentResourceLimits.from_cli(
+                memory_limit=args.memory_limit,
+                cpu_limit=args.cpu_limit,
+                fd_limit=args.fd_limit,
+            ),
         )
         launcher.run(reload=args.reload)
+    elif args.cmd == "run_many":
+        from .multi_agent import run_many
+        run_many(args.manifest, host=args.host)
+    elif args.cmd in ("profile_startup", "profile-startup"):
+        from .startup_profiler import profile_startup
+        profile_startup(card_path=args.card,
+                        agent_host=args.agent_host,
+                        agent_port=args.agent_port,
+                        model_type=args.model_type,
+                        model_name=args.model_name,
+                        tool_files=args.tool,
+                        mcp_urls=args.mcp,
+                        profile_out=args.profile_out,
+                        import_depth=args.import_depth,
+                        import_top=args.import_top)
@@ -5,6 +5,7 @@ CTF Green Agent Tools - Orchestrator for password brute force challenge
 
 import json
 import time
+import asyncio
 import subprocess
 import os
 import agentbeats as ab
@@ -201,7 +202,8 @@ async def setup_ctf_environment(battle_id: str) -> str:
             "build_args": {"ROOT_PASSWORD": actual_password}
         }
         print(f"Docker config: {docker_config}")
-        result = await setup_container(docker_config)
+        # build output is printed as it happens; the event loop stays free meanwhile
+        result = await setup_container(docker_config, on_log=lambda line: print(f"[arena] {line}"))
         print(f"Docker setup result: {result}")
         if not result:
             return "Failed to set up Docker container"
@@ -213,7 +215,7 @@ async def setup_ctf_environment(battle_id: str) -> str:
             if await check_container_health(ctf_container_name):
                 print(f"Container is ready after {attempt + 1} seconds")
                 break
-            time.sleep(1)
+            await asyncio.sleep(1)
         else:
             return "Container failed to become ready within 30 seconds"
         
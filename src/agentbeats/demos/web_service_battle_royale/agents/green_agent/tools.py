@@ -14,7 +14,7 @@ from typing import Dict, List, Any
 import agentbeats as ab
 
 # Import SDK utilities
-from agentbeats.utils.agents import send_message_to_agent
+from agentbeats.utils.agents import send_message_with_push
 from agentbeats.utils.environment import setup_container, cleanup_container
 
 # Import logging utilities
@@ -59,7 +59,9 @@ def send_battle_info_to_agents(battle_id: str, agent_urls: List[str], agent_ids:
                     
                     """
                 
-                task = asyncio.create_task(send_message_to_agent(url, battle_message))
+                # informational only: start the agents' turns without holding
+                # a streaming connection open for the whole battle
+                task = asyncio.create_task(send_message_with_push(url, battle_message))
                 tasks.append(task)
             
             await asyncio.gather(*tasks, return_exceptions=True)
@@ -5,7 +5,6 @@ Flexible framework for agents to create their own web service strategies.
 """
 
 import json
-import time
 import agentbeats as ab
 from typing import Dict, Any, Optional, Tuple
 
@@ -101,7 +100,8 @@ def connect_to_battle_arena(host: str, port: int, username: str, password: str)
             "port": port
         }
         
-        ssh_client = SSHClient(host, credentials)
+        # one long-lived shell: the tools fire many short commands in a row
+        ssh_client = SSHClient(host, credentials, persistent_shell=True)
         connection_successful = ssh_client.connect()
         
         if connection_successful:
@@ -158,33 +158,36 @@ def deploy_custom_web_service(service_code: str, port: int = 80, filename: str =
                 "code_length": len(service_code)
             })
         
-        # Clean up any existing services on the target port
-        print(f"Cleaning up any existing services on port {port}...")
-        execute_ssh_command(f"fuser -k {port}/tcp 2>/dev/null || true", ssh_client)
-        execute_ssh_command(f"pkill -f '{filename}' 2>/dev/null || true", ssh_client)
-        time.sleep(2)  # Wait for cleanup
-        
-        # Write custom service code to remote server
-        sftp = ssh_client.open_sftp()
+        # Write the service code (skipped if the remote copy is identical)
+        code_changed = ssh_client.upload_bytes(service_code, f"/tmp/{filename}", mode=0o755)
         
-        # Create service file with the custom code
-        with sftp.file(f'/tmp/{filename}', 'w') as f:
-            f.write(service_code)
+        # Same code already serving on the port: nothing to redeploy
+        if not code_changed:
+            running = ssh_client.run(
+                f"pgrep -f 'python3 /tmp/{filename}' >/dev/null && curl -s -m 2 http://localhost:{port}",
+                timeout=10)
+            if running.ok:
+                print(f"Custom web service unchanged and already running on port {port}")
+                return f"Custom web service deployed and running on port {port} (code unchanged)"
         
-        # Make it executable
-        execute_ssh_command(f"chmod +x /tmp/{filename}", ssh_client)
+        # Clean up any existing services on the target port, waiting until it is free
+        print(f"Cleaning up any existing services on port {port}...")
+        execute_ssh_command(
+            f"fuser -k {port}/tcp 2>/dev/null; pkill -f '{filename}' 2>/dev/null; "
+            f"for i in $(seq 40); do fuser {port}/tcp >/dev/null 2>&1 || break; sleep 0.05; done; true",
+            ssh_client)
         
         # Start the service in background
         execute_ssh_command(f"nohup python3 /tmp/{filename} > /tmp/{filename}.log 2>&1 &", ssh_client)
         
-        # Wait a moment for service to start
-        time.sleep(3)
-        
-        # Check if service is running
-        result = execute_ssh_command(f"curl -s http://localhost:{port}", ssh_client)
+        # Poll until the service answers (up to ~5 seconds)
+        result = execute_ssh_command(
+            f"up=1; for i in $(seq 50); do if curl -s -m 1 http://localhost:{port}; then up=0; break; fi; "
+            f"sleep 0.1; done; test $up = 0",
+            ssh_client)
         print(f"Curl result: '{result}'")
         
-        if result and not result.startswith("curl:"):
+        if result.startswith("Success:"):
             print(f"Custom web service deployed and running on port {port}")
             
             # Log successful deployment
@@ -235,16 +238,12 @@ def execute_custom_strategy(strategy_commands: str) -> str:
                 "strategy_length": len(strategy_commands)
             })
         
-        # Split commands by newlines and execute each
+        # Split commands by newlines and run them in order as one remote script
         commands = [cmd.strip() for cmd in strategy_commands.split('\n') if cmd.strip()]
         
         results = []
-        for command in commands:
-            try:
-                result = execute_ssh_command(command, ssh_client)
-                results.append(f"Command '{command}': {result}")
-            except Exception as e:
-                results.append(f"Command '{command}' failed: {str(e)}")
+        for result in ssh_client.execute_many(commands):
+            results.append(f"Command '{result.command}': {result.to_text()}")
         
         # Log strategy completion
         if battle_context:
@@ -329,16 +328,12 @@ def sabotage_competitors(sabotage_commands: str) -> str:
                 "strategy_type": "sabotage"
             })
         
-        # Split commands by newlines and execute each
+        # Split commands by newlines and run them in order as one remote script
         commands = [cmd.strip() for cmd in sabotage_commands.split('\n') if cmd.strip()]
         
         results = []
-        for command in commands:
-            try:
-                result = execute_ssh_command(command, ssh_client)
-                results.append(f"Sabotage command '{command}': {result}")
-            except Exception as e:
-                results.append(f"Sabotage command '{command}' failed: {str(e)}")
+        for result in ssh_client.execute_many(commands):
+            results.append(f"Sabotage command '{result.command}': {result.to_text()}")
         
         # Log sabotage completion
         if battle_context:
@@ -380,13 +375,10 @@ def monitor_battlefield() -> str:
             "free -h"
         ]
         
+        # all probes as one remote script: a single round trip
         results = []
-        for command in commands:
-            try:
-                result = execute_ssh_command(command, ssh_client)
-                results.append(f"Command '{command}':\n{result}")
-            except Exception as e:
-                results.append(f"Command '{command}' failed: {str(e)}")
+        for result in ssh_client.execute_many(commands, timeout=30):
+            results.append(f"Command '{result.command}':\n{result.to_text()}")
         
         return f"Battlefield status:\n" + "\n".join(results)
         
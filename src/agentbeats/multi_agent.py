@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+
+"""
+Host several BeatsAgents in one process (`agentbeats run_many manifest.toml`).
+
+All agents share one event loop, one uvicorn server and the process-wide
+HTTP / model client pools. A2A messages between them are dispatched
+in-memory (see agentbeats.utils.agents.loopback). Each agent gets its own tool registry and is
+reachable either on its own port or under a path prefix of a shared port.
+
+Manifest format (paths are relative to the manifest file):
+
+    host = "0.0.0.0"
+    port = 8001                      # shared port for path-mounted agents
+
+    [[agent]]
+    card = "green_agent/agent_card.toml"
+    tools = ["green_agent/tools.py"]
+    mcp = []
+    model_type = "openai"
+    model_name = "o4-mini"
+    path = "/green"                  # mount under http://host:8001/green/
+
+    [[agent]]
+    card = "red_agent/agent_card.toml"
+    tools = ["red_agent/tools.py"]
+    port = 8011                      # or serve on a dedicated port
+
+The `url` in a path-mounted agent's card should include the prefix
+(e.g. http://localhost:8001/green/) so that A2A clients post to it.
+"""
+
+from __future__ import annotations
+
+import socket
+import tomllib
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.routing import Mount
+
+from . import tool_registry_scope
+
+__all__ = ["AgentSpec", "load_manifest", "MultiAgentHost"]
+
+
+@dataclass
+class AgentSpec:
+    """One agent entry of a run_many manifest."""
+    card: str
+    tools: List[str] = field(default_factory=list)
+    mcp: List[str] = field(default_factory=list)
+    model_type: str = "openai"
+    model_name: str = "o4-mini"
+    path: Optional[str] = None
+    port: Optional[int] = None
+
+
+def load_manifest(manifest_path: str) -> tuple[Dict[str, Any], List[AgentSpec]]:
+    """Parse a run_many manifest into server settings and agent specs."""
+    manifest_path = Path(manifest_path).expanduser().resolve()
+    with open(manifest_path, "rb") as f:
+        manifest = tomllib.load(f)
+
+    base = manifest_path.parent
+    server = {"host": manifest.get("host", "0.0.0.0"), "port": manifest.get("port", 8001)}
+    specs = []
+    for i, entry in enumerate(manifest.get("agent", [])):
+        if "card" not in entry:
+            raise ValueError(f"agent #{i} in {manifest_path} has no card")
+        if (entry.get("path") is None) == (entry.get("port") is None):
+            raise ValueError(f"agent #{i} in {manifest_path} needs exactly one of 'path' or 'port'")
+        path = entry.get("path")
+        if path is not None:
+            path = "/" + path.strip("/")
+            if path == "/":
+                raise ValueError(f"agent #{i} in {manifest_path}: path prefix must not be '/'")
+        specs.append(AgentSpec(
+            card=str(base / entry["card"]),
+            tools=[str(base / t) for t in entry.get("tools", [])],
+            mcp=list(entry.get("mcp", [])),
+            model_type=entry.get("model_type", "openai"),
+            model_name=entry.get("model_name", "o4-mini"),
+            path=path,
+            port=entry.get("port"),
+        ))
+    if not specs:
+        raise ValueError(f"No [[agent]] entries in {manifest_path}")
+    return server, specs
+
+
+class _PortDispatcher:
+    """ASGI app routing each connection to the app bound to its server port."""
+
+    def __init__(self, apps_by_port: Dict[int, Any],
+                 on_startup: Optional[Callable[[], None]] = None,
+                 on_shutdown: Optional[Callable[[], Awaitable[None]]] = None) -> None:
+        self.apps_by_port = apps_by_port
+        self.on_startup = on_startup
+        self.on_shutdown = on_shutdown
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] == "lifespan":
+            # sub-apps only need the hooks below; they never see lifespan events
+            while True:
+                message = await receive()
+                if message["type"] == "lifespan.startup":
+                    if self.on_startup:
+                        self.on_startup()
+                    await send({"type": "lifespan.startup.complete"})
+                elif message["type"] == "lifespan.shutdown":
+                    if self.on_shutdown:
+                        await self.on_shutdown()
+                    await send({"type": "lifespan.shutdown.complete"})
+                    return
+
+        port = (scope.get("server") or (None, None))[1]
+        app = self.apps_by_port.get(port)
+        if app is None:
+            await send({"type": "http.response.start", "status": 404,
+                        "headers": [(b"content-type", b"text/plain")]})
+            await send({"type": "http.response.body", "body": b"no agent on this port"})
+            return
+        await app(scope, receive, send)
+
+
+class MultiAgentHost:
+    """Builds every agent of a manifest and serves them from one uvicorn server."""
+
+    def __init__(self, specs: List[AgentSpec], host: str = "0.0.0.0", port: int = 8001) -> None:
+        self.specs = specs
+        self.host = host
+        self.port = port
+        self.agents: List[Any] = []
+
+    def _build_agents(self) -> None:
+        from .cli import _build_agent
+
+        for i, spec in enumerate(self.specs):
+            # each agent collects its @tool functions into its own registry
+            with tool_registry_scope():
+                agent = _build_agent(spec.card, self.host, spec.port or self.port,
+                                     spec.model_type, spec.model_name,
+                                     spec.tools, spec.mcp,
+                                     module_prefix=f"agentbeats_agent{i}")
+            agent._make_app()
+            self.agents.append(agent)
+            where = f"port {spec.port}" if spec.port else f"{self.port}{spec.path}/"
+            print(f"[AgentBeats] Loaded {agent.agent_card_json.get('name', spec.card)} "
+                  f"with {len(agent.tool_list)} tools on {where}")
+
+    def build_app(self) -> _PortDispatcher:
+        """Build all agents and return the dispatching ASGI app."""
+        if not self.agents:
+            self._build_agents()
+
+        apps_by_port: Dict[int, Any] = {}
+        mounts = []
+        for spec, agent in zip(self.specs, self.agents):
+            if spec.port is not None:
+                if spec.port in apps_by_port:
+                    raise ValueError(f"Port {spec.port} is used by more than one agent")
+                apps_by_port[spec.port] = agent.get_app()
+            else:
+                mounts.append(Mount(spec.path, app=agent.get_app()))
+        if mounts:
+            if self.port in apps_by_port:
+                raise ValueError(f"Port {self.port} hosts path-mounted agents "
+                                 "and cannot also be an agent's own port")
+            apps_by_port[self.port] = Starlette(routes=mounts)
+        return _PortDispatcher(apps_by_port,
+                               on_startup=self._register_loopback,
+                               on_shutdown=self._shutdown)
+
+    def _register_loopback(self) -> None:
+        """Let co-hosted agents call each other in-memory instead of over HTTP."""
+        for spec, agent in zip(self.specs, self.agents):
+            agent._register_loopback(spec.path or "")
+
+    async def _shutdown(self) -> None:
+        for agent in self.agents:
+            await agent._shutdown()
+
+    def _bind_sockets(self, ports: List[int]) -> List[socket.socket]:
+        sockets = []
+        for port in ports:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            sock.bind((self.host, port))
+            sock.set_inheritable(True)
+            sockets.append(sock)
+        return sockets
+
+    def run(self) -> None:
+        """Serve all agents on one event loop (blocking)."""
+        app = self.build_app()
+        sockets = self._bind_sockets(sorted(app.apps_by_port))
+        server = uvicorn.Server(uvicorn.Config(app, host=self.host, port=self.port))
+        server.run(sockets=sockets)
+
+
+def run_many(manifest_path: str, host: Optional[str] = None) -> None:
+    server, specs = load_manifest(manifest_path)
+    MultiAgentHost(specs, host=host or server["host"], port=server["port"]).run()
@@ -0,0 +1,277 @@
+# -*- coding: utf-8 -*-
+
+"""
+Per-agent resource limits for processes started by the AgentBeats launcher.
+
+Limits are applied on Linux through a cgroup v2 child group when the
+launcher is allowed to create one, and through rlimits otherwise.
+
+cgroup v2 only lets a non-root group hand controllers to its children while
+it has no processes of its own, so the launcher first moves itself into a
+leaf group (agentbeats-launcher) next to the per-agent groups.
+"""
+
+from __future__ import annotations
+
+import os
+import re
+import sys
+from dataclasses import dataclass, asdict
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+__all__ = [
+    "AgentResourceLimits",
+    "AgentResourceGuard",
+    "parse_memory_size",
+]
+
+_CGROUP_ROOT = Path("/sys/fs/cgroup")
+_LAUNCHER_LEAF = "agentbeats-launcher"
+_CPU_PERIOD_US = 100_000
+_MEMORY_UNITS = {
+    "": 1,
+    "b": 1,
+    "k": 1024,
+    "kb": 1024,
+    "m": 1024 ** 2,
+    "mb": 1024 ** 2,
+    "g": 1024 ** 3,
+    "gb": 1024 ** 3,
+}
+# fraction of the memory limit above which rss counts as memory pressure
+# when no cgroup event counters are available
+_RSS_PRESSURE_RATIO = 0.9
+
+
+def parse_memory_size(value: str | int) -> int:
+    """Parse a memory size such as "512M", "2g" or "1048576" into bytes."""
+    if isinstance(value, int):
+        return value
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([a-zA-Z]*)\s*", value)
+    if not match or match.group(2).lower() not in _MEMORY_UNITS:
+        raise ValueError(f"Invalid memory size: {value!r}")
+    return int(float(match.group(1)) * _MEMORY_UNITS[match.group(2).lower()])
+
+
+@dataclass
+class AgentResourceLimits:
+    """Memory (bytes), CPU (cores) and open file limits for one agent process."""
+    memory_bytes: Optional[int] = None
+    cpu_cores: Optional[float] = None
+    max_open_files: Optional[int] = None
+
+    @classmethod
+    def from_cli(cls,
+                 memory_limit: Optional[str | int] = None,
+                 cpu_limit: Optional[float] = None,
+                 fd_limit: Optional[int] = None) -> Optional["AgentResourceLimits"]:
+        """Build limits from CLI values, returning None when nothing is set."""
+        limits = cls(
+            memory_bytes=parse_memory_size(memory_limit) if memory_limit else None,
+            cpu_cores=cpu_limit,
+            max_open_files=fd_limit,
+        )
+        return None if limits.is_empty() else limits
+
+    def is_empty(self) -> bool:
+        return (self.memory_bytes is None
+                and self.cpu_cores is None
+                and self.max_open_files is None)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+class AgentResourceGuard:
+    """
+    Applies AgentResourceLimits to a child process and reports its memory state.
+    A cgroup v2 group is preferred because it caps the whole process tree and
+    exposes memory.events; rlimits are the per-process fallback.
+    """
+
+    def __init__(self, name: str, limits: AgentResourceLimits) -> None:
+        self.name = name
+        self.limits = limits
+        self.cgroup_path: Optional[Path] = None
+        self.warnings: list[str] = []
+        self.rss_pressure_events = 0
+        self._rss_over_limit = False
+        # whether the current agent process joined cgroup_path (see confirm_cgroup)
+        self._process_in_cgroup = True
+
+        if not sys.platform.startswith("linux"):
+            self.warnings.append("resource limits are only enforced on Linux")
+            return
+
+        self.cgroup_path = self._create_cgroup()
+        if self.cgroup_path is None and self.limits.cpu_cores is not None:
+            self.warnings.append("cpu limit requires a writable cgroup v2 hierarchy; ignored")
+
+    @property
+    def mechanism(self) -> str:
+        if not sys.platform.startswith("linux"):
+            return "none"
+        return "cgroup" if self.cgroup_path is not None and self._process_in_cgroup else "rlimit"
+
+    def _create_cgroup(self) -> Optional[Path]:
+        """Create (or reuse) a child cgroup next to the launcher's own group."""
+        if not (_CGROUP_ROOT / "cgroup.controllers").exists():
+            return None
+        try:
+            parent = _own_cgroup()
+            if parent.name == _LAUNCHER_LEAF:
+                parent = parent.parent      # moved there by an earlier guard
+            needed = []
+            if self.limits.memory_bytes is not None:
+                needed.append("memory")
+            if self.limits.cpu_cores is not None:
+                needed.append("cpu")
+            available = (parent / "cgroup.controllers").read_text().split()
+            if any(controller not in available for controller in needed):
+                return None
+            enabled = (parent / "cgroup.subtree_control").read_text().split()
+            missing = [controller for controller in needed if controller not in enabled]
+            if missing:
+                if parent != _CGROUP_ROOT:
+                    # no-internal-process rule: leave the parent group first
+                    leaf = parent / _LAUNCHER_LEAF
+                    leaf.mkdir(exist_ok=True)
+                    (leaf / "cgroup.procs").write_text(str(os.getpid()))
+                (parent / "cgroup.subtree_control").write_text(
+                    " ".join(f"+{controller}" for controller in missing))
+
+            path = parent / f"agentbeats-{self.name}"
+            path.mkdir(exist_ok=True)
+            if self.limits.memory_bytes is not None:
+                (path / "memory.max").write_text(str(self.limits.memory_bytes))
+            if self.limits.cpu_cores is not None:
+                quota = max(int(self.limits.cpu_cores * _CPU_PERIOD_US), 1000)
+                (path / "cpu.max").write_text(f"{quota} {_CPU_PERIOD_US}")
+            return path
+        except (OSError, StopIteration) as e:
+            self.warnings.append(f"cgroup setup failed, falling back to rlimits: {e}")
+            return None
+
+    def preexec_fn(self) -> Optional[Callable[[], None]]:
+        """Return the function to run in the child before exec, if any."""
+        if not sys.platform.startswith("linux"):
+            return None
+
+        import resource
+
+        cgroup_procs = str(self.cgroup_path / "cgroup.procs") if self.cgroup_path else None
+        memory_bytes = self.limits.memory_bytes
+        max_open_files = self.limits.max_open_files
+
+        def _apply() -> None:
+            # runs in the forked child: keep it free of allocations we can avoid
+            in_cgroup = False
+            if cgroup_procs is not None:
+                try:
+                    with open(cgroup_procs, "w") as f:
+                        f.write("0")
+                    in_cgroup = True
+                except OSError:
+                    pass        # start with rlimits only; see confirm_cgroup()
+            if not in_cgroup and memory_bytes is not None:
+                # RLIMIT_DATA covers heap and anonymous mmaps (Linux >= 4.7)
+                # without counting the address space reserved by shared libs
+                resource.setrlimit(resource.RLIMIT_DATA, (memory_bytes, memory_bytes))
+            if max_open_files is not None:
+                resource.setrlimit(resource.RLIMIT_NOFILE, (max_open_files, max_open_files))
+
+        return _apply
+
+    def confirm_cgroup(self, pid: int) -> bool:
+        """
+        Check that the started agent *pid* joined the cgroup. If the child
+        could not join it (and fell back to rlimits), False is returned and
+        the guard reports rlimit for this process; the next start tries the
+        cgroup again.
+        """
+        self._process_in_cgroup = True
+        if self.cgroup_path is None:
+            return True
+        try:
+            joined = str(pid) in (self.cgroup_path / "cgroup.procs").read_text().split()
+        except OSError:
+            joined = False
+        if not joined:
+            self.warnings.append("agent could not join its cgroup; limited by rlimits only")
+        self._process_in_cgroup = joined
+        return joined
+
+    def memory_status(self, pid: Optional[int]) -> Dict[str, Any]:
+        """Current memory usage and pressure events for the agent process."""
+        status: Dict[str, Any] = {"rss_bytes": None, "peak_rss_bytes": None}
+        if pid is not None:
+            status.update(_read_proc_memory(pid))
+
+        if self.mechanism == "cgroup":
+            status["events"] = _read_flat_keyed(self.cgroup_path / "memory.events")
+            status["pressure"] = _read_pressure(self.cgroup_path / "memory.pressure")
+            status["current_bytes"] = _read_int(self.cgroup_path / "memory.current")
+        elif self.limits.memory_bytes is not None and status["rss_bytes"] is not None:
+            over = status["rss_bytes"] >= self.limits.memory_bytes * _RSS_PRESSURE_RATIO
+            if over and not self._rss_over_limit:
+                self.rss_pressure_events += 1
+            self._rss_over_limit = over
+            status["events"] = {"high": self.rss_pressure_events}
+        return status
+
+    def cleanup(self) -> None:
+        """Remove the cgroup once no process is left in it."""
+        if self.cgroup_path is None:
+            return
+        try:
+            self.cgroup_path.rmdir()
+        except OSError:
+            pass
+
+
+def _own_cgroup() -> Path:
+    """The launcher's cgroup v2 group."""
+    own = Path("/proc/self/cgroup").read_text().strip().splitlines()
+    unified = next(line.split("::", 1)[1] for line in own if line.startswith("0::"))
+    return _CGROUP_ROOT / unified.lstrip("/")
+
+
+def _read_proc_memory(pid: int) -> Dict[str, Optional[int]]:
+    result: Dict[str, Optional[int]] = {}
+    try:
+        for line in Path(f"/proc/{pid}/status").read_text().splitlines():
+            if line.startswith("VmRSS:"):
+                result["rss_bytes"] = int(line.split()[1]) * 1024
+            elif line.startswith("VmHWM:"):
+                result["peak_rss_bytes"] = int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return result
+
+
+def _read_flat_keyed(path: Path) -> Dict[str, int]:
+    try:
+        pairs = (line.split() for line in path.read_text().splitlines())
+        return {key: int(value) for key, value in pairs}
+    except (OSError, ValueError):
+        return {}
+
+
+def _read_pressure(path: Path) -> Dict[str, Dict[str, float]]:
+    """Parse a PSI file such as memory.pressure."""
+    result: Dict[str, Dict[str, float]] = {}
+    try:
+        for line in path.read_text().splitlines():
+            kind, *fields = line.split()
+            result[kind] = {k: float(v) for k, v in (f.split("=") for f in fields)}
+    except (OSError, ValueError):
+        pass
+    return result
+
+
+def _read_int(path: Path) -> Optional[int]:
+    try:
+        return int(path.read_text().strip())
+    except (OSError, ValueError):
+        return None
@@ -0,0 +1,266 @@
+# -*- coding: utf-8 -*-
+
+"""
+Startup profiler for AgentBeats agents (`agentbeats profile_startup`).
+
+The agent startup pipeline (tool files, SDK imports, tool schema generation,
+card parsing, app build, MCP connection, uvicorn boot) is run in a child
+interpreter started with `-X importtime`, up to the point where the server
+accepts connections. The parent collects the per-phase timings and the
+import tree and prints a breakdown.
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+import json
+import time
+import asyncio
+import tempfile
+import contextlib
+import subprocess
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+__all__ = ["profile_startup"]
+
+_REPORT_ENV = "AGENTBEATS_PROFILE_REPORT"
+_ARGS_ENV = "AGENTBEATS_PROFILE_ARGS"
+_IMPORTTIME_PREFIX = "import time:"
+
+
+@dataclass
+class _ImportNode:
+    name: str
+    self_us: int
+    cumulative_us: int
+    children: List["_ImportNode"] = field(default_factory=list)
+
+
+def parse_importtime(lines: List[str]) -> List[_ImportNode]:
+    """
+    Build the import tree from `-X importtime` output. Entries are printed
+    after their children, indented by two spaces per nesting level.
+    """
+    pending: Dict[int, List[_ImportNode]] = {}
+    for line in lines:
+        if not line.startswith(_IMPORTTIME_PREFIX):
+            continue
+        try:
+            self_us, cumulative_us, name_field = line[len(_IMPORTTIME_PREFIX):].split("|")
+            self_us, cumulative_us = int(self_us), int(cumulative_us)
+        except ValueError:
+            continue        # the "self [us] | cumulative | imported package" header
+        depth = (len(name_field) - len(name_field.lstrip()) - 1) // 2
+        node = _ImportNode(name_field.strip(), self_us, cumulative_us,
+                           pending.pop(depth + 1, []))
+        pending.setdefault(depth, []).append(node)
+    return pending.get(0, [])
+
+
+def _format_import_tree(roots: List[_ImportNode], max_depth: int,
+                        top: int, min_ms: float) -> List[str]:
+    lines: List[str] = []
+
+    def _walk(nodes: List[_ImportNode], depth: int) -> None:
+        ranked = sorted(nodes, key=lambda n: n.cumulative_us, reverse=True)[:top]
+        for node in ranked:
+            if node.cumulative_us / 1000 < min_ms:
+                break
+            lines.append(f"{node.cumulative_us / 1000:10.1f} ms  "
+                         f"{node.self_us / 1000:8.1f} ms  {'  ' * depth}{node.name}")
+            if depth + 1 < max_depth:
+                _walk(node.children, depth + 1)
+
+    _walk(roots, 0)
+    return lines
+
+
+def _folded_stacks(phases: List[Dict[str, Any]], roots: List[_ImportNode]) -> List[str]:
+    """
+    Collapsed-stack lines ("frame;frame value") for flamegraph.pl, speedscope
+    or inferno. Values are microseconds; imports are nested under "imports".
+    """
+    lines = []
+    for phase in phases:
+        lines.append(f"startup;{phase['name']} {int(phase['seconds'] * 1e6)}")
+
+    def _walk(node: _ImportNode, stack: str) -> None:
+        stack = f"{stack};{node.name}"
+        if node.self_us:
+            lines.append(f"{stack} {node.self_us}")
+        for child in node.children:
+            _walk(child, stack)
+
+    for root in roots:
+        _walk(root, "imports")
+    return lines
+
+
+class _PhaseTimer:
+    """Records wall-clock duration of named startup phases (child side)."""
+
+    def __init__(self) -> None:
+        self.phases: List[Dict[str, Any]] = []
+
+    @contextlib.contextmanager
+    def phase(self, name: str):
+        entry: Dict[str, Any] = {"name": name, "seconds": 0.0, "error": None}
+        self.phases.append(entry)
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception as e:
+            entry["error"] = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            entry["seconds"] = time.perf_counter() - start
+
+
+async def _connect_mcp(agent, timer: _PhaseTimer) -> None:
+    from agents.mcp import MCPServerSse
+
+    for url in agent.mcp_url_list:
+        server = MCPServerSse(params={"url": url})
+        try:
+            with timer.phase(f"mcp connect: {url}"):
+                await server.connect()
+        except Exception:
+            pass        # recorded on the phase, keep profiling
+        finally:
+            with contextlib.suppress(Exception):
+                await server.cleanup()
+
+
+async def _boot_uvicorn(app, host: str, port: int, timer: _PhaseTimer) -> None:
+    import uvicorn
+
+    with timer.phase("uvicorn boot"):
+        server = uvicorn.Server(uvicorn.Config(app, host=host, port=port,
+                                               log_level="warning"))
+        serve_task = asyncio.create_task(server.serve())
+        while not server.started and not serve_task.done():
+            await asyncio.sleep(0.001)
+        if serve_task.done():
+            serve_task.result()     # surface bind errors
+            raise RuntimeError("uvicorn exited before becoming ready")
+    server.should_exit = True
+    await serve_task
+
+
+def _child_main() -> None:
+    """Entry point inside the `-X importtime` child interpreter."""
+    args = json.loads(os.environ[_ARGS_ENV])
+    timer = _PhaseTimer()
+    profiler = None
+    if args.get("profile_out", "").endswith(".prof"):
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+    total_start = time.perf_counter()
+    error = None
+    try:
+        from .cli import _build_agent
+
+        agent = _build_agent(args["card"], args["agent_host"], args["agent_port"],
+                             args["model_type"], args["model_name"],
+                             args["tool_files"], args["mcp_urls"],
+                             phase=timer.phase)
+        with timer.phase("app build"):
+            agent._make_app()
+
+        async def _serve_until_ready():
+            await _connect_mcp(agent, timer)
+            await _boot_uvicorn(agent.get_app(), args["agent_host"],
+                                args["agent_port"], timer)
+
+        asyncio.run(_serve_until_ready())
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    total = time.perf_counter() - total_start
+
+    if profiler is not None:
+        profiler.disable()
+        profiler.dump_stats(args["profile_out"])
+
+    with open(os.environ[_REPORT_ENV], "w") as f:
+        json.dump({"phases": timer.phases, "total_seconds": total, "error": error}, f)
+
+
+def profile_startup(card_path: str,
+                    agent_host: str = "127.0.0.1",
+                    agent_port: int = 0,
+                    model_type: str = "openai",
+                    model_name: str = "o4-mini",
+                    tool_files: Optional[List[str]] = None,
+                    mcp_urls: Optional[List[str]] = None,
+                    profile_out: Optional[str] = None,
+                    import_depth: int = 3,
+                    import_top: int = 10,
+                    import_min_ms: float = 1.0) -> Dict[str, Any]:
+    """
+    Profile agent startup up to readiness and print a timing breakdown.
+    *profile_out* ending in ".prof" gets cProfile stats (snakeviz, flameprof);
+    any other path gets collapsed stacks of phases and imports.
+    Returns the raw report (phases, import tree roots, totals).
+    """
+    args = {
+        "card": str(card_path),
+        "agent_host": agent_host,
+        "agent_port": agent_port,
+        "model_type": model_type,
+        "model_name": model_name,
+        "tool_files": [str(os.path.abspath(f)) for f in (tool_files or [])],
+        "mcp_urls": [url for url in (mcp_urls or []) if url],
+        "profile_out": os.path.abspath(profile_out) if profile_out else "",
+    }
+
+    with tempfile.TemporaryDirectory() as tmp:
+        report_path = os.path.join(tmp, "report.json")
+        env = dict(os.environ, **{_ARGS_ENV: json.dumps(args), _REPORT_ENV: report_path})
+        wall_start = time.perf_counter()
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c",
+             "from agentbeats.startup_profiler import _child_main; _child_main()"],
+            env=env, stderr=subprocess.PIPE, text=True,
+        )
+        wall = time.perf_counter() - wall_start
+
+        stderr_lines = proc.stderr.splitlines()
+        for line in stderr_lines:
+            if not line.startswith(_IMPORTTIME_PREFIX):
+                print(line, file=sys.stderr)
+
+        if not os.path.exists(report_path):
+            raise RuntimeError(f"Startup profiling failed (exit code {proc.returncode})")
+        with open(report_path) as f:
+            report = json.load(f)
+
+    roots = parse_importtime(stderr_lines)
+    report["wall_seconds"] = wall
+    report["import_seconds"] = sum(r.cumulative_us for r in roots) / 1e6
+    report["import_roots"] = roots
+
+    print("\n[AgentBeats] Startup phases")
+    for phase in report["phases"]:
+        suffix = f"  (failed: {phase['error']})" if phase["error"] else ""
+        print(f"{phase['seconds'] * 1000:10.1f} ms  {phase['name']}{suffix}")
+    print(f"{report['total_seconds'] * 1000:10.1f} ms  total (in child)")
+    print(f"{wall * 1000:10.1f} ms  wall clock, including interpreter start")
+    if report["error"]:
+        print(f"[AgentBeats] Startup did not reach readiness: {report['error']}")
+
+    print(f"\n[AgentBeats] Import tree ({report['import_seconds'] * 1000:.1f} ms total)")
+    print(f"{'cumulative':>13}  {'self':>11}  module")
+    for line in _format_import_tree(roots, import_depth, import_top, import_min_ms):
+        print(line)
+
+    if profile_out and not profile_out.endswith(".prof"):
+        with open(profile_out, "w") as f:
+            f.write("\n".join(_folded_stacks(report["phases"], roots)) + "\n")
+    if profile_out:
+        print(f"\n[AgentBeats] Profile written to {profile_out}")
+
+    return report
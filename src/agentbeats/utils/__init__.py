@@ -3,27 +3,73 @@
 AgentBeats SDK utilities organized by domain.
 """
 
-from .agents import *
-from .environment import *
-from .commands import *
-from .assets import *
+import importlib
 
-__all__ = [
+# Each domain subpackage is imported on first use of one of its names
+_SUBPACKAGES = ("agents", "environment", "commands", "assets")
+_LAZY_ATTRS = {
     # Agent utilities
-    "create_a2a_client",
-    "send_message_to_agent", 
-    "send_message_to_agents",
-    "send_messages_to_agents",
-    
+    "create_a2a_client":          ".agents",
+    "send_message_to_agent":      ".agents",
+    "stream_message_to_agent":    ".agents",
+    "StatusChunk":                ".agents",
+    "ArtifactChunk":              ".agents",
+    "MessageChunk":               ".agents",
+    "CutoffChunk":                ".agents",
+    "send_message_to_agents":     ".agents",
+    "send_messages_to_agents":    ".agents",
+    "get_agent_card":             ".agents",
+    "create_cached_a2a_client":   ".agents",
+    "fetch_full_artifact":        ".agents",
+    "A2AClientManager":           ".agents",
+    "get_a2a_client_manager":     ".agents",
+    "clear_card_cache":           ".agents",
+    "A2ASession":                 ".agents",
+    "PushNotificationReceiver":   ".agents",
+    "send_message_with_push":     ".agents",
+    "RetryPolicy":                ".agents",
+    "CircuitOpenError":           ".agents",
+    "configure_circuit_breakers": ".agents",
+    "get_circuit_states":         ".agents",
+    "is_agent_available":         ".agents",
+    "reset_circuit_breakers":     ".agents",
+
     # Environment utilities
-    "setup_container",
-    "cleanup_container",
-    "check_container_health",
-    
+    "setup_container":            ".environment",
+    "cleanup_container":          ".environment",
+    "check_container_health":     ".environment",
+    "build_cache_stats":          ".environment",
+
     # SSH utilities
-    "SSHClient",
-    "create_ssh_connect_tool",
-    
+    "SSHClient":                  ".commands",
+    "AsyncSSHClient":             ".commands",
+    "create_ssh_connect_tool":    ".commands",
+    "PasswordCheckResult":        ".commands",
+    "check_passwords":            ".commands",
+    "check_passwords_async":      ".commands",
+    "CommandResult":              ".commands",
+    "OutputChunk":                ".commands",
+    "SSHConnectionPool":          ".commands",
+    "get_ssh_pool":               ".commands",
+    "reset_ssh_pool":             ".commands",
+
     # Asset utilities
-    "static_expose",
-] 
\ No newline at end of file
+    "static_expose":              ".assets",
+}
+
+__all__ = list(_LAZY_ATTRS)
+
+
+def __getattr__(name):
+    if name in _SUBPACKAGES:
+        return importlib.import_module(f".{name}", __name__)
+    module_name = _LAZY_ATTRS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_ATTRS) | set(_SUBPACKAGES))
@@ -6,17 +6,53 @@ Agent communication utilities for AgentBeats scenarios.
 from .a2a import (
     create_a2a_client,
     send_message_to_agent,
+    stream_message_to_agent,
+    StatusChunk,
+    ArtifactChunk,
+    MessageChunk,
+    CutoffChunk,
     send_message_to_agents,
     send_messages_to_agents,
     get_agent_card,
     create_cached_a2a_client,
+    fetch_full_artifact,
+)
+from .client_manager import A2AClientManager, get_a2a_client_manager
+from .card_cache import clear_card_cache
+from .session import A2ASession
+from .push import PushNotificationReceiver, send_message_with_push
+from .resilience import (
+    RetryPolicy,
+    CircuitOpenError,
+    configure_circuit_breakers,
+    get_circuit_states,
+    is_agent_available,
+    reset_circuit_breakers,
 )
 
 __all__ = [
     "create_a2a_client",
     "send_message_to_agent", 
+    "stream_message_to_agent",
+    "StatusChunk",
+    "ArtifactChunk",
+    "MessageChunk",
+    "CutoffChunk",
     "send_message_to_agents",
     "send_messages_to_agents",
     "get_agent_card",
     "create_cached_a2a_client",
+    "fetch_full_artifact",
+    "A2AClientManager",
+    "get_a2a_client_manager",
+    "clear_card_cache",
+    "A2ASession",
+    "PushNotificationReceiver",
+    "send_message_with_push",
+    "RetryPolicy",
+    "CircuitOpenError",
+    "configure_circuit_breakers",
+    "get_circuit_states",
+    "is_agent_available",
+    "reset_circuit_breakers",
 ] 
\ No newline at end of file
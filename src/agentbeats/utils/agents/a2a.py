@@ -5,205 +5,465 @@ Agent communication utilities for easier development using the Agentbeats SDK.
 
 import httpx
 import asyncio
-from typing import Optional, List, Dict, Any
+import contextlib
+from dataclasses import dataclass
+from typing import Optional, List, Dict, Any, AsyncIterator, Union
 from uuid import uuid4
 
-from a2a.client import A2AClient, A2ACardResolver
+from a2a.client import A2AClient
 from a2a.types import (
     AgentCard, Message, Part, TextPart, Role, 
+    JSONRPCErrorResponse,
+    SendMessageRequest,
     SendStreamingMessageRequest,
     SendStreamingMessageSuccessResponse,
     MessageSendParams,
+    CancelTaskRequest,
+    TaskIdParams,
+    Task,
     TaskArtifactUpdateEvent,
     TaskStatusUpdateEvent,
 )
 
-# Global cache for A2A clients
-_a2a_client_cache = {}
+from .client_manager import get_a2a_client_manager
+from .resilience import RetryPolicy, get_circuit_breaker, is_retryable
+from .artifacts import ARTIFACTS_PATH, FULL_URL_METADATA_KEY
+from .loopback import LocalEventStream, agent_error, get_local_handler
+
+# message metadata flag asking the agent for a single Message reply (short=True)
+SHORT_REPLY_METADATA_KEY = "agentbeats.short"
+
 
 async def get_agent_card(target_url: str) -> Optional[Dict[str, Any]]:
     """Get agent card/metadata from a target URL."""
-    httpx_client = None
     try:
-        httpx_client = httpx.AsyncClient()
-        resolver = A2ACardResolver(httpx_client=httpx_client, base_url=target_url)
-        
-        agent_card = await resolver.get_agent_card()
-        
-        if agent_card:
-            return agent_card.model_dump(exclude_none=True)
-        else:
-            return None
-    except Exception as e:
+        agent_card = await get_a2a_client_manager().get_card(target_url)
+        return agent_card.model_dump(exclude_none=True)
+    except Exception:
         return None
-    finally:
-        if httpx_client:
-            await httpx_client.aclose()
 
 async def create_cached_a2a_client(target_url: str) -> Optional[A2AClient]:
-    """Create a cached A2A client for repeated communication."""
-    if target_url in _a2a_client_cache:
-        return _a2a_client_cache[target_url]
-    
+    """Return the pooled A2A client for a target (owned by the client manager, do not close it)."""
     try:
-        httpx_client = httpx.AsyncClient()
-        resolver = A2ACardResolver(httpx_client=httpx_client, base_url=target_url)
-        
-        agent_card = await resolver.get_agent_card()
-        
-        if agent_card:
-            client = A2AClient(httpx_client=httpx_client, agent_card=agent_card)
-            _a2a_client_cache[target_url] = client
-            return client
-        else:
-            return None
+        return await get_a2a_client_manager().get_client(target_url)
     except Exception:
         return None
 
 
 async def create_a2a_client(target_url: str) -> A2AClient:
-    """Create an A2A client for the given agent URL."""
-    
-    httpx_client = httpx.AsyncClient()
-    resolver = A2ACardResolver(httpx_client=httpx_client, base_url=target_url)
-    
-    card: AgentCard | None = await resolver.get_agent_card(
-        relative_card_path="/.well-known/agent.json"
-    )
+    """Create an A2A client for the given agent URL. The caller owns and closes it."""
+    card: AgentCard = await get_a2a_client_manager().get_card(target_url)
+    return A2AClient(httpx_client=httpx.AsyncClient(), agent_card=card)
 
-    if card is None:
-        raise RuntimeError(f"Failed to resolve agent card from {target_url}")
 
-    return A2AClient(httpx_client=httpx_client, agent_card=card)
+async def fetch_full_artifact(full_url: str) -> str:
+    """Download the full text of an artifact the agent truncated (ArtifactChunk.full_url)."""
+    target_url = full_url.split(ARTIFACTS_PATH + "/", 1)[0]
+    async with get_a2a_client_manager().lease_http(target_url) as client:
+        response = await client.get(full_url)
+    if response.status_code != 200:
+        raise RuntimeError(f"Failed to fetch artifact {full_url}: HTTP {response.status_code}")
+    return response.text
 
 
-async def send_message_to_agent(target_url: str, message: str, timeout: Optional[float] = None) -> str:
-    """Send a message to an A2A agent and return the response."""
-    if timeout is not None and timeout <= 0:
-        raise ValueError("Timeout must be positive")
-    
-    client = None
+@dataclass
+class StatusChunk:
+    """A task status update (e.g. "working...", the final completed state)."""
+    text: str
+    state: str
+    final: bool
+    task_id: Optional[str] = None
+    context_id: Optional[str] = None
+
+
+@dataclass
+class ArtifactChunk:
+    """A piece of an artifact produced by the agent."""
+    text: str
+    artifact_id: str
+    name: Optional[str] = None
+    last_chunk: bool = False
+    task_id: Optional[str] = None
+    context_id: Optional[str] = None
+    full_url: Optional[str] = None      # set if the agent truncated the artifact
+
+
+@dataclass
+class MessageChunk:
+    """A plain message answer (no task was created)."""
+    text: str
+    task_id: Optional[str] = None
+    context_id: Optional[str] = None
+
+
+@dataclass
+class CutoffChunk:
+    """Last chunk of a stream stopped by max_bytes / max_time."""
+    reason: str         # "max_bytes" or "max_time"
+    received_bytes: int
+    elapsed: float
+    task_id: Optional[str] = None
+    text: str = ""
+
+
+StreamChunk = Union[StatusChunk, ArtifactChunk, MessageChunk, CutoffChunk]
+
+
+def _parts_text(parts) -> str:
+    return "".join(p.root.text for p in parts or [] if isinstance(p.root, TextPart))
+
+
+def task_text(task: Task) -> str:
+    """Text of the task's artifacts, or of its last status message if there are none."""
+    texts = [_parts_text(artifact.parts) for artifact in task.artifacts or []]
+    if not any(texts) and task.status.message:
+        texts = [_parts_text(task.status.message.parts)]
+    return "".join(texts).strip()
+
+
+def _to_chunk(event) -> Optional[StreamChunk]:
+    if isinstance(event, TaskArtifactUpdateEvent):
+        return ArtifactChunk(text=_parts_text(event.artifact.parts),
+                             artifact_id=event.artifact.artifact_id,
+                             name=event.artifact.name,
+                             last_chunk=bool(event.last_chunk),
+                             task_id=event.task_id, context_id=event.context_id,
+                             full_url=(event.artifact.metadata or {}).get(FULL_URL_METADATA_KEY))
+    if isinstance(event, TaskStatusUpdateEvent):
+        msg = event.status.message
+        return StatusChunk(text=_parts_text(msg.parts) if msg else "",
+                           state=event.status.state.value, final=event.final,
+                           task_id=event.task_id, context_id=event.context_id)
+    if isinstance(event, Message):
+        return MessageChunk(text=_parts_text(event.parts),
+                            task_id=event.task_id, context_id=event.context_id)
+    return None
+
+
+async def _cancel_remote_task(client: Optional[A2AClient], handler: Any, task_id: str) -> None:
+    """Best-effort tasks/cancel so the remote agent stops working."""
     try:
-        client = await create_a2a_client(target_url)
-
-        params = MessageSendParams(
-            message=Message(
-                role=Role.user,
-                parts=[Part(TextPart(text=message))],
-                messageId=uuid4().hex,
-                taskId=None,
-            )
+        if handler is not None:
+            cancel = handler.on_cancel_task(TaskIdParams(id=task_id))
+        else:
+            cancel = client.cancel_task(CancelTaskRequest(id=str(uuid4()),
+                                                          params=TaskIdParams(id=task_id)))
+        await asyncio.wait_for(cancel, timeout=5)
+    except Exception:
+        pass        # task already finished, or the agent does not support cancel
+
+
+async def _http_events(client: A2AClient, req: SendStreamingMessageRequest, breaker) -> AsyncIterator[Any]:
+    """Events of a message/stream call over HTTP (error responses are skipped)."""
+    answered = False
+    async for response in client.send_message_streaming(req):
+        if breaker is not None and not answered:
+            breaker.record_success()        # the agent is up and answering
+            answered = True
+        if isinstance(response.root, SendStreamingMessageSuccessResponse):
+            yield response.root.result
+
+
+async def stream_message_to_agent(target_url: str,
+                                  message: str,
+                                  max_bytes: Optional[int] = None,
+                                  max_time: Optional[float] = None,
+                                  context_id: Optional[str] = None,
+                                  task_id: Optional[str] = None) -> AsyncIterator[StreamChunk]:
+    """
+    Send a message to an A2A agent and yield its response chunks as they arrive.
+    When max_bytes of text or max_time seconds are exceeded the stream is closed,
+    the remote task is cancelled and a final CutoffChunk is yielded. Breaking out
+    of the loop early also cancels the remote task. Pass context_id / task_id
+    to continue an earlier conversation (see A2ASession). Agents hosted in this
+    process on the same event loop are called in-memory instead of over HTTP.
+    """
+    if max_bytes is not None and max_bytes <= 0:
+        raise ValueError("max_bytes must be positive")
+    if max_time is not None and max_time <= 0:
+        raise ValueError("max_time must be positive")
+
+    params = MessageSendParams(
+        message=Message(
+            role=Role.user,
+            parts=[Part(TextPart(text=message))],
+            messageId=uuid4().hex,
+            taskId=task_id,
+            contextId=context_id,
         )
+    )
+
+    client = None
+    # holds the pooled client's lease until the stream (and any cancel) is done
+    lease = contextlib.AsyncExitStack()
+    breaker = get_circuit_breaker(target_url)
+    if breaker is not None:
+        breaker.check()
+    handler = get_local_handler(target_url)
+    if handler is not None:
+        # the handler keeps the message in its task history: give it its own copy
+        stream = LocalEventStream(handler, params.model_copy(deep=True), breaker)
+    else:
+        try:
+            client = await lease.enter_async_context(get_a2a_client_manager().lease(target_url))
+        except Exception:
+            if breaker is not None:
+                breaker.record_failure()
+            raise
         req = SendStreamingMessageRequest(id=str(uuid4()), params=params)
-        chunks: List[str] = []
+        stream = _http_events(client, req, breaker)
 
-        async for chunk in client.send_message_streaming(req):
-            if not isinstance(chunk.root, SendStreamingMessageSuccessResponse):
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    received = 0
+    finished = False
+    try:
+        while True:
+            try:
+                if max_time is None:
+                    event = await stream.__anext__()
+                else:
+                    remaining = max_time - (loop.time() - start)
+                    if remaining <= 0:
+                        raise asyncio.TimeoutError
+                    event = await asyncio.wait_for(stream.__anext__(), remaining)
+            except StopAsyncIteration:
+                finished = True
+                return
+            except asyncio.TimeoutError:
+                yield CutoffChunk("max_time", received, loop.time() - start, task_id)
+                return
+
+            if isinstance(event, Task):
+                task_id = event.id
+                continue
+            chunk = _to_chunk(event)
+            if chunk is None:
                 continue
-            event = chunk.root.result
-            if isinstance(event, TaskArtifactUpdateEvent):
-                for p in event.artifact.parts:
-                    if isinstance(p.root, TextPart):
-                        chunks.append(p.root.text)
-            elif isinstance(event, TaskStatusUpdateEvent):
-                msg = event.status.message
-                if msg:
-                    for p in msg.parts:
-                        if isinstance(p.root, TextPart):
-                            chunks.append(p.root.text)
-
-        response = "".join(chunks).strip() or "No response from agent."
-        
-        return response
-        
+            task_id = chunk.task_id or task_id
+            if isinstance(chunk, MessageChunk) or (isinstance(chunk, StatusChunk) and chunk.final):
+                finished = True
+
+            size = len(chunk.text.encode())
+            if max_bytes is not None and received + size > max_bytes:
+                chunk.text = chunk.text.encode()[:max_bytes - received].decode(errors="ignore")
+                received += len(chunk.text.encode())
+                if chunk.text:
+                    yield chunk
+                yield CutoffChunk("max_bytes", received, loop.time() - start, task_id)
+                return
+            received += size
+            yield chunk
+    except Exception:
+        if breaker is not None:
+            breaker.record_failure()
+        raise
     finally:
-        # Clean up the httpx client to prevent resource leaks
-        if client and hasattr(client, 'httpx_client'):
-            await client.httpx_client.aclose()
+        try:
+            await stream.aclose()
+            if not finished and task_id is not None:
+                await _cancel_remote_task(client, handler, task_id)
+        finally:
+            await lease.aclose()
 
 
-async def send_message_to_agents(target_urls: List[str], message: str, timeout: Optional[float] = None) -> Dict[str, str]:
-    """Send a message to multiple A2A agents concurrently."""
+async def _send_short(target_url: str, message: str) -> str:
+    """One message/send round trip; the agent may answer with a bare Message."""
+    params = MessageSendParams(
+        message=Message(
+            role=Role.user,
+            parts=[Part(TextPart(text=message))],
+            messageId=uuid4().hex,
+            metadata={SHORT_REPLY_METADATA_KEY: True},
+        )
+    )
+
+    breaker = get_circuit_breaker(target_url)
+    if breaker is not None:
+        breaker.check()
+    handler = get_local_handler(target_url)
+    try:
+        if handler is not None:
+            try:
+                result = await handler.on_message_send(params.model_copy(deep=True))
+            except Exception as e:
+                raise agent_error(e)
+        else:
+            async with get_a2a_client_manager().lease(target_url) as client:
+                response = await client.send_message(SendMessageRequest(id=str(uuid4()), params=params))
+    except Exception:
+        if breaker is not None:
+            breaker.record_failure()
+        raise
+    if breaker is not None:
+        breaker.record_success()
+    if handler is None:
+        if isinstance(response.root, JSONRPCErrorResponse):
+            raise RuntimeError(f"Agent returned an error: {response.root.error.message}")
+        result = response.root.result
+
+    # agents without the fast path still answer with a completed Task
+    text = _parts_text(result.parts) if isinstance(result, Message) else task_text(result)
+    return text.strip() or "No response from agent."
+
+
+async def send_message_to_agent(target_url: str,
+                                message: str,
+                                timeout: Optional[float] = None,
+                                max_bytes: Optional[int] = None,
+                                max_time: Optional[float] = None,
+                                retry: Optional[RetryPolicy] = None,
+                                idempotent: bool = False,
+                                short: bool = False) -> str:
+    """
+    Send a message to an A2A agent and return the response.
+    With a RetryPolicy, failed sends are retried with backoff: connection
+    failures always, other transient errors only if *idempotent* is True.
+    A send that already received part of its response is never retried.
+    short=True uses a single non-streaming message/send round trip, for
+    small request/response exchanges (no cutoffs).
+    """
     if timeout is not None and timeout <= 0:
         raise ValueError("Timeout must be positive")
-    
-    async def send_to_single_agent(url: str) -> tuple[str, str]:
+    if short and (max_bytes is not None or max_time is not None):
+        raise ValueError("max_bytes / max_time need the streaming path (short=False)")
+
+    attempt = 0
+    while True:
+        chunks: List[str] = []
         try:
-            if timeout is not None:
-                response = await asyncio.wait_for(
-                    send_message_to_agent(url, message), 
-                    timeout=timeout
-                )
-            else:
-                response = await send_message_to_agent(url, message)
-            return url, response
-        except asyncio.TimeoutError:
-            return url, f"Error: Timeout after {timeout} seconds"
+            if short:
+                return await _send_short(target_url, message)
+            async for chunk in stream_message_to_agent(target_url, message,
+                                                       max_bytes=max_bytes, max_time=max_time):
+                if isinstance(chunk, CutoffChunk):
+                    chunks.append(f"\n[response cut off: {chunk.reason} reached]")
+                else:
+                    chunks.append(chunk.text)
+            break
         except Exception as e:
-            return url, f"Error: {str(e)}"
-    
-    # Create tasks for all agents
-    tasks = [send_to_single_agent(url) for url in target_urls]
-    
-    # Execute all tasks concurrently
-    results = await asyncio.gather(*tasks, return_exceptions=True)
-    
-    # Process results
-    response_dict = {}
-    
-    for i, result in enumerate(results):
-        url = target_urls[i]
-        if isinstance(result, Exception):
-            response_dict[url] = f"Error: {str(result)}"
-        elif isinstance(result, tuple) and len(result) == 2:
-            response_dict[url] = result[1]  # result is (url, response) tuple
-        else:
-            response_dict[url] = f"Unexpected result format: {type(result)}"
+            if (retry is None or chunks or attempt + 1 >= retry.max_attempts
+                    or not is_retryable(e, idempotent)):
+                raise
+            await asyncio.sleep(retry.delay(attempt))
+            attempt += 1
+
+    response = "".join(chunks).strip() or "No response from agent."
     
-    return response_dict
+    return response
 
 
-async def send_messages_to_agents(target_urls: List[str], messages: List[str], timeout: Optional[float] = None) -> Dict[str, str]:
-    """Send different messages to multiple A2A agents concurrently."""
-    if len(target_urls) != len(messages):
-        raise ValueError(f"Number of URLs ({len(target_urls)}) must match number of messages ({len(messages)})")
-    
+async def _fan_out(pairs: List[tuple[str, str]],
+                   timeout: Optional[float] = None,
+                   max_concurrency: Optional[int] = None,
+                   first_n: Optional[int] = None,
+                   deadline: Optional[float] = None,
+                   retry: Optional[RetryPolicy] = None,
+                   idempotent: bool = False) -> Dict[str, str]:
+    """
+    Send (url, message) pairs concurrently and collect responses by URL.
+    timeout bounds each send, max_concurrency bounds sends in flight,
+    first_n returns once that many sends succeeded and deadline returns
+    after that many seconds overall. Unfinished sends are cancelled (which
+    closes their streams and cancels the remote tasks) and reported as errors.
+    """
     if timeout is not None and timeout <= 0:
         raise ValueError("Timeout must be positive")
-    
-    async def send_to_single_agent(url: str, message: str) -> tuple[str, str]:
-        try:
-            if timeout is not None:
-                response = await asyncio.wait_for(
-                    send_message_to_agent(url, message), 
-                    timeout=timeout
-                )
-            else:
-                response = await send_message_to_agent(url, message)
-            return url, response
-        except asyncio.TimeoutError:
-            return url, f"Error: Timeout after {timeout} seconds"
-        except Exception as e:
-            return url, f"Error: {str(e)}"
-    
-    # Create tasks for all agents with their specific messages
-    tasks = [send_to_single_agent(url, message) for url, message in zip(target_urls, messages)]
-    
-    # Execute all tasks concurrently
-    results = await asyncio.gather(*tasks, return_exceptions=True)
-    
-    # Process results
-    response_dict = {}
-    
-    for i, result in enumerate(results):
-        url = target_urls[i]
-        if isinstance(result, Exception):
-            response_dict[url] = f"Error: {str(result)}"
-        elif isinstance(result, tuple) and len(result) == 2:
-            response_dict[url] = result[1]  # result is (url, response) tuple
-        else:
-            response_dict[url] = f"Unexpected result format: {type(result)}"
-    
-    return response_dict
+    if max_concurrency is not None and max_concurrency < 1:
+        raise ValueError("max_concurrency must be at least 1")
+    if first_n is not None and first_n < 1:
+        raise ValueError("first_n must be at least 1")
+    if deadline is not None and deadline <= 0:
+        raise ValueError("deadline must be positive")
+
+    semaphore = asyncio.Semaphore(max_concurrency) if max_concurrency else None
+
+    async def send_to_single_agent(url: str, message: str) -> str:
+        if semaphore is not None:
+            async with semaphore:
+                return await _send(url, message)
+        return await _send(url, message)
+
+    async def _send(url: str, message: str) -> str:
+        send = send_message_to_agent(url, message, retry=retry, idempotent=idempotent)
+        if timeout is not None:
+            return await asyncio.wait_for(send, timeout=timeout)
+        return await send
+
+    tasks = {asyncio.create_task(send_to_single_agent(url, message)): url
+             for url, message in pairs}
+    response_dict: Dict[str, str] = {}
+    pending = set(tasks)
+    successes = 0
+    reason = None
+    loop = asyncio.get_running_loop()
+    end = None if deadline is None else loop.time() + deadline
 
+    try:
+        while pending:
+            remaining = None if end is None else max(0.0, end - loop.time())
+            done, pending = await asyncio.wait(pending, timeout=remaining,
+                                               return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                reason = f"Deadline of {deadline} seconds reached"
+                break
+            for task in done:
+                url = tasks[task]
+                if task.cancelled():
+                    response_dict[url] = "Error: Cancelled"
+                    continue
+                try:
+                    response_dict[url] = task.result()
+                    successes += 1
+                except asyncio.TimeoutError:
+                    response_dict[url] = f"Error: Timeout after {timeout} seconds"
+                except Exception as e:
+                    response_dict[url] = f"Error: {str(e)}"
+            if first_n is not None and successes >= first_n and pending:
+                reason = f"Cancelled after first {first_n} responses"
+                break
+    finally:
+        # release stragglers' connections and remote work before returning
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    for task in pending:
+        response_dict[tasks[task]] = f"Error: {reason}"
+
+    # keep the caller's URL order
+    return {url: response_dict[url] for url, _ in pairs}
+
+
+async def send_message_to_agents(target_urls: List[str],
+                                 message: str,
+                                 timeout: Optional[float] = None,
+                                 max_concurrency: Optional[int] = None,
+                                 first_n: Optional[int] = None,
+                                 deadline: Optional[float] = None,
+                                 retry: Optional[RetryPolicy] = None,
+                                 idempotent: bool = False) -> Dict[str, str]:
+    """Send a message to multiple A2A agents concurrently."""
+    return await _fan_out([(url, message) for url in target_urls],
+                          timeout=timeout, max_concurrency=max_concurrency,
+                          first_n=first_n, deadline=deadline,
+                          retry=retry, idempotent=idempotent)
+
+
+async def send_messages_to_agents(target_urls: List[str],
+                                  messages: List[str],
+                                  timeout: Optional[float] = None,
+                                  max_concurrency: Optional[int] = None,
+                                  first_n: Optional[int] = None,
+                                  deadline: Optional[float] = None,
+                                  retry: Optional[RetryPolicy] = None,
+                                  idempotent: bool = False) -> Dict[str, str]:
+    """Send different messages to multiple A2A agents concurrently."""
+    if len(target_urls) != len(messages):
+        raise ValueError(f"Number of URLs ({len(target_urls)}) must match number of messages ({len(messages)})")
 
+    return await _fan_out(list(zip(target_urls, messages)),
+                          timeout=timeout, max_concurrency=max_concurrency,
+                          first_n=first_n, deadline=deadline,
+                          retry=retry, idempotent=idempotent)
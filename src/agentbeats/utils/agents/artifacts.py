@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""
+Truncation of oversized artifacts with a pointer to the full text.
+
+An agent configured with a maximum artifact size sends only the head and the
+tail of a longer reply. The full text stays in its ArtifactStore and is
+served at GET <agent url>/artifacts/<artifact_id>; the artifact metadata
+carries the pointer so clients can fetch it when they need it.
+"""
+
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse, Response
+
+ARTIFACTS_PATH = "/artifacts"
+TRUNCATED_METADATA_KEY = "agentbeats.truncated"
+FULL_URL_METADATA_KEY = "agentbeats.full_url"
+FULL_SIZE_METADATA_KEY = "agentbeats.full_size"
+
+
+class ArtifactStore:
+    """In-memory LRU of full artifact texts, bounded by their total size."""
+
+    def __init__(self, max_total_bytes: int = 64 * 1024 * 1024):
+        self.max_total_bytes = max_total_bytes
+        self._items: "OrderedDict[str, bytes]" = OrderedDict()
+        self._total = 0
+
+    def put(self, artifact_id: str, text: str) -> None:
+        data = text.encode()
+        self.discard(artifact_id)
+        self._items[artifact_id] = data
+        self._total += len(data)
+        while self._total > self.max_total_bytes and len(self._items) > 1:
+            _, evicted = self._items.popitem(last=False)
+            self._total -= len(evicted)
+
+    def get(self, artifact_id: str) -> Optional[bytes]:
+        data = self._items.get(artifact_id)
+        if data is not None:
+            self._items.move_to_end(artifact_id)
+        return data
+
+    def discard(self, artifact_id: str) -> None:
+        data = self._items.pop(artifact_id, None)
+        if data is not None:
+            self._total -= len(data)
+
+    async def endpoint(self, request: Request) -> Response:
+        """Starlette handler for GET /artifacts/{artifact_id}."""
+        data = self.get(request.path_params["artifact_id"])
+        if data is None:
+            return PlainTextResponse("Artifact not found (expired or unknown)", status_code=404)
+        return Response(data, media_type="text/plain; charset=utf-8")
+
+
+def truncate_text(text: str, max_bytes: int, full_url: str) -> Tuple[str, Dict[str, Any]]:
+    """
+    Keep the head (2/3) and the tail (1/3) of *text* with a marker pointing
+    at *full_url*, all within *max_bytes* (the marker is kept even if it
+    alone is longer). Returns (text, artifact metadata).
+    """
+    data = text.encode()
+
+    def _marker(omitted: int) -> str:
+        return (f"\n\n[... truncated: {omitted} of {len(data)} bytes omitted;"
+                f" full artifact: {full_url} ...]\n\n")
+
+    # the count is at most len(data), so this marker is never shorter than the final one
+    budget = max(0, max_bytes - len(_marker(len(data)).encode()))
+    head = data[:budget * 2 // 3].decode(errors="ignore")
+    tail = data[len(data) - budget // 3:].decode(errors="ignore") if budget // 3 else ""
+    omitted = len(data) - len(head.encode()) - len(tail.encode())
+    metadata = {
+        TRUNCATED_METADATA_KEY: True,
+        FULL_URL_METADATA_KEY: full_url,
+        FULL_SIZE_METADATA_KEY: len(data),
+    }
+    return head + _marker(omitted) + tail, metadata
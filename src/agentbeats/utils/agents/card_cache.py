@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+"""
+Persistent agent card cache.
+
+Resolved cards are stored under <cache dir>/agent_cards together with the
+ETag / Last-Modified validators of the response, so a restarted process can
+use its peers' cards right away and later revalidate them with a
+conditional GET (304 Not Modified) instead of downloading them again.
+AgentBeats agents serve their card through AgentCardETag, which adds the
+ETag and answers If-None-Match.
+"""
+
+import time
+import hashlib
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from ...cache import cache_disabled, get_cache_dir, read_json, write_json_atomic
+
+CARD_CACHE_DIR = "agent_cards"
+AGENT_CARD_PATH = "/.well-known/agent.json"
+
+
+@dataclass
+class CachedCard:
+    url: str
+    card: Dict[str, Any]                  # AgentCard JSON
+    fetched_at: float                     # time.time() of the last fetch / revalidation
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    request_encoding: Optional[str] = None  # Content-Encoding the agent accepts
+
+    def age(self) -> float:
+        return max(0.0, time.time() - self.fetched_at)
+
+
+def _card_path(target_url: str) -> Optional[Path]:
+    """Cache file of *target_url*, or None if the cache dir is unusable."""
+    key = hashlib.sha256(target_url.rstrip("/").encode()).hexdigest()
+    try:
+        return get_cache_dir(CARD_CACHE_DIR) / f"{key}.json"
+    except OSError:
+        return None
+
+
+def load_cached_card(target_url: str) -> Optional[CachedCard]:
+    """The stored card of *target_url*, or None (also when caching is disabled)."""
+    if cache_disabled():
+        return None
+    path = _card_path(target_url)
+    data = read_json(path) if path is not None else None
+    if data is None:
+        return None
+    try:
+        return CachedCard(**data)
+    except TypeError:
+        return None     # written by an incompatible version
+
+
+def store_cached_card(cached: CachedCard) -> None:
+    if cache_disabled():
+        return
+    path = _card_path(cached.url)
+    if path is not None:
+        write_json_atomic(path, asdict(cached))
+
+
+def clear_card_cache(target_url: Optional[str] = None) -> None:
+    """Delete the stored card of *target_url*, or every stored card."""
+    try:
+        if target_url is not None:
+            paths = [path for path in [_card_path(target_url)] if path is not None]
+        else:
+            paths = list(get_cache_dir(CARD_CACHE_DIR).glob("*.json"))
+    except OSError:
+        return
+    for path in paths:
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
+
+
+class AgentCardETag:
+    """
+    Pure ASGI wrapper adding a content-hash ETag to agent card responses and
+    answering a matching If-None-Match with 304 Not Modified.
+    """
+
+    def __init__(self, app: Any, path: str = AGENT_CARD_PATH) -> None:
+        self.app = app
+        self.path = path
+
+    async def __call__(self, scope, receive, send) -> None:
+        if (scope["type"] != "http" or scope["method"] not in ("GET", "HEAD")
+                or not scope["path"].endswith(self.path)):
+            await self.app(scope, receive, send)
+            return
+
+        if_none_match = dict(scope["headers"]).get(b"if-none-match", b"").decode()
+        start: Dict[str, Any] = {}
+        body = []
+
+        async def _send(message):
+            if message["type"] == "http.response.start":
+                start.update(message)
+                return
+            body.append(message.get("body", b""))
+            if message.get("more_body"):
+                return
+            content = b"".join(body)
+            if start["status"] != 200:
+                await send(start)
+                await send({"type": "http.response.body", "body": content})
+                return
+
+            etag = '"%s"' % hashlib.sha256(content).hexdigest()[:32]
+            headers = [(k, v) for k, v in start.get("headers", []) if k.lower() != b"etag"]
+            headers.append((b"etag", etag.encode()))
+            if etag in [tag.strip() for tag in if_none_match.split(",")]:
+                headers = [(k, v) for k, v in headers
+                           if k.lower() not in (b"content-length", b"content-type")]
+                await send({"type": "http.response.start", "status": 304, "headers": headers})
+                await send({"type": "http.response.body", "body": b""})
+                return
+            await send({**start, "headers": headers})
+            await send({"type": "http.response.body", "body": content})
+
+        await self.app(scope, receive, _send)
@@ -0,0 +1,357 @@
+# -*- coding: utf-8 -*-
+"""
+Pooled A2A client management for the Agentbeats SDK.
+
+One httpx.AsyncClient (and therefore one keep-alive connection pool) is kept
+per target agent and event loop, together with its resolved AgentCard. Cards
+expire after a TTL, the least recently used idle targets are evicted when
+the pool is full, and everything can be closed explicitly. httpx clients are
+bound to the loop they were created on, so tools that run their own loop
+(asyncio.run in a thread) get a pool of their own, closed when that loop
+shuts down. Cards are also persisted on disk (see card_cache) and
+revalidated with conditional requests. Large request bodies are compressed
+for targets that advertise support (see compression).
+"""
+
+import time
+import asyncio
+import contextlib
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Dict, Optional
+
+import httpx
+from pydantic import ValidationError
+from a2a.client import A2AClient, A2AClientHTTPError, A2AClientJSONError
+from a2a.types import AgentCard
+
+from .card_cache import (
+    AGENT_CARD_PATH,
+    CachedCard,
+    clear_card_cache,
+    load_cached_card,
+    store_cached_card,
+)
+from .compression import choose_encoding, request_compression_hook
+
+
+@dataclass
+class _ClientEntry:
+    httpx_client: httpx.AsyncClient
+    card: Optional[AgentCard] = None
+    card_fetched_at: float = 0.0
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    request_encoding: Optional[str] = None      # advertised by the target
+    a2a_client: Optional[A2AClient] = None
+    in_use: int = 0                 # leases in flight; busy entries are not evicted
+    retired: bool = False           # removed from the pool, closed when in_use drops to 0
+    stats: Dict[str, int] = field(default_factory=lambda: {
+        "card_fetches": 0, "card_revalidations": 0, "disk_hits": 0, "stale_served": 0,
+        "requests": 0})
+
+
+@dataclass
+class _LoopPool:
+    """The entries of one event loop, most recently used last."""
+    entries: "OrderedDict[str, _ClientEntry]" = field(default_factory=OrderedDict)
+    closer: Any = None      # async generator finalized by the loop's shutdown_asyncgens()
+
+
+class A2AClientManager:
+    """Keeps one pooled HTTP client per target agent and caches agent cards with a TTL."""
+
+    def __init__(self,
+                 max_clients: int = 64,
+                 card_ttl: float = 300.0,
+                 http_kwargs: Optional[Dict[str, Any]] = None,
+                 max_stale: float = 86400.0,
+                 disk_cache: bool = True,
+                 compress_requests: bool = True):
+        """
+        max_clients: number of targets kept open before LRU eviction
+        card_ttl: seconds a resolved AgentCard is reused before revalidating it
+        http_kwargs: extra keyword arguments for each httpx.AsyncClient
+        max_stale: seconds an expired card may still be used while its agent
+                   cannot be reached for revalidation
+        disk_cache: persist cards across restarts (AGENTBEATS_DISABLE_CACHE=1 also turns it off)
+        compress_requests: compress request bodies of 1 KiB or more for targets
+                           advertising an Accept-Encoding they can decode
+        """
+        if max_clients < 1:
+            raise ValueError("max_clients must be at least 1")
+        self.max_clients = max_clients
+        self.card_ttl = card_ttl
+        self.max_stale = max_stale
+        self.disk_cache = disk_cache
+        self.compress_requests = compress_requests
+        self.http_kwargs = dict(http_kwargs or {})
+        self._pools: Dict[asyncio.AbstractEventLoop, _LoopPool] = {}
+        self._evictions = 0
+
+    @staticmethod
+    def _key(target_url: str) -> str:
+        return target_url.rstrip("/")
+
+    async def _pool(self) -> _LoopPool:
+        """The pool of the running loop, created (with its shutdown hook) on first use."""
+        loop = asyncio.get_running_loop()
+        # loops closed without shutdown_asyncgens() can't close their clients anymore
+        for other in [l for l in self._pools if l.is_closed()]:
+            del self._pools[other]
+        pool = self._pools.get(loop)
+        if pool is None:
+            pool = self._pools[loop] = _LoopPool()
+            pool.closer = self._close_on_shutdown(loop, pool)
+            await pool.closer.__anext__()
+        return pool
+
+    async def _close_on_shutdown(self, loop: asyncio.AbstractEventLoop,
+                                 pool: _LoopPool) -> AsyncIterator[None]:
+        # the loop finalizes started async generators when it shuts down
+        # (asyncio.run), while it can still await the clients' aclose()
+        try:
+            yield
+        finally:
+            if self._pools.get(loop) is pool:
+                del self._pools[loop]
+            while pool.entries:
+                _, entry = pool.entries.popitem()
+                await self._retire(entry)
+
+    async def _entry(self, target_url: str) -> _ClientEntry:
+        """Return the live entry for *target_url* on the running loop, creating it if needed."""
+        key = self._key(target_url)
+        pool = await self._pool()
+        entry = pool.entries.get(key)
+        if entry is None:
+            entry = _ClientEntry(httpx_client=self._new_http_client(pool, key))
+            pool.entries[key] = entry
+            await self._evict_overflow(pool, keep=key)
+        pool.entries.move_to_end(key)
+        return entry
+
+    def _new_http_client(self, pool: _LoopPool, key: str) -> httpx.AsyncClient:
+        kwargs = dict(self.http_kwargs)
+        if self.compress_requests:
+            def _encoding() -> Optional[str]:
+                entry = pool.entries.get(key)
+                return entry.request_encoding if entry is not None else None
+
+            hooks = {name: list(funcs) for name, funcs in kwargs.get("event_hooks", {}).items()}
+            hooks.setdefault("request", []).append(request_compression_hook(_encoding))
+            kwargs["event_hooks"] = hooks
+        return httpx.AsyncClient(**kwargs)
+
+    async def _evict_overflow(self, pool: _LoopPool, keep: str) -> None:
+        # entries with requests in flight are skipped; if every entry is busy
+        # the pool stays over max_clients until some are released
+        idle = [key for key, entry in pool.entries.items() if entry.in_use == 0 and key != keep]
+        for key in idle[:max(0, len(pool.entries) - self.max_clients)]:
+            self._evictions += 1
+            await self._retire(pool.entries.pop(key))
+
+    @staticmethod
+    async def _retire(entry: _ClientEntry) -> None:
+        """Close an entry taken out of its pool, or once its last lease ends."""
+        entry.retired = True
+        if entry.in_use == 0:
+            await entry.httpx_client.aclose()
+
+    @contextlib.asynccontextmanager
+    async def _leased(self, entry: _ClientEntry) -> AsyncIterator[_ClientEntry]:
+        entry.in_use += 1
+        try:
+            yield entry
+        finally:
+            entry.in_use -= 1
+            if entry.retired and entry.in_use == 0:
+                await entry.httpx_client.aclose()
+
+    @staticmethod
+    def _card_age(entry: _ClientEntry) -> float:
+        return time.monotonic() - entry.card_fetched_at
+
+    def _card_fresh(self, entry: _ClientEntry) -> bool:
+        return entry.card is not None and self._card_age(entry) < self.card_ttl
+
+    def _load_from_disk(self, target_url: str, entry: _ClientEntry) -> None:
+        cached = load_cached_card(target_url)
+        if cached is None:
+            return
+        try:
+            entry.card = AgentCard.model_validate(cached.card)
+        except ValidationError:
+            return
+        entry.card_fetched_at = time.monotonic() - cached.age()
+        entry.etag = cached.etag
+        entry.last_modified = cached.last_modified
+        entry.request_encoding = cached.request_encoding
+
+    def _store_to_disk(self, target_url: str, entry: _ClientEntry) -> None:
+        store_cached_card(CachedCard(
+            url=self._key(target_url),
+            card=entry.card.model_dump(mode="json", exclude_none=True),
+            fetched_at=time.time() - self._card_age(entry),
+            etag=entry.etag,
+            last_modified=entry.last_modified,
+            request_encoding=entry.request_encoding,
+        ))
+
+    async def _fetch_card(self, target_url: str, entry: _ClientEntry) -> None:
+        """GET the card, conditionally if validators are known; errors as A2ACardResolver raises them."""
+        card_url = self._key(target_url) + AGENT_CARD_PATH
+        headers = {}
+        if entry.card is not None:
+            if entry.etag:
+                headers["If-None-Match"] = entry.etag
+            if entry.last_modified:
+                headers["If-Modified-Since"] = entry.last_modified
+        try:
+            response = await entry.httpx_client.get(card_url, headers=headers)
+        except httpx.RequestError as e:
+            raise A2AClientHTTPError(
+                503, f"Network communication error fetching agent card from {card_url}: {e}") from e
+        entry.stats["card_fetches"] += 1
+        entry.request_encoding = choose_encoding(response.headers.get("accept-encoding", ""))
+
+        if response.status_code == 304 and entry.card is not None:
+            entry.stats["card_revalidations"] += 1
+        else:
+            if response.status_code != 200:
+                raise A2AClientHTTPError(
+                    response.status_code, f"Failed to fetch agent card from {card_url}")
+            try:
+                card = AgentCard.model_validate(response.json())
+            except ValueError as e:     # JSONDecodeError and pydantic ValidationError
+                raise A2AClientJSONError(
+                    f"Failed to parse agent card from {card_url}: {e}") from e
+            if card != entry.card:
+                entry.a2a_client = None     # card (and maybe url) changed
+            entry.card = card
+            entry.etag = response.headers.get("etag")
+            entry.last_modified = response.headers.get("last-modified")
+        entry.card_fetched_at = time.monotonic()
+        if self.disk_cache:
+            self._store_to_disk(target_url, entry)
+
+    async def _resolve_card(self, target_url: str, entry: _ClientEntry, refresh: bool = False) -> None:
+        if entry.card is None and self.disk_cache and not refresh:
+            self._load_from_disk(target_url, entry)
+            if self._card_fresh(entry):
+                entry.stats["disk_hits"] += 1
+        if refresh or not self._card_fresh(entry):
+            try:
+                await self._fetch_card(target_url, entry)
+            except A2AClientHTTPError:
+                if entry.card is None or self._card_age(entry) >= self.max_stale:
+                    raise
+                entry.stats["stale_served"] += 1
+
+    async def get_card(self, target_url: str, refresh: bool = False) -> AgentCard:
+        """
+        Resolve the AgentCard of *target_url*. A card younger than the TTL
+        (in memory, or on disk from an earlier run) is used as is; an older
+        one is revalidated, and still served for up to max_stale seconds if
+        the agent cannot be reached.
+        """
+        entry = await self._entry(target_url)
+        async with self._leased(entry):
+            await self._resolve_card(target_url, entry, refresh)
+        return entry.card
+
+    async def _bind_client(self, target_url: str, entry: _ClientEntry) -> A2AClient:
+        """Resolve the card of a leased entry and return its A2AClient."""
+        await self._resolve_card(target_url, entry)
+        if entry.a2a_client is None:
+            entry.a2a_client = A2AClient(httpx_client=entry.httpx_client, agent_card=entry.card)
+        entry.stats["requests"] += 1
+        return entry.a2a_client
+
+    async def get_client(self, target_url: str) -> A2AClient:
+        """
+        Return a pooled A2AClient for *target_url*. Do not close it yourself.
+        It may be evicted once idle; use lease() to keep it open across a request.
+        """
+        entry = await self._entry(target_url)
+        async with self._leased(entry):
+            return await self._bind_client(target_url, entry)
+
+    @contextlib.asynccontextmanager
+    async def lease(self, target_url: str) -> AsyncIterator[A2AClient]:
+        """The pooled A2AClient of *target_url*, not evicted or closed until the block exits."""
+        entry = await self._entry(target_url)
+        async with self._leased(entry):
+            yield await self._bind_client(target_url, entry)
+
+    async def get_http_client(self, target_url: str) -> httpx.AsyncClient:
+        """The pooled httpx client of *target_url*, for plain HTTP calls to the agent."""
+        return (await self._entry(target_url)).httpx_client
+
+    @contextlib.asynccontextmanager
+    async def lease_http(self, target_url: str) -> AsyncIterator[httpx.AsyncClient]:
+        """get_http_client() as a lease, like lease()."""
+        async with self._leased(await self._entry(target_url)) as entry:
+            yield entry.httpx_client
+
+    def invalidate(self, target_url: str) -> None:
+        """
+        Forget the cached card of *target_url*, in memory and on disk; the
+        connection pools are kept.
+        """
+        key = self._key(target_url)
+        for pool in self._pools.values():
+            entry = pool.entries.get(key)
+            if entry is not None:
+                entry.card = None
+                entry.etag = entry.last_modified = None
+                entry.a2a_client = None
+        if self.disk_cache:
+            clear_card_cache(target_url)
+
+    async def close(self, target_url: Optional[str] = None) -> None:
+        """
+        Close the client of *target_url*, or of every target if omitted, on
+        the running loop; clients with a lease in flight close when it ends.
+        Pools of other loops are closed when their loop shuts down.
+        """
+        pool = self._pools.get(asyncio.get_running_loop())
+        if pool is None:
+            return
+        if target_url is not None:
+            entry = pool.entries.pop(self._key(target_url), None)
+            if entry is not None:
+                await self._retire(entry)
+            return
+        await pool.closer.aclose()
+
+    async def __aenter__(self) -> "A2AClientManager":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    def stats(self) -> Dict[str, Any]:
+        """Open targets, per-target counters (summed over loops) and total LRU evictions."""
+        targets: Dict[str, Dict[str, int]] = {}
+        for pool in list(self._pools.values()):
+            for url, entry in pool.entries.items():
+                counters = targets.setdefault(url, dict.fromkeys(entry.stats, 0))
+                for name, value in entry.stats.items():
+                    counters[name] += value
+        return {
+            "open_clients": sum(len(pool.entries) for pool in list(self._pools.values())),
+            "evictions": self._evictions,
+            "targets": targets,
+        }
+
+
+_default_manager: Optional[A2AClientManager] = None
+
+
+def get_a2a_client_manager() -> A2AClientManager:
+    """Return the process-wide A2AClientManager used by the send_message_* helpers."""
+    global _default_manager
+    if _default_manager is None:
+        _default_manager = A2AClientManager()
+    return _default_manager
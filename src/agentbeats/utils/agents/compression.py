@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+"""
+Negotiated compression and request size limits for A2A traffic.
+
+Server side, CompressionMiddleware compresses JSON responses for clients
+that accept it, decompresses compressed request bodies, rejects requests
+over a size limit with 413, and advertises the request encodings it accepts
+in an `Accept-Encoding` response header (RFC 7694). Client side,
+request_compression_hook() compresses large request bodies once the target
+has advertised support. zstd is used when the optional `zstandard` package
+is installed (`pip install zstandard`), gzip otherwise; httpx decodes
+compressed responses on its own.
+"""
+
+import gzip
+import zlib
+from typing import Any, Callable, List, Optional
+
+import httpx
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# never buffer streamed responses (message/stream SSE)
+_STREAMING_CONTENT_TYPES = (b"text/event-stream",)
+
+
+class PayloadTooLarge(ValueError):
+    """A (decompressed) request body exceeds the configured maximum size."""
+
+
+def supported_encodings() -> List[str]:
+    """Encodings this process can compress and decompress, preferred first."""
+    return ["zstd", "gzip"] if zstandard is not None else ["gzip"]
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """Best supported encoding allowed by an Accept-Encoding header, or None."""
+    accepted = {}
+    for item in accept_encoding.lower().split(","):
+        name, _, params = item.strip().partition(";")
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip()] = quality
+    for encoding in supported_encodings():
+        if accepted.get(encoding, accepted.get("*", 0.0)) > 0:
+            return encoding
+    return None
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=3).compress(data)
+    return gzip.compress(data, compresslevel=6)
+
+
+def decompress(data: bytes, encoding: str, max_size: Optional[int] = None) -> bytes:
+    """Decompress *data*; raises PayloadTooLarge past *max_size* without inflating it all."""
+    limit = max_size if max_size is not None else -1
+    if encoding == "zstd" and zstandard is not None:
+        reader = zstandard.ZstdDecompressor().stream_reader(data)
+        out = reader.read(limit + 1 if limit >= 0 else -1)
+    elif encoding == "gzip":
+        decoder = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        out = decoder.decompress(data, limit + 1 if limit >= 0 else 0)
+    else:
+        raise ValueError(f"Unsupported content encoding: {encoding}")
+    if limit >= 0 and len(out) > limit:
+        raise PayloadTooLarge(f"Request body exceeds {max_size} bytes")
+    return out
+
+
+async def _plain_response(send, status: int, text: str) -> None:
+    body = text.encode()
+    await send({"type": "http.response.start", "status": status,
+                "headers": [(b"content-type", b"text/plain; charset=utf-8"),
+                            (b"content-length", str(len(body)).encode())]})
+    await send({"type": "http.response.body", "body": body})
+
+
+class CompressionMiddleware:
+    """
+    Pure ASGI middleware: response compression (non-streaming responses of
+    at least minimum_size bytes), request decompression and a request body
+    limit (max_request_size bytes after decompression, None for no limit).
+    """
+
+    def __init__(self, app: Any, minimum_size: int = 1024,
+                 max_request_size: Optional[int] = None) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        self.max_request_size = max_request_size
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        content_encoding = headers.get(b"content-encoding", b"").decode().strip().lower()
+        if content_encoding or self.max_request_size is not None:
+            try:
+                scope, receive = await self._read_request(scope, receive, content_encoding)
+            except PayloadTooLarge as e:
+                await _plain_response(send, 413, str(e))
+                return
+            except (ValueError, zlib.error) as e:
+                status = 415 if "Unsupported" in str(e) else 400
+                await _plain_response(send, status, str(e))
+                return
+
+        encoding = choose_encoding(headers.get(b"accept-encoding", b"").decode())
+        await self.app(scope, receive, self._wrap_send(send, encoding))
+
+    async def _read_request(self, scope, receive, content_encoding: str):
+        """Buffer the body, enforce the limit and undo Content-Encoding."""
+        limit = self.max_request_size
+        declared = dict(scope["headers"]).get(b"content-length")
+        if limit is not None and not content_encoding and declared and int(declared) > limit:
+            raise PayloadTooLarge(f"Request body exceeds {limit} bytes")
+
+        body = b""
+        more_body = True
+        while more_body:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                break
+            body += message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if limit is not None and not content_encoding and len(body) > limit:
+                raise PayloadTooLarge(f"Request body exceeds {limit} bytes")
+
+        if content_encoding and content_encoding != "identity":
+            if content_encoding not in supported_encodings():
+                raise ValueError(f"Unsupported content encoding: {content_encoding}")
+            body = decompress(body, content_encoding, limit)
+            request_headers = [(k, v) for k, v in scope["headers"]
+                               if k not in (b"content-encoding", b"content-length")]
+            request_headers.append((b"content-length", str(len(body)).encode()))
+            scope = dict(scope, headers=request_headers)
+
+        sent = False
+
+        async def _receive():
+            nonlocal sent
+            if sent:
+                return await receive()      # only http.disconnect is left
+            sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+
+        return scope, _receive
+
+    def _wrap_send(self, send, encoding: Optional[str]):
+        accept_header = (b"accept-encoding", ", ".join(supported_encodings()).encode())
+        start = None
+
+        async def _send(message):
+            nonlocal start
+            if message["type"] == "http.response.start":
+                start = dict(message, headers=list(message.get("headers", [])) + [accept_header])
+                return
+            if start is None or message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            response_start, start = start, None
+            headers = dict(response_start["headers"])
+            body = message.get("body", b"")
+            if (encoding is None or message.get("more_body")
+                    or len(body) < self.minimum_size
+                    or b"content-encoding" in headers
+                    or headers.get(b"content-type", b"").startswith(_STREAMING_CONTENT_TYPES)):
+                await send(response_start)
+                await send(message)
+                return
+
+            body = compress(body, encoding)
+            response_headers = [(k, v) for k, v in response_start["headers"]
+                                if k.lower() != b"content-length"]
+            response_headers += [(b"content-encoding", encoding.encode()),
+                                 (b"content-length", str(len(body)).encode()),
+                                 (b"vary", b"Accept-Encoding")]
+            await send(dict(response_start, headers=response_headers))
+            await send({"type": "http.response.body", "body": body})
+
+        return _send
+
+
+def request_compression_hook(get_encoding: Callable[[], Optional[str]],
+                             minimum_size: int = 1024):
+    """
+    httpx request event hook compressing bodies of at least *minimum_size*
+    bytes with the encoding returned by *get_encoding* (None: send as is).
+    """
+    async def _hook(request: httpx.Request) -> None:
+        encoding = get_encoding()
+        if encoding is None or "content-encoding" in request.headers:
+            return
+        if not isinstance(request.stream, httpx.ByteStream):
+            return      # streamed upload, size unknown
+        body = request.content
+        if len(body) < minimum_size:
+            return
+        body = compress(body, encoding)
+        request.headers["Content-Encoding"] = encoding
+        request.headers["Content-Length"] = str(len(body))
+        request.stream = httpx.ByteStream(body)
+
+    return _hook
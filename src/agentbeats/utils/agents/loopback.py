@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+"""
+In-process loopback transport for co-hosted A2A agents.
+
+Agents served from this process register their request handler under their
+URLs once their server's event loop is running. Sends to such a URL from the
+same loop skip HTTP / JSON-RPC / SSE and consume the handler's event stream
+directly. Set AGENTBEATS_DISABLE_LOOPBACK=1 to always go over HTTP.
+"""
+
+import os
+import asyncio
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, Optional
+from urllib.parse import urlsplit
+
+from a2a.utils.errors import ServerError
+
+_LOOPBACK_HOSTS = ("localhost", "127.0.0.1", "0.0.0.0", "::1", "[::1]")
+
+
+@dataclass
+class _LocalAgent:
+    handler: Any        # a2a DefaultRequestHandler
+    loop: asyncio.AbstractEventLoop
+
+
+_local_agents: Dict[str, _LocalAgent] = {}
+
+
+def loopback_disabled() -> bool:
+    return os.getenv("AGENTBEATS_DISABLE_LOOPBACK", "").lower() in ("1", "true", "yes")
+
+
+def _normalize(url: str) -> str:
+    """http://127.0.0.1:8001/green/ and http://localhost:8001/green name the same agent."""
+    parts = urlsplit(url.strip())
+    host = (parts.hostname or "").lower()
+    if host in _LOOPBACK_HOSTS:
+        host = "localhost"
+    port = parts.port or (443 if parts.scheme == "https" else 80)
+    return f"{parts.scheme.lower()}://{host}:{port}{parts.path.rstrip('/')}"
+
+
+def register_local_agent(urls: Iterable[str], handler: Any) -> None:
+    """Serve *urls* from *handler* for callers on the currently running loop."""
+    entry = _LocalAgent(handler, asyncio.get_running_loop())
+    for url in urls:
+        if url:
+            _local_agents[_normalize(url)] = entry
+
+
+def unregister_local_agent(handler: Any) -> None:
+    for key in [k for k, entry in _local_agents.items() if entry.handler is handler]:
+        del _local_agents[key]
+
+
+def get_local_handler(target_url: str) -> Optional[Any]:
+    """Request handler for *target_url* if it lives in this process and on this loop."""
+    if not _local_agents or loopback_disabled():
+        return None
+    entry = _local_agents.get(_normalize(target_url))
+    if entry is None:
+        return None
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+    # handler state (queues, MCP sessions) is bound to the server's loop
+    return entry.handler if entry.loop is running else None
+
+
+class LoopbackLifespan:
+    """
+    Pure ASGI wrapper registering an agent for loopback calls between
+    lifespan startup and shutdown, i.e. while its server loop runs. On
+    shutdown the agent also closes its push notification client.
+    """
+
+    def __init__(self, app: Any, agent: Any) -> None:
+        self.app = app
+        self.agent = agent
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "lifespan":
+            await self.app(scope, receive, send)
+            return
+
+        async def _receive():
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                self.agent._register_loopback()
+            elif message["type"] == "lifespan.shutdown":
+                await self.agent._shutdown()
+            return message
+
+        await self.app(scope, _receive, send)
+
+
+_END = object()
+
+
+def agent_error(exc: Exception) -> Exception:
+    """
+    The exception a loopback caller sees for a failed handler call: A2A
+    errors read like the JSON-RPC errors of the HTTP path, others are kept.
+    """
+    if isinstance(exc, ServerError):
+        message = exc.error.message if exc.error is not None else str(exc)
+        error = RuntimeError(f"Agent returned an error: {message}")
+        error.__cause__ = exc
+        return error
+    return exc
+
+
+class LocalEventStream:
+    """
+    Async iterator over the events of handler.on_message_send_stream().
+    The handler runs in its own task so that closing the stream (cutoffs,
+    early exit) never waits for the agent turn to finish, just like dropping
+    an HTTP connection. An exception of the handler is raised to the
+    consumer once the events before it are consumed. The first event
+    counts as a success for *breaker*, as over HTTP.
+    """
+
+    def __init__(self, handler: Any, params: Any, breaker: Any = None) -> None:
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._closing = False
+        self._breaker = breaker
+        self._answered = False
+        self._task = asyncio.create_task(self._pump(handler, params))
+
+    async def _pump(self, handler: Any, params: Any) -> None:
+        try:
+            async for event in handler.on_message_send_stream(params):
+                self._queue.put_nowait(event)
+        except asyncio.CancelledError:
+            if self._closing:
+                raise
+            # the SDK re-raises the producer's cancellation (tasks/cancel)
+            # after the final canceled event; that ends the stream
+        except Exception as e:
+            self._queue.put_nowait(agent_error(e))
+        finally:
+            self._queue.put_nowait(_END)
+
+    def __aiter__(self) -> "LocalEventStream":
+        return self
+
+    async def __anext__(self) -> Any:
+        item = await self._queue.get()
+        if item is _END:
+            raise StopAsyncIteration
+        if isinstance(item, Exception):
+            raise item
+        if self._breaker is not None and not self._answered:
+            self._breaker.record_success()      # the agent is up and answering
+            self._answered = True
+        return item
+
+    async def aclose(self) -> None:
+        if not self._task.done():
+            self._closing = True
+            self._task.cancel()
@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+"""
+A2A push-notification delivery for long-running tasks.
+
+Instead of holding a streaming connection open for the whole turn, the caller
+sends a non-blocking message/send with a webhook, gets the task id back right
+away and receives task snapshots on the webhook as the task progresses:
+
+    async with PushNotificationReceiver() as receiver:
+        task_id = await send_message_with_push(url, "start the battle", receiver)
+        ...                                 # do other work
+        result = await receiver.wait_for_result(task_id, timeout=600)
+"""
+
+import json
+import socket
+import asyncio
+import secrets
+from uuid import uuid4
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from a2a.types import (
+    JSONRPCErrorResponse,
+    Message,
+    MessageSendConfiguration,
+    MessageSendParams,
+    Part,
+    PushNotificationConfig,
+    Role,
+    SendMessageRequest,
+    Task,
+    TextPart,
+)
+
+from .a2a import task_text
+from .client_manager import get_a2a_client_manager
+from .loopback import get_local_handler
+
+TOKEN_HEADER = "X-A2A-Notification-Token"
+_TERMINAL_STATES = ("completed", "canceled", "failed", "rejected")
+
+
+class PushNotificationReceiver:
+    """
+    Webhook endpoint collecting A2A push notifications. Runs a small uvicorn
+    server on the current loop (port 0 picks a free port), or can be mounted
+    into an existing ASGI app through `asgi_app`. Notifications without the
+    receiver's token are rejected.
+    """
+
+    def __init__(self,
+                 host: str = "127.0.0.1",
+                 port: int = 0,
+                 path: str = "/a2a/push",
+                 public_url: Optional[str] = None,
+                 token: Optional[str] = None,
+                 max_tasks: int = 1024):
+        """
+        public_url: webhook URL as seen by the agents, if they cannot reach host:port
+        max_tasks: snapshots kept for tasks nobody has waited for yet; the
+                   least recently updated ones are dropped beyond that
+        """
+        self.host = host
+        self.port = port
+        self.path = path
+        self.public_url = public_url
+        self.token = token or secrets.token_urlsafe(16)
+        self.max_tasks = max_tasks
+        # snapshots until wait_for_task() has returned them, least recently updated first
+        self._tasks: "OrderedDict[str, Task]" = OrderedDict()
+        # final snapshot of each task, shared by all its waiters
+        self._results: Dict[str, asyncio.Future] = {}
+        self._server = None
+        self._serve_task: Optional[asyncio.Task] = None
+
+    @property
+    def url(self) -> str:
+        if self.public_url:
+            return self.public_url
+        return f"http://{self.host}:{self.port}{self.path}"
+
+    def push_config(self) -> PushNotificationConfig:
+        return PushNotificationConfig(url=self.url, token=self.token)
+
+    def _result(self, task_id: str) -> asyncio.Future:
+        future = self._results.get(task_id)
+        if future is None:
+            future = self._results[task_id] = asyncio.get_running_loop().create_future()
+        return future
+
+    async def asgi_app(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            return
+        status = 204
+        if scope["method"] != "POST" or scope["path"] != self.path:
+            status = 404
+        elif dict(scope["headers"]).get(TOKEN_HEADER.lower().encode(), b"").decode() != self.token:
+            status = 401
+        else:
+            body = b""
+            while True:
+                message = await receive()
+                body += message.get("body", b"")
+                if not message.get("more_body"):
+                    break
+            try:
+                self._on_notification(Task.model_validate(json.loads(body)))
+            except ValueError:
+                status = 400
+        await send({"type": "http.response.start", "status": status, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    def _on_notification(self, task: Task) -> None:
+        self._tasks[task.id] = task
+        self._tasks.move_to_end(task.id)
+        if task.status.state.value in _TERMINAL_STATES:
+            future = self._result(task.id)
+            if not future.done():
+                future.set_result(task)
+        while len(self._tasks) > self.max_tasks:
+            task_id, _ = self._tasks.popitem(last=False)
+            future = self._results.get(task_id)
+            if future is not None and future.done():
+                del self._results[task_id]      # current waiters keep their reference
+
+    def get_task(self, task_id: str) -> Optional[Task]:
+        """
+        Latest snapshot pushed for *task_id* (None if nothing arrived yet,
+        or once wait_for_task() has returned it).
+        """
+        return self._tasks.get(task_id)
+
+    async def wait_for_task(self, task_id: str, timeout: Optional[float] = None) -> Task:
+        """
+        Wait until *task_id* reaches a terminal state and return its final
+        snapshot; the receiver forgets the task afterwards.
+        """
+        task = await asyncio.wait_for(asyncio.shield(self._result(task_id)), timeout)
+        self._tasks.pop(task_id, None)
+        self._results.pop(task_id, None)
+        return task
+
+    async def wait_for_result(self, task_id: str, timeout: Optional[float] = None) -> str:
+        """Wait for *task_id* to finish and return its response text."""
+        task = await self.wait_for_task(task_id, timeout)
+        if task.status.state.value != "completed":
+            return f"Error: Task {task.status.state.value}"
+        return task_text(task) or "No response from agent."
+
+    async def start(self) -> "PushNotificationReceiver":
+        import uvicorn
+
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((self.host, self.port))
+        self.port = sock.getsockname()[1]
+        self._server = uvicorn.Server(uvicorn.Config(self.asgi_app, interface="asgi3",
+                                                     lifespan="off", log_level="warning"))
+        self._serve_task = asyncio.create_task(self._server.serve(sockets=[sock]))
+        while not self._server.started:
+            if self._serve_task.done():
+                self._serve_task.result()
+            await asyncio.sleep(0.01)
+        return self
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.should_exit = True
+            await self._serve_task
+            self._server = None
+
+    async def __aenter__(self) -> "PushNotificationReceiver":
+        return await self.start()
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.stop()
+
+
+async def send_message_with_push(target_url: str,
+                                 message: str,
+                                 webhook: Any = None,
+                                 token: Optional[str] = None,
+                                 context_id: Optional[str] = None) -> str:
+    """
+    Start a task on an A2A agent without waiting for it and return its task id.
+    *webhook* is a PushNotificationReceiver or a webhook URL (then pass *token*);
+    None starts the task fire-and-forget.
+    """
+    if isinstance(webhook, PushNotificationReceiver):
+        push_config = webhook.push_config()
+    elif webhook is not None:
+        push_config = PushNotificationConfig(url=webhook, token=token)
+    else:
+        push_config = None
+
+    params = MessageSendParams(
+        message=Message(
+            role=Role.user,
+            parts=[Part(TextPart(text=message))],
+            messageId=uuid4().hex,
+            contextId=context_id,
+        ),
+        configuration=MessageSendConfiguration(
+            acceptedOutputModes=["text"],
+            blocking=False,
+            pushNotificationConfig=push_config,
+        ),
+    )
+
+    handler = get_local_handler(target_url)
+    if handler is not None:
+        result = await handler.on_message_send(params.model_copy(deep=True))
+    else:
+        async with get_a2a_client_manager().lease(target_url) as client:
+            response = await client.send_message(SendMessageRequest(id=str(uuid4()), params=params))
+        if isinstance(response.root, JSONRPCErrorResponse):
+            raise RuntimeError(f"Agent rejected the message: {response.root.error.message}")
+        result = response.root.result
+
+    if not isinstance(result, Task):
+        raise RuntimeError("Agent answered directly instead of starting a task")
+    return result.id
@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+"""
+Retry policy and per-target circuit breakers for A2A sends.
+
+A breaker opens after `failure_threshold` consecutive failures of a target
+and fails sends fast with CircuitOpenError until `recovery_timeout` seconds
+have passed. A single send is then let through as a trial, and the others
+keep failing fast until it finishes: success closes the breaker, failure
+opens it again.
+"""
+
+import time
+import random
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+import httpx
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of sending to a target whose circuit breaker is open."""
+
+    def __init__(self, target_url: str, retry_in: float):
+        self.target_url = target_url
+        self.retry_in = retry_in
+        super().__init__(f"Circuit open for {target_url} (retry in {retry_in:.1f}s)")
+
+
+@dataclass
+class RetryPolicy:
+    """Exponential backoff with full jitter: delay = uniform(0, min(max_delay, base_delay * multiplier**n))."""
+    max_attempts: int = 3
+    base_delay: float = 0.5
+    max_delay: float = 10.0
+    multiplier: float = 2.0
+
+    def __post_init__(self):
+        if self.max_attempts < 1:
+            raise ValueError("max_attempts must be at least 1")
+        if self.base_delay < 0 or self.max_delay < 0:
+            raise ValueError("delays must not be negative")
+
+    def delay(self, attempt: int) -> float:
+        """Sleep before retry number *attempt* (0-based)."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * self.multiplier ** attempt))
+
+
+def is_retryable(exc: BaseException, idempotent: bool) -> bool:
+    """
+    Connection failures never reached the agent and are always retryable.
+    Other transport / 5xx / 429 errors may have been processed by the agent,
+    so they are only retried for idempotent sends.
+    """
+    if isinstance(exc, CircuitOpenError):
+        return False
+    cause = exc.__cause__ or exc
+    if isinstance(cause, (httpx.ConnectError, httpx.ConnectTimeout)):
+        return True
+    if not idempotent:
+        return False
+    if isinstance(cause, httpx.TransportError):
+        return True
+    status_code = getattr(exc, "status_code", None)
+    return status_code is not None and (status_code >= 500 or status_code == 429)
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker for one target URL."""
+
+    def __init__(self, target_url: str, failure_threshold: int = 5, recovery_timeout: float = 30.0):
+        self.target_url = target_url
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        # half-open: start of the one trial send let through, None if no trial is running
+        self.trial_started_at: Optional[float] = None
+        self.total_failures = 0
+        self.total_rejected = 0
+        # sends from tool threads share the breaker
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return CLOSED
+        if time.monotonic() - self.opened_at >= self.recovery_timeout:
+            return HALF_OPEN
+        return OPEN
+
+    def retry_in(self) -> float:
+        if self.opened_at is None:
+            return 0.0
+        return max(0.0, self.recovery_timeout - (time.monotonic() - self.opened_at))
+
+    @property
+    def trial_in_flight(self) -> bool:
+        # a trial that never reported back (e.g. cancelled) expires after recovery_timeout
+        return (self.trial_started_at is not None
+                and time.monotonic() - self.trial_started_at < self.recovery_timeout)
+
+    def check(self) -> None:
+        """
+        Raise CircuitOpenError if the target should not be contacted now.
+        When half-open, only the first caller passes; it must report the
+        outcome with record_success() or record_failure().
+        """
+        with self._lock:
+            state = self.state
+            if state == HALF_OPEN and not self.trial_in_flight:
+                self.trial_started_at = time.monotonic()
+                return
+            if state != CLOSED:
+                self.total_rejected += 1
+                raise CircuitOpenError(self.target_url, self.retry_in())
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_started_at = None
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            self.total_failures += 1
+            # a failed half-open trial re-opens immediately
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self.trial_started_at = None
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "retry_in": round(self.retry_in(), 3),
+            "trial_in_flight": self.trial_in_flight,
+            "total_failures": self.total_failures,
+            "total_rejected": self.total_rejected,
+        }
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+_breaker_config = {"enabled": True, "failure_threshold": 5, "recovery_timeout": 30.0}
+
+
+def configure_circuit_breakers(enabled: Optional[bool] = None,
+                               failure_threshold: Optional[int] = None,
+                               recovery_timeout: Optional[float] = None) -> None:
+    """Change breaker settings; existing breakers keep their state but pick up the new limits."""
+    if failure_threshold is not None and failure_threshold < 1:
+        raise ValueError("failure_threshold must be at least 1")
+    updates = {"enabled": enabled, "failure_threshold": failure_threshold,
+               "recovery_timeout": recovery_timeout}
+    _breaker_config.update({k: v for k, v in updates.items() if v is not None})
+    with _breakers_lock:
+        for breaker in _breakers.values():
+            breaker.failure_threshold = _breaker_config["failure_threshold"]
+            breaker.recovery_timeout = _breaker_config["recovery_timeout"]
+
+
+def get_circuit_breaker(target_url: str) -> Optional[CircuitBreaker]:
+    """Return the breaker of *target_url*, or None when breakers are disabled."""
+    if not _breaker_config["enabled"]:
+        return None
+    key = target_url.rstrip("/")
+    with _breakers_lock:
+        breaker = _breakers.get(key)
+        if breaker is None:
+            breaker = _breakers[key] = CircuitBreaker(
+                key, _breaker_config["failure_threshold"], _breaker_config["recovery_timeout"])
+        return breaker
+
+
+def get_circuit_states() -> Dict[str, Dict[str, Any]]:
+    """Breaker snapshot (state, failures, retry_in, totals) for every target seen so far."""
+    with _breakers_lock:
+        return {url: breaker.snapshot() for url, breaker in _breakers.items()}
+
+
+def is_agent_available(target_url: str) -> bool:
+    """False while the target's breaker is open, so orchestrators can skip it."""
+    with _breakers_lock:
+        breaker = _breakers.get(target_url.rstrip("/"))
+    return breaker is None or breaker.state != OPEN
+
+
+def reset_circuit_breakers(target_url: Optional[str] = None) -> None:
+    """Forget the state of one target's breaker, or of all of them."""
+    with _breakers_lock:
+        if target_url is None:
+            _breakers.clear()
+        else:
+            _breakers.pop(target_url.rstrip("/"), None)
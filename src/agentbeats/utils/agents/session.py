@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+"""
+Multi-turn A2A conversations with one peer agent.
+"""
+
+import time
+import asyncio
+from uuid import uuid4
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from . import a2a
+from .a2a import CutoffChunk, StatusChunk, StreamChunk
+from .resilience import RetryPolicy, is_retryable
+
+# states in which the peer expects a follow-up within the same task
+_RESUMABLE_STATES = ("input-required", "auth-required")
+
+
+class A2ASession:
+    """
+    A conversation with one agent that pins a contextId, so every message is
+    part of the same A2A context, and continues the current task while the
+    peer asks for more input. Messages go over the pooled client of the
+    process-wide A2AClientManager.
+    """
+
+    def __init__(self,
+                 target_url: str,
+                 context_id: Optional[str] = None,
+                 retry: Optional[RetryPolicy] = None):
+        self.target_url = target_url
+        self.context_id = context_id or uuid4().hex
+        self.retry = retry
+        self.task_id: Optional[str] = None      # set while the peer awaits input
+        self._latencies: List[float] = []
+        self._first_chunk_latencies: List[float] = []
+        self._errors = 0
+        self._retries = 0
+        self._cutoffs = 0
+        self._bytes_received = 0
+
+    async def stream(self,
+                     message: str,
+                     max_bytes: Optional[int] = None,
+                     max_time: Optional[float] = None) -> AsyncIterator[StreamChunk]:
+        """Send *message* within the session and yield response chunks as they arrive."""
+        async for chunk in self._stream(message, max_bytes, max_time, retry=None):
+            yield chunk
+
+    async def send(self,
+                   message: str,
+                   max_bytes: Optional[int] = None,
+                   max_time: Optional[float] = None) -> str:
+        """Send *message* within the session and return the joined response text."""
+        chunks: List[str] = []
+        async for chunk in self._stream(message, max_bytes, max_time, retry=self.retry):
+            if isinstance(chunk, CutoffChunk):
+                chunks.append(f"\n[response cut off: {chunk.reason} reached]")
+            else:
+                chunks.append(chunk.text)
+        return "".join(chunks).strip() or "No response from agent."
+
+    async def _stream(self,
+                      message: str,
+                      max_bytes: Optional[int],
+                      max_time: Optional[float],
+                      retry: Optional[RetryPolicy]) -> AsyncIterator[StreamChunk]:
+        """
+        One logical send: its retries count in `retries` only, and its latency
+        runs from the first attempt to the end of the response.
+        """
+        start = time.perf_counter()
+        first_chunk = True
+        attempt = 0
+        try:
+            while True:
+                try:
+                    async for chunk in a2a.stream_message_to_agent(
+                            self.target_url, message, max_bytes=max_bytes, max_time=max_time,
+                            context_id=self.context_id, task_id=self.task_id):
+                        if first_chunk:
+                            self._first_chunk_latencies.append(time.perf_counter() - start)
+                            first_chunk = False
+                        self._track(chunk)
+                        yield chunk
+                    return
+                except Exception as e:
+                    self.task_id = None
+                    # the session's own context makes a repeated message a duplicate
+                    # turn, so only sends that never reached the peer are retried
+                    if (retry is None or not first_chunk or attempt + 1 >= retry.max_attempts
+                            or not is_retryable(e, idempotent=False)):
+                        raise
+                    await asyncio.sleep(retry.delay(attempt))
+                    attempt += 1
+                    self._retries += 1
+        except Exception:
+            self._errors += 1
+            raise
+        finally:
+            self._latencies.append(time.perf_counter() - start)
+
+    def _track(self, chunk: StreamChunk) -> None:
+        self._bytes_received += len(chunk.text.encode())
+        if isinstance(chunk, CutoffChunk):
+            self._cutoffs += 1
+            self.task_id = None         # the remote task was cancelled
+        elif isinstance(chunk, StatusChunk):
+            self.context_id = chunk.context_id or self.context_id
+            self.task_id = chunk.task_id if chunk.state in _RESUMABLE_STATES else None
+
+    def reset(self) -> None:
+        """Start a fresh context with the peer (stats are kept)."""
+        self.context_id = uuid4().hex
+        self.task_id = None
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Message counters and latency figures (seconds) for this session. A
+        retried send counts as one message; its extra attempts count in
+        `retries`.
+        """
+        latencies = self._latencies
+        first = self._first_chunk_latencies
+        return {
+            "target_url": self.target_url,
+            "context_id": self.context_id,
+            "messages": len(latencies),
+            "errors": self._errors,
+            "retries": self._retries,
+            "cutoffs": self._cutoffs,
+            "bytes_received": self._bytes_received,
+            "last_latency": latencies[-1] if latencies else None,
+            "avg_latency": sum(latencies) / len(latencies) if latencies else None,
+            "max_latency": max(latencies) if latencies else None,
+            "avg_first_chunk_latency": sum(first) / len(first) if first else None,
+        }
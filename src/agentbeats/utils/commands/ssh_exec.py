@@ -0,0 +1,335 @@
+# -*- coding: utf-8 -*-
+"""
+Streaming, size-capped remote command execution.
+
+Output is read from the channel as it arrives, handed to an optional
+callback, and kept in a bounded head/tail buffer per stream, so a command
+that prints megabytes (`find / -name '*flag*'`) costs constant memory and
+leaves a short, still useful excerpt for the LLM context.
+"""
+
+import re
+import time
+import uuid
+import codecs
+import threading
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import paramiko
+
+DEFAULT_MAX_OUTPUT = 64 * 1024
+_READ_SIZE = 32768
+_POLL_INTERVAL = 0.005
+
+# on_output(stream, text) with stream "stdout" or "stderr"
+OutputCallback = Callable[[str, str], None]
+
+
+@dataclass
+class OutputChunk:
+    """A piece of command output, as yielded by AsyncSSHClient.stream()."""
+    stream: str         # "stdout" or "stderr"
+    text: str
+
+
+@dataclass
+class CommandResult:
+    """Outcome of SSHClient.run(). stdout / stderr are head + tail excerpts if truncated."""
+    command: str
+    exit_status: Optional[int]          # None if the command was stopped
+    stdout: str
+    stderr: str
+    stdout_bytes: int                   # total bytes produced, kept or not
+    stderr_bytes: int
+    stdout_truncated: bool = False
+    stderr_truncated: bool = False
+    timed_out: bool = False
+    cancelled: bool = False
+    error: Optional[str] = None         # why a command neither exited nor was stopped
+    duration: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.exit_status == 0
+
+    @property
+    def truncated(self) -> bool:
+        return self.stdout_truncated or self.stderr_truncated
+
+    def to_text(self) -> str:
+        """The same "Success: / Warning: ..." report SSHClient.execute returns."""
+        if self.timed_out:
+            status = "timed out"
+        elif self.cancelled:
+            status = "cancelled"
+        elif self.error is not None:
+            status = f"failed ({self.error})"
+        else:
+            status = self.exit_status
+        result = f"Command: {self.command}\nExit Status: {status}\n"
+        if self.stdout:
+            result += f"Output:\n{self.stdout.strip()}\n"
+        if self.stderr:
+            result += f"Error:\n{self.stderr.strip()}\n"
+        return f"Success: {result}" if self.ok else f"Warning: {result}"
+
+
+class HeadTailBuffer:
+    """Keeps the first and last max_bytes / 2 bytes of a stream and counts the rest."""
+
+    def __init__(self, max_bytes: int):
+        self.head_limit = max_bytes // 2
+        self.tail_limit = max_bytes - self.head_limit
+        self.head = bytearray()
+        self.tail = bytearray()
+        self.total = 0
+
+    def feed(self, data: bytes) -> None:
+        self.total += len(data)
+        room = self.head_limit - len(self.head)
+        if room > 0:
+            self.head += data[:room]
+            data = data[room:]
+        if data:
+            self.tail += data
+            if len(self.tail) > self.tail_limit:
+                del self.tail[:len(self.tail) - self.tail_limit]
+
+    @property
+    def truncated(self) -> bool:
+        return self.total > len(self.head) + len(self.tail)
+
+    def text(self) -> str:
+        head = self.head.decode(errors="replace")
+        if not self.truncated:
+            return head + self.tail.decode(errors="replace")
+        omitted = self.total - len(self.head) - len(self.tail)
+        return (head + f"\n[... {omitted} bytes omitted ...]\n"
+                + self.tail.decode(errors="ignore"))
+
+
+def _pump_channel(channel: Any,
+                  sinks: Dict[str, Callable[[bytes], None]],
+                  start: float,
+                  timeout: Optional[float],
+                  cancel_event: Optional[threading.Event],
+                  done: Optional[Callable[[], bool]] = None) -> Tuple[Optional[int], bool, bool]:
+    """
+    Feed stdout / stderr data to *sinks* until the command exits, done()
+    returns True, the timeout passes or cancel_event is set. Returns
+    (exit_status, timed_out, cancelled); exit_status is None unless the
+    channel itself exited.
+    """
+    readers = {"stdout": (channel.recv_ready, channel.recv),
+               "stderr": (channel.recv_stderr_ready, channel.recv_stderr)}
+    while True:
+        got_data = False
+        for name, (ready, recv) in readers.items():
+            if ready():
+                data = recv(_READ_SIZE)
+                if data:
+                    got_data = True
+                    sinks[name](data)
+        if got_data:
+            if done is not None and done():
+                return None, False, False
+            continue
+        if channel.exit_status_ready():
+            # the status can arrive before the last buffered output
+            if not channel.recv_ready() and not channel.recv_stderr_ready():
+                return channel.recv_exit_status(), False, False
+            continue
+        if cancel_event is not None and cancel_event.is_set():
+            return None, False, True
+        if timeout is not None and time.monotonic() - start >= timeout:
+            return None, True, False
+        time.sleep(_POLL_INTERVAL)
+
+
+def run_on_transport(transport: paramiko.Transport,
+                     command: str,
+                     timeout: Optional[float] = None,
+                     max_output: int = DEFAULT_MAX_OUTPUT,
+                     on_output: Optional[OutputCallback] = None,
+                     cancel_event: Optional[threading.Event] = None) -> CommandResult:
+    """
+    Run *command* on a new session channel of *transport* and read its output
+    incrementally. The channel is closed (which stops the remote command)
+    when *timeout* seconds have passed or *cancel_event* is set.
+    """
+    start = time.monotonic()
+    buffers = {"stdout": HeadTailBuffer(max_output), "stderr": HeadTailBuffer(max_output)}
+    decoders = {name: codecs.getincrementaldecoder("utf-8")(errors="replace") for name in buffers}
+
+    def _sink(name: str) -> Callable[[bytes], None]:
+        def _feed(data: bytes) -> None:
+            buffers[name].feed(data)
+            if on_output is not None:
+                on_output(name, decoders[name].decode(data))
+        return _feed
+
+    channel = transport.open_session()
+    try:
+        channel.exec_command(command)
+        exit_status, timed_out, cancelled = _pump_channel(
+            channel, {name: _sink(name) for name in buffers}, start, timeout, cancel_event)
+    finally:
+        channel.close()
+
+    out, err = buffers["stdout"], buffers["stderr"]
+    return CommandResult(
+        command=command,
+        exit_status=exit_status,
+        stdout=out.text(),
+        stderr=err.text(),
+        stdout_bytes=out.total,
+        stderr_bytes=err.total,
+        stdout_truncated=out.truncated,
+        stderr_truncated=err.truncated,
+        timed_out=timed_out,
+        cancelled=cancelled,
+        duration=time.monotonic() - start,
+    )
+
+
+class _ScriptDemux:
+    """
+    Splits one stream of a batch script into per-command HeadTailBuffers at
+    marker lines ("<marker>B<i>" begins command i, "<marker>E<i>[:status]" ends it).
+    """
+
+    def __init__(self, marker: bytes, count: int, max_output: int):
+        self.pattern = re.compile(rb"(?m)^" + re.escape(marker) + rb"([BE])(\d+)(?::(\d+))?\n")
+        self.marker = marker
+        self.buffers = [HeadTailBuffer(max_output) for _ in range(count)]
+        self.statuses: List[Optional[int]] = [None] * count
+        self.ended = [False] * count
+        self.current: Optional[int] = None
+        self.pending = b""              # possible start of a marker line
+        self.line_start = True          # data fed next starts a line
+        self.held_newline = False       # "\n" that may belong to an end marker
+
+    def _emit(self, data: bytes) -> None:
+        if self.current is None or not data:
+            return
+        if self.held_newline:
+            data = b"\n" + data
+        self.held_newline = data.endswith(b"\n")
+        if self.held_newline:
+            data = data[:-1]
+        self.buffers[self.current].feed(data)
+
+    def feed(self, data: bytes) -> None:
+        data = self.pending + data
+        self.pending = b""
+        pos = 0
+        for match in self.pattern.finditer(data):
+            index = int(match.group(2))
+            if (match.start() == 0 and not self.line_start) or index >= len(self.buffers):
+                continue
+            self._emit(data[pos:match.start()])
+            pos = match.end()
+            # the script prints "\n" before each end marker; drop it
+            self.held_newline = False
+            if match.group(1) == b"B":
+                self.current = index
+            else:
+                self.ended[index] = True
+                if match.group(3) is not None:
+                    self.statuses[index] = int(match.group(3))
+                self.current = None
+
+        rest = data[pos:]
+        newline = rest.rfind(b"\n")
+        tail_start = newline + 1 if newline != -1 else (0 if self.line_start or pos else None)
+        if tail_start is not None:
+            tail = rest[tail_start:]
+            if tail and (self.marker.startswith(tail) or tail.startswith(self.marker)) \
+                    and len(tail) < len(self.marker) + 24:
+                self.pending = tail
+                rest = rest[:tail_start]
+        self._emit(rest)
+        self.line_start = bool(self.pending) or data.endswith(b"\n")
+
+    def flush(self) -> None:
+        self._emit(self.pending)
+        self.pending = b""
+        if self.held_newline and self.current is not None:
+            self.buffers[self.current].feed(b"\n")
+        self.held_newline = False
+
+
+def _marked(index: int, marker: str, body: str) -> List[str]:
+    """Script lines running *body* between the begin and end markers of command *index*."""
+    return [
+        f"printf '%s\\n' '{marker}B{index}'; printf '%s\\n' '{marker}B{index}' >&2",
+        body,
+        f"printf '\\n%s\\n' \"{marker}E{index}:$?\"; printf '\\n%s\\n' '{marker}E{index}' >&2",
+    ]
+
+
+def _batch_script(commands: List[str], marker: str) -> str:
+    lines = []
+    for i, command in enumerate(commands):
+        # a subshell, so that `exit` or `cd` in one command doesn't affect the next;
+        # stdin is the script itself, which the command must not read
+        lines += _marked(i, marker, f"( {command}\n) < /dev/null")
+    return "\n".join(lines) + "\n"
+
+
+def run_batch_on_transport(transport: paramiko.Transport,
+                           commands: List[str],
+                           timeout: Optional[float] = None,
+                           max_output: int = DEFAULT_MAX_OUTPUT,
+                           cancel_event: Optional[threading.Event] = None) -> List[CommandResult]:
+    """
+    Run *commands* one after another as a single remote script (one channel,
+    one round trip) and split the output back per command at marker lines.
+    The script is fed to `sh -s` on stdin, so no command text shows up in the
+    remote process list (where `pkill -f` would match the batch shell).
+    Commands the timeout cut short, or never started, get exit_status None;
+    so do those left unfinished when the script died, with error set.
+    """
+    start = time.monotonic()
+    marker = f"__AGENTBEATS_{uuid.uuid4().hex}_"
+    demux = {"stdout": _ScriptDemux(marker.encode(), len(commands), max_output),
+             "stderr": _ScriptDemux(marker.encode(), len(commands), max_output)}
+
+    channel = transport.open_session()
+    try:
+        channel.exec_command("sh -s")
+        channel.sendall(_batch_script(commands, marker).encode())
+        channel.shutdown_write()
+        _, timed_out, cancelled = _pump_channel(
+            channel, {name: d.feed for name, d in demux.items()}, start, timeout, cancel_event)
+    finally:
+        channel.close()
+    for d in demux.values():
+        d.flush()
+
+    duration = time.monotonic() - start
+    results = []
+    for i, command in enumerate(commands):
+        out, err = demux["stdout"].buffers[i], demux["stderr"].buffers[i]
+        exit_status = demux["stdout"].statuses[i]
+        stopped = exit_status is None and (timed_out or cancelled)
+        error = None
+        if exit_status is None and not stopped:
+            error = ("batch script ended during this command" if demux["stdout"].current == i
+                     or demux["stderr"].current == i else "batch script ended before this command")
+        results.append(CommandResult(
+            command=command,
+            exit_status=exit_status,
+            stdout=out.text(),
+            stderr=err.text(),
+            stdout_bytes=out.total,
+            stderr_bytes=err.total,
+            stdout_truncated=out.truncated,
+            stderr_truncated=err.truncated,
+            timed_out=timed_out and exit_status is None,
+            cancelled=cancelled and exit_status is None,
+            error=error,
+            duration=duration,
+        ))
+    return results
@@ -0,0 +1,269 @@
+# -*- coding: utf-8 -*-
+"""
+Process-wide pool of authenticated SSH connections.
+
+A paramiko transport multiplexes any number of channels, so one connection
+per (host, port, username, password) is shared by every SSHClient that
+targets it: tools borrow it with acquire() and give it back with release()
+instead of paying TCP, key exchange and authentication again. Connections
+get a keepalive, are health-checked before being handed out, and idle ones
+are closed after `idle_timeout` seconds or when the pool is full.
+"""
+
+import time
+import socket
+import hashlib
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional, Tuple
+
+import paramiko
+
+_PoolKey = Tuple[str, int, str, str]
+
+
+@dataclass
+class _PooledConnection:
+    key: _PoolKey
+    client: paramiko.SSHClient
+    label: str                          # user@host:port, for stats
+    borrowers: int = 0
+    last_used: float = field(default_factory=time.monotonic)
+    last_checked: float = field(default_factory=time.monotonic)
+
+
+@dataclass
+class _KeyLock:
+    lock: threading.Lock = field(default_factory=threading.Lock)
+    users: int = 0                      # acquire() calls holding or waiting for it
+
+
+class SSHConnectionPool:
+    """Shares one authenticated paramiko.SSHClient per host and credentials."""
+
+    def __init__(self,
+                 max_size: int = 32,
+                 idle_timeout: float = 300.0,
+                 keepalive: int = 30,
+                 health_check_interval: float = 30.0,
+                 connect_timeout: float = 10):
+        """
+        max_size: connections kept open; beyond it idle ones are evicted, and
+                  if none is idle the extra connection is closed on release
+        idle_timeout: seconds an unused connection stays open
+        keepalive: seconds between SSH keepalive packets (0 disables them)
+        health_check_interval: seconds after which a connection is probed
+                               again before being handed out
+        """
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.keepalive = keepalive
+        self.health_check_interval = health_check_interval
+        self.connect_timeout = connect_timeout
+        self._connections: Dict[_PoolKey, _PooledConnection] = {}
+        self._by_client: Dict[int, _PooledConnection] = {}
+        self._lock = threading.Lock()
+        self._key_locks: Dict[_PoolKey, _KeyLock] = {}
+        self._stats = {"connects": 0, "reuses": 0, "evictions": 0, "health_failures": 0}
+
+    @staticmethod
+    def _key(host: str, credentials: Dict[str, Any]) -> Tuple[_PoolKey, int, str]:
+        port = int(credentials.get("port", 22))
+        username = credentials.get("username", "root")
+        password = credentials.get("password", "")
+        digest = hashlib.sha256(password.encode()).hexdigest()
+        return (host, port, username, digest), port, f"{username}@{host}:{port}"
+
+    def acquire(self, host: str, credentials: Dict[str, Any]) -> paramiko.SSHClient:
+        """
+        Return a connected client for *host* / *credentials*, reusing a pooled
+        one when it is still healthy. Connection and authentication errors
+        propagate. Pair every acquire() with release() or discard().
+        """
+        key, port, label = self._key(host, credentials)
+        self._evict_idle()
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, _KeyLock())
+            key_lock.users += 1
+        try:
+            return self._acquire(key_lock, key, host, port, label, credentials)
+        finally:
+            with self._lock:
+                key_lock.users -= 1
+                self._forget_key_lock(key)
+
+    def _acquire(self, key_lock: _KeyLock, key: _PoolKey, host: str, port: int,
+                 label: str, credentials: Dict[str, Any]) -> paramiko.SSHClient:
+        # one connect per key at a time; other borrowers wait and share it
+        with key_lock.lock:
+            with self._lock:
+                conn = self._connections.get(key)
+            if conn is not None and self._healthy(conn):
+                with self._lock:
+                    conn.borrowers += 1
+                    conn.last_used = time.monotonic()
+                    self._stats["reuses"] += 1
+                return conn.client
+            if conn is not None:
+                with self._lock:
+                    self._stats["health_failures"] += 1
+                self._drop(conn)
+
+            client = self._connect(host, port, credentials)
+            conn = _PooledConnection(key=key, client=client, label=label, borrowers=1)
+            victim = None
+            with self._lock:
+                self._stats["connects"] += 1
+                self._by_client[id(client)] = conn
+                if len(self._connections) >= self.max_size:
+                    victim = self._evict_lru_idle()
+                if len(self._connections) < self.max_size:
+                    self._connections[key] = conn
+                if victim is not None:
+                    self._forget_key_lock(victim.key)
+            if victim is not None:
+                victim.client.close()
+            return client
+
+    def _connect(self, host: str, port: int, credentials: Dict[str, Any]) -> paramiko.SSHClient:
+        client = paramiko.SSHClient()
+        client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+        client.connect(
+            hostname=host,
+            port=port,
+            username=credentials.get("username", "root"),
+            password=credentials.get("password", ""),
+            timeout=self.connect_timeout
+        )
+        transport = client.get_transport()
+        if transport is not None:
+            # like OpenSSH: without it, Nagle + delayed ACK add ~40 ms per request
+            transport.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            if self.keepalive:
+                transport.set_keepalive(self.keepalive)
+        return client
+
+    def _healthy(self, conn: _PooledConnection) -> bool:
+        transport = conn.client.get_transport()
+        if transport is None or not transport.is_active():
+            return False
+        if time.monotonic() - conn.last_checked < self.health_check_interval:
+            return True
+        try:
+            transport.send_ignore()     # fails fast on a dead socket
+        except Exception:
+            return False
+        conn.last_checked = time.monotonic()
+        return True
+
+    def release(self, client: paramiko.SSHClient) -> None:
+        """Give a borrowed client back; it stays open for the next borrower."""
+        with self._lock:
+            conn = self._by_client.get(id(client))
+            if conn is None:
+                return
+            conn.borrowers = max(0, conn.borrowers - 1)
+            conn.last_used = time.monotonic()
+            pooled = self._connections.get(conn.key) is conn
+            if pooled or conn.borrowers:
+                return
+            del self._by_client[id(client)]
+        client.close()      # over capacity, or replaced after a failed health check
+
+    def discard(self, client: paramiko.SSHClient) -> None:
+        """Close a borrowed client that turned out to be broken."""
+        with self._lock:
+            conn = self._by_client.get(id(client))
+        if conn is not None:
+            self._drop(conn)
+        else:
+            client.close()
+
+    def _drop(self, conn: _PooledConnection) -> None:
+        with self._lock:
+            if self._connections.get(conn.key) is conn:
+                del self._connections[conn.key]
+                self._forget_key_lock(conn.key)
+            self._by_client.pop(id(conn.client), None)
+        conn.client.close()
+
+    def _forget_key_lock(self, key: _PoolKey) -> None:
+        """Free the lock of a key without connection or waiters (lock held)."""
+        key_lock = self._key_locks.get(key)
+        if key_lock is not None and not key_lock.users and key not in self._connections:
+            del self._key_locks[key]
+
+    def _evict_lru_idle(self) -> Optional[_PooledConnection]:
+        """
+        Remove the least recently used idle connection (lock held) and return
+        it; the caller closes it once the lock is released.
+        """
+        idle = [c for c in self._connections.values() if c.borrowers == 0]
+        if not idle:
+            return None
+        oldest = min(idle, key=lambda c: c.last_used)
+        del self._connections[oldest.key]
+        self._by_client.pop(id(oldest.client), None)
+        self._stats["evictions"] += 1
+        return oldest
+
+    def _evict_idle(self) -> None:
+        now = time.monotonic()
+        with self._lock:
+            expired = [c for c in self._connections.values()
+                       if c.borrowers == 0 and now - c.last_used >= self.idle_timeout]
+            for conn in expired:
+                del self._connections[conn.key]
+                self._by_client.pop(id(conn.client), None)
+                self._forget_key_lock(conn.key)
+                self._stats["evictions"] += 1
+        for conn in expired:
+            conn.client.close()
+
+    def close_all(self) -> None:
+        """Close every pooled connection, including borrowed ones."""
+        with self._lock:
+            conns = list(self._by_client.values())
+            self._connections.clear()
+            self._by_client.clear()
+            self._key_locks.clear()
+        for conn in conns:
+            conn.client.close()
+
+    def stats(self) -> Dict[str, Any]:
+        """Pool counters and, per connection, its borrowers and idle time."""
+        now = time.monotonic()
+        with self._lock:
+            return {
+                **self._stats,
+                "open_connections": len(self._connections),
+                "connections": {
+                    conn.label: {"borrowers": conn.borrowers,
+                                 "idle_for": round(now - conn.last_used, 3)}
+                    for conn in self._connections.values()
+                },
+            }
+
+
+_default_pool: Optional[SSHConnectionPool] = None
+_default_pool_lock = threading.Lock()
+
+
+def get_ssh_pool() -> SSHConnectionPool:
+    """Return the process-wide SSHConnectionPool used by SSHClient."""
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None:
+            _default_pool = SSHConnectionPool()
+        return _default_pool
+
+
+def reset_ssh_pool() -> None:
+    """Close every pooled connection and start with a fresh default pool."""
+    global _default_pool
+    with _default_pool_lock:
+        pool, _default_pool = _default_pool, None
+    if pool is not None:
+        pool.close_all()
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""
+Persistent, PTY-less remote shell.
+
+SSHClient.execute opens a new session channel per command, so every command
+pays a channel round trip and shell startup, and `cd` or `export` are lost
+right after. A PersistentShell keeps one `/bin/sh` running on a session
+channel and writes each command to its stdin between marker lines, which
+split the output back per command and carry its exit status. Working
+directory and environment persist from one command to the next.
+"""
+
+import time
+import uuid
+import shlex
+import threading
+from typing import Optional
+
+import paramiko
+
+from .ssh_exec import DEFAULT_MAX_OUTPUT, CommandResult, _marked, _pump_channel, _ScriptDemux
+
+SHELL_COMMAND = "/bin/sh"
+
+
+class PersistentShell:
+    """One long-lived shell on a session channel; commands run one at a time."""
+
+    def __init__(self, transport: paramiko.Transport, shell: str = SHELL_COMMAND):
+        self.marker = f"__AGENTBEATS_{uuid.uuid4().hex}_"
+        self.commands_run = 0
+        self._lock = threading.Lock()
+        self.channel = transport.open_session()
+        self.channel.exec_command(shell)
+
+    @property
+    def alive(self) -> bool:
+        return not self.channel.closed and not self.channel.exit_status_ready()
+
+    def run(self,
+            command: str,
+            timeout: Optional[float] = None,
+            max_output: int = DEFAULT_MAX_OUTPUT,
+            cancel_event: Optional[threading.Event] = None) -> CommandResult:
+        """
+        Run *command* in the shell. It reads stdin from /dev/null. On timeout
+        or cancellation the shell is closed, since the command may still be
+        running in it; a command that exits the shell closes it as well.
+        """
+        with self._lock:
+            if not self.alive:
+                raise ConnectionError("Shell channel is closed")
+            start = time.monotonic()
+            # a fresh marker per command, so late output of an earlier one can't end it
+            marker = f"{self.marker}{self.commands_run}_"
+            self.commands_run += 1
+            demux = {"stdout": _ScriptDemux(marker.encode(), 1, max_output),
+                     "stderr": _ScriptDemux(marker.encode(), 1, max_output)}
+            # `command eval` reports syntax errors without exiting the shell
+            body = f"command eval {shlex.quote(command)} < /dev/null"
+            self.channel.sendall(("\n".join(_marked(0, marker, body)) + "\n").encode())
+
+            exit_status, timed_out, cancelled = _pump_channel(
+                self.channel, {name: d.feed for name, d in demux.items()}, start, timeout,
+                cancel_event, done=lambda: all(d.ended[0] for d in demux.values()))
+            if demux["stdout"].ended[0]:
+                exit_status = demux["stdout"].statuses[0]
+            else:
+                self.close()
+            for d in demux.values():
+                d.flush()
+
+        out, err = demux["stdout"].buffers[0], demux["stderr"].buffers[0]
+        return CommandResult(
+            command=command,
+            exit_status=exit_status,
+            stdout=out.text(),
+            stderr=err.text(),
+            stdout_bytes=out.total,
+            stderr_bytes=err.total,
+            stdout_truncated=out.truncated,
+            stderr_truncated=err.truncated,
+            timed_out=timed_out,
+            cancelled=cancelled,
+            duration=time.monotonic() - start,
+        )
+
+    def close(self) -> None:
+        self.channel.close()
@@ -8,9 +8,11 @@ from .docker import (
     cleanup_container,
     check_container_health,
 )
+from .build_cache import build_cache_stats
 
 __all__ = [
     "setup_container",
     "cleanup_container",
     "check_container_health",
+    "build_cache_stats",
 ] 
\ No newline at end of file
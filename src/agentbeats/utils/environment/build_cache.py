@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+"""
+Content-hash cache of arena image builds.
+
+The hash covers the build context (minus what .dockerignore excludes), the
+compose files, the Dockerfile and the build args. setup_container stores
+it with the image IDs of each successful build under
+<cache dir>/arena_builds; when the next setup of the same directory hashes
+the same and those images still exist, the arena is started from them
+instead of being rebuilt.
+"""
+
+import os
+import time
+import fnmatch
+import hashlib
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from ...cache import get_cache_dir, read_json, write_json_atomic
+
+BUILD_CACHE_DIR = "arena_builds"
+# hashed even if .dockerignore excludes them
+_ALWAYS_HASHED = ("Dockerfile", ".dockerignore", "docker-compose.yml", "docker-compose.yaml",
+                  "docker-compose.override.yml", "docker-compose.override.yaml",
+                  "compose.yml", "compose.yaml")
+
+_build_cache_stats = {"hits": 0, "misses": 0, "time_saved": 0.0}
+
+
+def _match_segments(pattern: List[str], path: List[str]) -> bool:
+    if not pattern:
+        return not path
+    if pattern[0] == "**":
+        return any(_match_segments(pattern[1:], path[i:]) for i in range(len(path) + 1))
+    return bool(path) and fnmatch.fnmatchcase(path[0], pattern[0]) \
+        and _match_segments(pattern[1:], path[1:])
+
+
+class DockerIgnore:
+    """The .dockerignore rules of a build context (`*`, `?`, `**` and `!` exceptions)."""
+
+    def __init__(self, context: Path):
+        self.rules: List[Tuple[bool, List[str]]] = []       # (exception, segments)
+        try:
+            lines = (context / ".dockerignore").read_text(encoding="utf-8").splitlines()
+        except OSError:
+            lines = []
+        for line in lines:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            exception = line.startswith("!")
+            pattern = os.path.normpath(line.lstrip("!").strip()).strip("/")
+            if pattern and pattern != ".":
+                self.rules.append((exception, pattern.split("/")))
+
+    @property
+    def has_exceptions(self) -> bool:
+        return any(exception for exception, _ in self.rules)
+
+    def ignored(self, rel_path: str) -> bool:
+        """Whether a context-relative path is excluded; a rule for a directory covers its contents."""
+        parts = rel_path.split("/")
+        result = False
+        for exception, pattern in self.rules:
+            if any(_match_segments(pattern, parts[:i]) for i in range(1, len(parts) + 1)):
+                result = not exception
+        return result
+
+
+def _context_files(context: Path) -> Iterable[str]:
+    ignore = DockerIgnore(context)
+    for dirpath, dirnames, filenames in os.walk(context):
+        rel_dir = os.path.relpath(dirpath, context).replace(os.sep, "/")
+        rel_dir = "" if rel_dir == "." else rel_dir + "/"
+        if not ignore.has_exceptions:
+            dirnames[:] = [d for d in dirnames if not ignore.ignored(rel_dir + d)]
+        dirnames.sort()
+        for name in sorted(filenames):
+            rel = rel_dir + name
+            if not ignore.ignored(rel) or rel in _ALWAYS_HASHED:
+                yield rel
+
+
+def arena_hash(docker_path: Path,
+               build_args: Optional[Dict[str, Any]] = None,
+               compose_files: Iterable[str] = ()) -> str:
+    """SHA-256 of an arena's build inputs."""
+    docker_path = Path(docker_path)
+    digest = hashlib.sha256()
+    files = sorted(set(_context_files(docker_path))
+                   | {name for name in _ALWAYS_HASHED if (docker_path / name).is_file()})
+    extra = [Path(docker_path, f) for f in compose_files]
+    for path, label in [(docker_path / rel, rel) for rel in files] + [(p, str(p)) for p in extra]:
+        digest.update(label.encode() + b"\0")
+        if path.is_symlink():
+            digest.update(b"link:" + os.readlink(path).encode())
+        elif path.is_file():
+            digest.update(b"x" if os.access(path, os.X_OK) else b"-")
+            with open(path, "rb") as f:
+                for block in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(block)
+        digest.update(b"\0")
+    for key, value in sorted((build_args or {}).items()):
+        digest.update(f"arg:{key}={value}\0".encode())
+    return digest.hexdigest()
+
+
+def _record_path(docker_path: Path) -> Optional[Path]:
+    """Record file of *docker_path*, or None if the cache dir is unusable."""
+    key = hashlib.sha256(str(Path(docker_path).resolve()).encode()).hexdigest()
+    try:
+        return get_cache_dir(BUILD_CACHE_DIR) / f"{key}.json"
+    except OSError:
+        return None
+
+
+def load_build_record(docker_path: Path) -> Optional[Dict[str, Any]]:
+    """The last successful build of *docker_path*: hash, images, build_seconds, built_at."""
+    path = _record_path(docker_path)
+    record = read_json(path) if path is not None else None
+    if record is None or not {"hash", "images", "build_seconds"} <= record.keys():
+        return None
+    return record
+
+
+def store_build_record(docker_path: Path, digest: str, images: List[str],
+                       build_seconds: float) -> None:
+    path = _record_path(docker_path)
+    if path is None:
+        return
+    write_json_atomic(path, {
+        "hash": digest,
+        "images": images,
+        "build_seconds": build_seconds,
+        "built_at": time.time(),
+    })
+
+
+def record_hit(time_saved: float) -> None:
+    _build_cache_stats["hits"] += 1
+    _build_cache_stats["time_saved"] += time_saved
+
+
+def record_miss() -> None:
+    _build_cache_stats["misses"] += 1
+
+
+def build_cache_stats() -> Dict[str, Any]:
+    """Arena build cache hits and misses in this process, and the seconds saved."""
+    return dict(_build_cache_stats)
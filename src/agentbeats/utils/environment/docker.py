@@ -1,21 +1,132 @@
 # -*- coding: utf-8 -*-
 """
 Environmental utilities for easier development using the Agentbeats SDK.
+
+Docker and docker-compose run as asyncio subprocesses, so a long
+`docker-compose up --build` doesn't block the agent's event loop. Their
+output can be followed line by line through an on_log callback, and
+cancelling the awaiting task stops the docker process.
+
+setup_container skips the image build when the arena's build inputs hash
+the same as its last successful build and those images still exist (see
+build_cache).
 """
 
-import subprocess
-import asyncio
 import os
-from typing import Dict, List, Optional, Any
+import re
+import time
+import shutil
+import signal
+import asyncio
+import inspect
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, Union
 from pathlib import Path
 
+from ...cache import cache_disabled
+from .build_cache import (arena_hash, load_build_record, store_build_record,
+                          record_hit, record_miss)
+
+# on_log(line), sync or async, for every output line of docker / docker-compose
+LogCallback = Callable[[str], Union[None, Awaitable[None]]]
+
+_ERROR_TAIL_LINES = 50
+_TERMINATE_GRACE = 10.0
+# `images -q` prints short (12) or full (64) hex IDs, with or without "sha256:"
+_IMAGE_ID = re.compile(r"(sha256:)?[0-9a-f]{12,64}")
+
+
+def _compose_command() -> List[str]:
+    """`docker-compose` (v1) if installed, else the `docker compose` plugin."""
+    if shutil.which("docker-compose"):
+        return ["docker-compose"]
+    return ["docker", "compose"]
 
-async def setup_container(config: Dict[str, Any]) -> bool:
-    """Set up container environment."""
+
+async def _stop_process(proc: asyncio.subprocess.Process) -> None:
+    if proc.returncode is not None:
+        return
+    try:
+        proc.send_signal(signal.SIGTERM)      # lets compose stop what it started
+        await asyncio.wait_for(proc.wait(), _TERMINATE_GRACE)
+    except ProcessLookupError:
+        pass
+    except asyncio.TimeoutError:
+        proc.kill()
+        await proc.wait()
+
+
+async def _run_docker(args: List[str],
+                      cwd: Optional[Path] = None,
+                      env: Optional[Dict[str, str]] = None,
+                      on_log: Optional[LogCallback] = None) -> Tuple[int, str, str]:
+    """
+    Run a docker command, passing each output line (stdout and stderr) to
+    on_log. Returns (exit code, stdout, last lines of stdout and stderr);
+    stderr is kept apart so warnings never end up in parsed output. On
+    cancellation the process is terminated before CancelledError propagates.
+    """
+    proc = await asyncio.create_subprocess_exec(
+        *args, cwd=cwd, env=env,
+        stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+        limit=1024 * 1024)
+    stdout: List[str] = []
+    tail = deque(maxlen=_ERROR_TAIL_LINES)
+
+    async def _read(stream: asyncio.StreamReader, lines: Optional[List[str]]) -> None:
+        async for raw in stream:
+            line = raw.decode(errors="replace").rstrip("\r\n")
+            if lines is not None:
+                lines.append(line)
+            tail.append(line)
+            if on_log is not None:
+                result = on_log(line)
+                if inspect.isawaitable(result):
+                    await result
+
+    readers = [asyncio.ensure_future(_read(proc.stdout, stdout)),
+               asyncio.ensure_future(_read(proc.stderr, None))]
+    try:
+        await asyncio.gather(*readers)
+        return await proc.wait(), "\n".join(stdout), "\n".join(tail)
+    except BaseException:
+        # cancelled, or on_log raised
+        for reader in readers:
+            reader.cancel()
+        await asyncio.shield(_stop_process(proc))
+        raise
+
+
+async def _compose_images(compose: List[str], docker_path: Path,
+                          env: Optional[Dict[str, str]] = None) -> Optional[List[str]]:
+    """
+    IDs of the images used by the project's containers, or None if compose
+    failed. *env* must be the one of `up`, so the compose file resolves the same.
+    """
+    returncode, stdout, _ = await _run_docker(compose + ["images", "-q"], cwd=docker_path, env=env)
+    if returncode != 0:
+        return None
+    return sorted({line.strip() for line in stdout.splitlines() if _IMAGE_ID.fullmatch(line.strip())})
+
+
+async def _images_exist(images: List[str]) -> bool:
+    if not images:
+        return False
+    returncode, _, _ = await _run_docker(["docker", "image", "inspect", "--format", "{{.Id}}"] + images)
+    return returncode == 0
+
+
+async def setup_container(config: Dict[str, Any], on_log: Optional[LogCallback] = None) -> bool:
+    """
+    Set up container environment.
+
+    Unless config["build_cache"] is False or AGENTBEATS_DISABLE_CACHE is set,
+    an arena whose build inputs are unchanged since its last build is started
+    from the existing images (`up -d --no-build`) instead of being rebuilt.
+    """
     
     try:
         docker_dir = config.get("docker_dir", "docker")
-        compose_file = config.get("compose_file", "docker-compose.yml")
         build_args = config.get("build_args", {})
         
         # Change to docker directory
@@ -24,31 +135,66 @@ async def setup_container(config: Dict[str, Any]) -> bool:
             print(f"Error: Docker directory not found: {docker_dir}")
             return False
         
+        compose = _compose_command()
+        compose_files = []
+        if "compose_file" in config:
+            compose += ["-f", config["compose_file"]]
+            compose_files.append(config["compose_file"])
+
+        digest = None
+        if config.get("build_cache", True) and not cache_disabled():
+            digest = arena_hash(docker_path, build_args, compose_files)
+
         # Stop any existing containers
         print("Stopping existing containers...")
-        down_result = subprocess.run(["docker-compose", "down"], cwd=docker_path, capture_output=True, text=True)
+        await _run_docker(compose + ["down"], cwd=docker_path, on_log=on_log)
         
         # Prepare build arguments for docker-compose
         env_vars = os.environ.copy()
         for key, value in build_args.items():
             env_vars[key] = str(value)
             print(f"Setting build arg: {key}={value}")
-        
+
+        if digest is not None:
+            record = load_build_record(docker_path)
+            if record is not None and record["hash"] == digest and await _images_exist(record["images"]):
+                print("Arena unchanged since last build, starting from cached images...")
+                start = time.monotonic()
+                returncode, _, output = await _run_docker(
+                    compose + ["up", "-d", "--no-build"],
+                    cwd=docker_path,
+                    env=env_vars,
+                    on_log=on_log
+                )
+                # the image tags may have been rebuilt outside setup_container
+                if returncode == 0 and await _compose_images(compose, docker_path, env_vars) == record["images"]:
+                    saved = max(0.0, record["build_seconds"] - (time.monotonic() - start))
+                    record_hit(saved)
+                    print(f"Docker environment started successfully (build cache hit, ~{saved:.0f}s saved)")
+                    return True
+                print("Cached images could not be used, rebuilding...")
+            record_miss()
+
         # Start the environment with build arguments
         print("Starting Docker environment...")
-        result = subprocess.run(
-            ["docker-compose", "up", "-d", "--build"], 
+        start = time.monotonic()
+        returncode, _, output = await _run_docker(
+            compose + ["up", "-d", "--build"],
             cwd=docker_path,
             env=env_vars,
-            capture_output=True, 
-            text=True
+            on_log=on_log
         )
         
-        if result.returncode == 0:
+        if returncode == 0:
+            if digest is not None:
+                build_seconds = time.monotonic() - start
+                images = await _compose_images(compose, docker_path, env_vars)
+                if images:
+                    store_build_record(docker_path, digest, images, build_seconds)
             print("Docker environment started successfully")
             return True
         else:
-            print(f"Failed to start Docker environment: {result.stderr}")
+            print(f"Failed to start Docker environment: {output}")
             return False
             
     except Exception as e:
@@ -56,7 +202,8 @@ async def setup_container(config: Dict[str, Any]) -> bool:
         return False
 
 
-async def cleanup_container(env_id: str, docker_dir: Optional[str] = None) -> bool:
+async def cleanup_container(env_id: str, docker_dir: Optional[str] = None,
+                            on_log: Optional[LogCallback] = None) -> bool:
     """Destroy and reset container environment."""
     try:
         # Determine the docker directory
@@ -73,18 +220,17 @@ async def cleanup_container(env_id: str, docker_dir: Optional[str] = None) -> bo
             return False
         
         # Stop and remove containers
-        result = subprocess.run(
-            ["docker-compose", "down", "--volumes", "--remove-orphans"],
+        returncode, _, output = await _run_docker(
+            _compose_command() + ["down", "--volumes", "--remove-orphans"],
             cwd=docker_path,
-            capture_output=True,
-            text=True
+            on_log=on_log
         )
         
-        if result.returncode == 0:
+        if returncode == 0:
             print(f"Docker environment {env_id} cleaned up successfully")
             return True
         else:
-            print(f"Failed to cleanup Docker environment: {result.stderr}")
+            print(f"Failed to cleanup Docker environment: {output}")
             return False
             
     except Exception as e:
@@ -95,17 +241,15 @@ async def cleanup_container(env_id: str, docker_dir: Optional[str] = None) -> bo
 async def check_container_health(container_name: str) -> bool:
     """Check container health (relaxed: only require 'Up')."""
     try:
-        result = subprocess.run(
-            ["docker", "ps", "--filter", f"name={container_name}", "--format", "{{.Status}}"],
-            capture_output=True,
-            text=True
+        returncode, stdout, _ = await _run_docker(
+            ["docker", "ps", "--filter", f"name={container_name}", "--format", "{{.Status}}"]
         )
         
-        if result.returncode == 0 and result.stdout.strip():
-            status = result.stdout.strip()
+        if returncode == 0 and stdout.strip():
+            status = stdout.strip()
             return "Up" in status  # Only require 'Up', not 'healthy'
         else:
             return False
             
     except Exception:
-        return False 
\ No newline at end of file
+        return False
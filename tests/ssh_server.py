@@ -0,0 +1,457 @@
+# -*- coding: utf-8 -*-
+"""
+In-process SSH server for tests and benchmarks.
+
+LocalSSHServer listens on 127.0.0.1 and speaks real SSH through paramiko,
+so SSHClient, AsyncSSHClient and agent tools can be exercised and measured
+without Docker or sshd:
+
+    with LocalSSHServer(tmp_dir, credentials={"root": "toor"},
+                        responses={"whoami": "root\\n"}, latency=0.01) as server:
+        ssh = SSHClient(server.host, {"username": "root", "password": "toor",
+                                      "port": server.port})
+        print(ssh.execute("whoami"))
+
+Commands are answered from `responses` / `handler`; with local_shell=True
+the others run with the local /bin/sh, as the current user. The SFTP
+subsystem serves the sftp_root directory. `latency` delays everything the
+server sends, adding that much to every round trip.
+
+Test scaffolding only: it is not part of the agentbeats package.
+"""
+
+import os
+import time
+import queue
+import socket
+import signal
+import threading
+import subprocess
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+import paramiko
+
+# seconds a finished command waits for the client to close its channel
+_CLOSE_GRACE = 10.0
+
+_host_key: Optional[paramiko.RSAKey] = None
+_host_key_lock = threading.Lock()
+
+
+def _default_host_key() -> paramiko.RSAKey:
+    """One generated host key per process (generation takes a moment)."""
+    global _host_key
+    with _host_key_lock:
+        if _host_key is None:
+            _host_key = paramiko.RSAKey.generate(2048)
+        return _host_key
+
+
+@dataclass
+class ScriptedResponse:
+    """Canned result of a command."""
+    stdout: str = ""
+    stderr: str = ""
+    exit_status: int = 0
+    delay: float = 0.0          # seconds before the command "finishes"
+
+
+Response = Union[str, ScriptedResponse]
+# handler(command) -> response, or None for "not scripted"
+CommandHandler = Callable[[str], Optional[Response]]
+
+
+class _DelayedSocket:
+    """Socket wrapper sending data *latency* seconds late, in order, without blocking the sender."""
+
+    def __init__(self, sock: socket.socket, latency: float):
+        self._sock = sock
+        self._latency = latency
+        self._queue: deque = deque()
+        self._cond = threading.Condition()
+        self._stopped = False
+        threading.Thread(target=self._drain, name="local-ssh-delay", daemon=True).start()
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._sock, name)
+
+    def send(self, data: bytes) -> int:
+        with self._cond:
+            self._queue.append((time.monotonic() + self._latency, bytes(data)))
+            self._cond.notify()
+        return len(data)
+
+    def sendall(self, data: bytes) -> None:
+        self.send(data)
+
+    def _drain(self) -> None:
+        while True:
+            with self._cond:
+                while not self._queue and not self._stopped:
+                    self._cond.wait()
+                if self._stopped:
+                    return
+                due, data = self._queue.popleft()
+            delay = due - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            try:
+                self._sock.sendall(data)
+            except OSError:
+                return
+
+    def close(self) -> None:
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+        self._sock.close()
+
+
+class _SFTPHandle(paramiko.SFTPHandle):
+    def stat(self):
+        try:
+            return paramiko.SFTPAttributes.from_stat(os.fstat(self.readfile.fileno()))
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+
+    def chattr(self, attr):
+        try:
+            paramiko.SFTPServer.set_file_attr(self.filename, attr)
+            return paramiko.SFTP_OK
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+
+
+class _SFTPInterface(paramiko.SFTPServerInterface):
+    """SFTP confined to the directory *root*."""
+
+    def __init__(self, server, root: str, *args, **kwargs):
+        super().__init__(server, *args, **kwargs)
+        self.root = root
+
+    def _local(self, path: str) -> str:
+        return os.path.join(self.root, os.path.normpath("/" + path).lstrip("/"))
+
+    def _call(self, func, *args):
+        try:
+            func(*args)
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+        return paramiko.SFTP_OK
+
+    def list_folder(self, path):
+        local = self._local(path)
+        try:
+            names = os.listdir(local)
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+        entries = []
+        for name in names:
+            attr = paramiko.SFTPAttributes.from_stat(os.lstat(os.path.join(local, name)))
+            attr.filename = name
+            entries.append(attr)
+        return entries
+
+    def stat(self, path):
+        try:
+            return paramiko.SFTPAttributes.from_stat(os.stat(self._local(path)))
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+
+    def lstat(self, path):
+        try:
+            return paramiko.SFTPAttributes.from_stat(os.lstat(self._local(path)))
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+
+    def open(self, path, flags, attr):
+        local = self._local(path)
+        mode = getattr(attr, "st_mode", None)
+        try:
+            fd = os.open(local, flags, mode if mode is not None else 0o666)
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+        if flags & os.O_CREAT and attr is not None:
+            attr._flags &= ~attr.FLAG_PERMISSIONS
+            paramiko.SFTPServer.set_file_attr(local, attr)
+        if flags & os.O_WRONLY:
+            fmode = "ab" if flags & os.O_APPEND else "wb"
+        elif flags & os.O_RDWR:
+            fmode = "a+b" if flags & os.O_APPEND else "r+b"
+        else:
+            fmode = "rb"
+        handle = _SFTPHandle(flags)
+        handle.filename = local
+        handle.readfile = handle.writefile = os.fdopen(fd, fmode)
+        return handle
+
+    def remove(self, path):
+        return self._call(os.remove, self._local(path))
+
+    def rename(self, oldpath, newpath):
+        return self._call(os.rename, self._local(oldpath), self._local(newpath))
+
+    def posix_rename(self, oldpath, newpath):
+        return self._call(os.replace, self._local(oldpath), self._local(newpath))
+
+    def mkdir(self, path, attr):
+        return self._call(os.mkdir, self._local(path))
+
+    def rmdir(self, path):
+        return self._call(os.rmdir, self._local(path))
+
+    def chattr(self, path, attr):
+        return self._call(paramiko.SFTPServer.set_file_attr, self._local(path), attr)
+
+
+class _ServerInterface(paramiko.ServerInterface):
+    def __init__(self, server: "LocalSSHServer", transport: paramiko.Transport):
+        self.server = server
+        self.transport = transport
+        self.failures = 0
+        # (channel, command) for each accepted exec request, served by _serve()
+        self.exec_requests: "queue.Queue[Tuple[paramiko.Channel, str]]" = queue.Queue()
+
+    def get_allowed_auths(self, username):
+        return "password"
+
+    def check_auth_password(self, username, password):
+        server = self.server
+        with server._lock:
+            server.stats["auth_attempts"] += 1
+        if self.failures >= server.max_auth_tries:
+            self.transport.close()      # like sshd after MaxAuthTries
+            return paramiko.AUTH_FAILED
+        if server.credentials.get(username) == password:
+            return paramiko.AUTH_SUCCESSFUL
+        self.failures += 1
+        with server._lock:
+            server.stats["auth_failures"] += 1
+        return paramiko.AUTH_FAILED
+
+    def check_channel_request(self, kind, chanid):
+        if kind == "session":
+            return paramiko.OPEN_SUCCEEDED
+        return paramiko.OPEN_FAILED_ADMINISTRATIVELY_PROHIBITED
+
+    def check_channel_exec_request(self, channel, command):
+        command = command.decode(errors="replace") if isinstance(command, bytes) else command
+        self.exec_requests.put((channel, command))
+        return True
+
+
+class LocalSSHServer:
+    """SSH server on a local port for tests and benchmarks; use as a context manager."""
+
+    def __init__(self,
+                 sftp_root: str,
+                 credentials: Optional[Dict[str, str]] = None,
+                 responses: Optional[Dict[str, Response]] = None,
+                 handler: Optional[CommandHandler] = None,
+                 local_shell: bool = False,
+                 latency: float = 0.0,
+                 max_auth_tries: int = 6,
+                 host_key: Optional[paramiko.PKey] = None):
+        """
+        sftp_root: directory served by the SFTP subsystem (remote "/" maps to it)
+        credentials: username -> password (default {"root": "root"})
+        responses: exact command -> stdout text or ScriptedResponse
+        handler: called for commands not in responses; returns a response or None
+        local_shell: run unscripted commands with the local /bin/sh, as the
+                     current user, in sftp_root (otherwise they exit 127)
+        latency: seconds added to every server -> client packet
+        max_auth_tries: failed passwords per connection before it is closed
+        """
+        self.credentials = credentials if credentials is not None else {"root": "root"}
+        self.responses = dict(responses or {})
+        self.handler = handler
+        self.local_shell = local_shell
+        self.latency = latency
+        self.max_auth_tries = max_auth_tries
+        self.sftp_root = sftp_root
+        self.host_key = host_key
+        self.host = "127.0.0.1"
+        self.port = 0
+        self.commands: List[str] = []
+        self.stats = {"connections": 0, "auth_attempts": 0, "auth_failures": 0, "commands": 0}
+        self._lock = threading.Lock()
+        self._listener: Optional[socket.socket] = None
+        self._transports: List[paramiko.Transport] = []
+        self._stopped = threading.Event()
+
+    def start(self) -> "LocalSSHServer":
+        if self.host_key is None:
+            self.host_key = _default_host_key()
+        self._listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._listener.bind((self.host, 0))
+        self._listener.listen(128)
+        self._listener.settimeout(0.2)
+        self.port = self._listener.getsockname()[1]
+        self._stopped.clear()
+        threading.Thread(target=self._accept_loop, name="local-ssh-accept", daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        self._stopped.set()
+        if self._listener is not None:
+            self._listener.close()
+            self._listener = None
+        with self._lock:
+            transports, self._transports = self._transports, []
+        for transport in transports:
+            transport.close()
+
+    def __enter__(self) -> "LocalSSHServer":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def client_credentials(self, username: Optional[str] = None) -> Dict[str, Any]:
+        """Credentials dict for SSHClient (first configured user by default)."""
+        username = username or next(iter(self.credentials))
+        return {"username": username, "password": self.credentials[username], "port": self.port}
+
+    def _accept_loop(self) -> None:
+        while not self._stopped.is_set():
+            try:
+                sock, _ = self._listener.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                return
+            threading.Thread(target=self._serve, args=(sock,), name="local-ssh-conn",
+                             daemon=True).start()
+
+    def _serve(self, sock: socket.socket) -> None:
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        transport = paramiko.Transport(_DelayedSocket(sock, self.latency) if self.latency else sock)
+        transport.add_server_key(self.host_key)
+        transport.set_subsystem_handler("sftp", paramiko.SFTPServer, _SFTPInterface, self.sftp_root)
+        with self._lock:
+            self.stats["connections"] += 1
+            self._transports.append(transport)
+        try:
+            interface = _ServerInterface(self, transport)
+            transport.start_server(server=interface)
+            # take opened channels off the accept queue, keeping them referenced
+            # (a dropped Channel closes itself) until they are closed
+            channels: List[paramiko.Channel] = []
+            while transport.is_active() and not self._stopped.is_set():
+                channels = [c for c in channels if not c.closed]
+                channel = transport.accept(0)
+                while channel is not None:
+                    channels.append(channel)
+                    channel = transport.accept(0)
+                try:
+                    channel, command = interface.exec_requests.get(timeout=0.5)
+                except queue.Empty:
+                    continue
+                threading.Thread(target=self._run_command, args=(channel, command),
+                                 name="local-ssh-exec", daemon=True).start()
+        except (paramiko.SSHException, EOFError, OSError):
+            pass
+        finally:
+            transport.close()
+            with self._lock:
+                if transport in self._transports:
+                    self._transports.remove(transport)
+
+    def _scripted(self, command: str) -> Optional[ScriptedResponse]:
+        response = self.responses.get(command)
+        if response is None and self.handler is not None:
+            response = self.handler(command)
+        if isinstance(response, str):
+            response = ScriptedResponse(stdout=response)
+        return response
+
+    def _run_command(self, channel: paramiko.Channel, command: str) -> None:
+        with self._lock:
+            self.commands.append(command)
+            self.stats["commands"] += 1
+        try:
+            response = self._scripted(command)
+            if response is not None:
+                if response.delay:
+                    time.sleep(response.delay)
+                channel.sendall(response.stdout.encode())
+                channel.sendall_stderr(response.stderr.encode())
+                channel.send_exit_status(response.exit_status)
+            elif self.local_shell:
+                channel.send_exit_status(self._run_local(channel, command))
+            else:
+                channel.sendall_stderr(f"sh: 1: {command.split()[0] if command.split() else ''}: "
+                                       f"not found\n".encode())
+                channel.send_exit_status(127)
+        except (OSError, EOFError, paramiko.SSHException):
+            pass        # client went away
+        finally:
+            self._finish(channel)
+
+    def _finish(self, channel: paramiko.Channel) -> None:
+        """
+        Send EOF and leave closing to the client, like sshd. The exec reply is
+        sent by the transport thread after check_channel_exec_request returns,
+        so closing the channel here could overtake it and fail exec_command().
+        """
+        try:
+            channel.shutdown_write()
+        except (OSError, EOFError, paramiko.SSHException):
+            pass
+        deadline = time.monotonic() + _CLOSE_GRACE
+        while not channel.closed and time.monotonic() < deadline:
+            if self._stopped.wait(0.01):
+                break
+        channel.close()
+
+    def _run_local(self, channel: paramiko.Channel, command: str) -> int:
+        proc = subprocess.Popen(["/bin/sh", "-c", command], cwd=self.sftp_root, stdin=subprocess.PIPE,
+                                stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                start_new_session=True)
+
+        def _pipe_in():
+            try:
+                while True:
+                    data = channel.recv(32768)
+                    if not data:
+                        break
+                    proc.stdin.write(data)
+                    proc.stdin.flush()
+            except (OSError, ValueError):
+                pass
+            finally:
+                try:
+                    proc.stdin.close()
+                except OSError:
+                    pass
+
+        def _pipe_out(pipe, send):
+            try:
+                for data in iter(lambda: os.read(pipe.fileno(), 32768), b""):
+                    send(data)
+            except OSError:
+                pass
+
+        threading.Thread(target=_pipe_in, daemon=True).start()
+        readers = [threading.Thread(target=_pipe_out, args=(proc.stdout, channel.sendall), daemon=True),
+                   threading.Thread(target=_pipe_out, args=(proc.stderr, channel.sendall_stderr),
+                                    daemon=True)]
+        for reader in readers:
+            reader.start()
+        while True:
+            try:
+                proc.wait(timeout=0.05)
+                break
+            except subprocess.TimeoutExpired:
+                if channel.closed or self._stopped.is_set():
+                    # the client gave up on the command (timeout / cancel)
+                    os.killpg(proc.pid, signal.SIGKILL)
+        for reader in readers:
+            # a background job may keep the pipe open; stop waiting once the client does
+            while reader.is_alive() and not channel.closed and not self._stopped.is_set():
+                reader.join(0.1)
+        # killed by a signal: report it the way a shell would
+        return proc.returncode if proc.returncode >= 0 else 128 - proc.returncode
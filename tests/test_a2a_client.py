@@ -0,0 +1,996 @@
+"""
+Tests for the pooled A2A client helpers.
+"""
+
+import io
+import os
+import gzip
+import json
+import asyncio
+import tempfile
+import unittest
+from unittest import mock
+from contextlib import redirect_stdout
+
+import httpx
+from a2a.client import A2AClientHTTPError
+
+from agentbeats.utils.agents import a2a
+from agentbeats.utils.agents.a2a import ArtifactChunk, CutoffChunk, StatusChunk
+from agentbeats.utils.agents.client_manager import A2AClientManager
+from agentbeats.utils.agents.card_cache import load_cached_card
+from agentbeats.utils.agents.push import PushNotificationReceiver, send_message_with_push
+from agentbeats.utils.agents.session import A2ASession
+from agentbeats.utils.agents.resilience import (
+    CircuitBreaker, CircuitOpenError, RetryPolicy, configure_circuit_breakers,
+    get_circuit_states, is_agent_available, reset_circuit_breakers,
+)
+
+# cards persisted by one test must not leak into the next one; the
+# card cache tests enable it on a temporary directory
+_env = mock.patch.dict(os.environ, {"AGENTBEATS_DISABLE_CACHE": "1"})
+
+
+def setUpModule():
+    _env.start()
+
+
+def tearDownModule():
+    _env.stop()
+
+
+def _card(url):
+    return {
+        "name": "Test Agent",
+        "description": "Test agent.",
+        "url": url,
+        "version": "1.0.0",
+        "defaultInputModes": ["text"],
+        "defaultOutputModes": ["text"],
+        "capabilities": {"streaming": True},
+        "skills": [],
+    }
+
+
+def _sse(*results):
+    return "".join(
+        "data: " + json.dumps({"jsonrpc": "2.0", "id": "1", "result": r}) + "\n\n"
+        for r in results
+    )
+
+
+def _artifact(text):
+    return {
+        "kind": "artifact-update", "taskId": "t1", "contextId": "c1",
+        "artifact": {"artifactId": "a1", "parts": [{"kind": "text", "text": text}]},
+    }
+
+
+TASK = {"kind": "task", "id": "t1", "contextId": "c1", "status": {"state": "submitted"}}
+COMPLETED = {"kind": "status-update", "taskId": "t1", "contextId": "c1",
+             "final": True, "status": {"state": "completed"}}
+
+
+class FakeAgents:
+    """MockTransport handler serving agent cards and streaming replies."""
+
+    def __init__(self, reply="pong", events=None, stall=False):
+        self.reply = reply
+        self.events = events
+        self.stall = stall
+        self.card_requests = 0
+        self.message_requests = 0
+        self.cancelled = []
+        self.last_method = None
+
+    async def _stalled_stream(self, first):
+        yield first.encode()
+        await asyncio.sleep(30)
+
+    def __call__(self, request):
+        base = f"{request.url.scheme}://{request.url.host}:{request.url.port}/"
+        if request.url.path == "/.well-known/agent.json":
+            self.card_requests += 1
+            return httpx.Response(200, json=_card(base))
+        body = json.loads(request.content)
+        self.last_method = body["method"]
+        if body["method"] == "tasks/cancel":
+            self.cancelled.append(body["params"]["id"])
+            task = dict(TASK, status={"state": "canceled"})
+            return httpx.Response(200, json={"jsonrpc": "2.0", "id": body["id"], "result": task})
+
+        self.message_requests += 1
+        headers = {"content-type": "text/event-stream"}
+        if self.stall:
+            return httpx.Response(200, content=self._stalled_stream(_sse(TASK)), headers=headers)
+        events = self.events or [_artifact(self.reply)]
+        return httpx.Response(200, text=_sse(*events), headers=headers)
+
+
+class TestA2AClientManager(unittest.IsolatedAsyncioTestCase):
+    """Test client pooling, card caching and eviction."""
+
+    async def asyncSetUp(self):
+        self.agents = FakeAgents()
+        self.manager = A2AClientManager(
+            max_clients=2, card_ttl=60,
+            http_kwargs={"transport": httpx.MockTransport(self.agents)})
+
+    async def asyncTearDown(self):
+        await self.manager.close()
+
+    def _entry(self, url):
+        return self.manager._pools[asyncio.get_running_loop()].entries[url]
+
+    async def test_client_and_card_reused(self):
+        """Test that repeated lookups reuse one client and one card fetch."""
+        first = await self.manager.get_client("http://agent-a:9000")
+        second = await self.manager.get_client("http://agent-a:9000/")
+        self.assertIs(first, second)
+        self.assertEqual(self.agents.card_requests, 1)
+        self.assertEqual(self.manager.stats()["targets"]["http://agent-a:9000"]["requests"], 2)
+
+    async def test_card_ttl_expiry(self):
+        """Test that an expired card is fetched again."""
+        await self.manager.get_card("http://agent-a:9000")
+        with mock.patch("agentbeats.utils.agents.client_manager.time.monotonic",
+                        return_value=10 ** 9):
+            await self.manager.get_card("http://agent-a:9000")
+        self.assertEqual(self.agents.card_requests, 2)
+
+    async def test_lru_eviction_closes_client(self):
+        """Test that the least recently used target is evicted and closed."""
+        await self.manager.get_client("http://agent-a:9000")
+        await self.manager.get_client("http://agent-b:9000")
+        await self.manager.get_client("http://agent-a:9000")
+        evicted = self._entry("http://agent-b:9000").httpx_client
+        await self.manager.get_client("http://agent-c:9000")
+
+        stats = self.manager.stats()
+        self.assertEqual(stats["evictions"], 1)
+        self.assertEqual(set(stats["targets"]), {"http://agent-a:9000", "http://agent-c:9000"})
+        self.assertTrue(evicted.is_closed)
+
+    async def test_close_all(self):
+        """Test that close() shuts every pooled client."""
+        await self.manager.get_client("http://agent-a:9000")
+        client = self._entry("http://agent-a:9000").httpx_client
+        await self.manager.close()
+        self.assertTrue(client.is_closed)
+        self.assertEqual(self.manager.stats()["open_clients"], 0)
+
+    async def test_busy_client_not_evicted(self):
+        """Test that eviction and close() skip clients with a lease in flight."""
+        async with self.manager.lease("http://agent-a:9000") as client:
+            await self.manager.get_client("http://agent-b:9000")
+            await self.manager.get_client("http://agent-c:9000")
+            self.assertEqual(set(self.manager.stats()["targets"]),
+                             {"http://agent-a:9000", "http://agent-c:9000"})
+
+            await self.manager.close()
+            self.assertFalse(client.httpx_client.is_closed)
+        self.assertTrue(client.httpx_client.is_closed)
+
+    async def test_concurrent_eviction_during_card_fetch(self):
+        """Test that a client whose card is being fetched is neither evicted nor closed."""
+        self.manager.max_clients = 1
+        fetching = asyncio.Event()
+        release = asyncio.Event()
+        fetch_card = self.manager._fetch_card
+
+        async def _slow_fetch(target_url, entry):
+            if "agent-a" in target_url:
+                fetching.set()
+                await release.wait()
+            await fetch_card(target_url, entry)
+
+        with mock.patch.object(self.manager, "_fetch_card", _slow_fetch):
+            task = asyncio.create_task(self.manager.get_client("http://agent-a:9000"))
+            await fetching.wait()
+            await self.manager.get_client("http://agent-b:9000")
+            release.set()
+            client = await task
+        self.assertFalse(client.httpx_client.is_closed)
+
+    async def test_clients_of_other_loops_closed_at_shutdown(self):
+        """Test that a tool's own asyncio.run loop gets its own pool, closed with the loop."""
+        def _tool():
+            async def _run():
+                client = await self.manager.get_http_client("http://agent-a:9000")
+                await self.manager.get_client("http://agent-a:9000")
+                return client
+            return asyncio.run(_run())
+
+        await self.manager.get_client("http://agent-a:9000")
+        client = await asyncio.to_thread(_tool)
+
+        self.assertTrue(client.is_closed)
+        self.assertFalse(self._entry("http://agent-a:9000").httpx_client.is_closed)
+        self.assertEqual(self.manager.stats()["open_clients"], 1)
+
+    async def test_send_message_uses_pool(self):
+        """Test that send_message_to_agent goes through the shared manager."""
+        with mock.patch.object(a2a, "get_a2a_client_manager", return_value=self.manager):
+            for _ in range(3):
+                response = await a2a.send_message_to_agent("http://agent-a:9000", "ping")
+                self.assertEqual(response, "pong")
+        self.assertEqual(self.agents.card_requests, 1)
+        self.assertEqual(self.agents.message_requests, 3)
+        self.assertEqual(self.agents.last_method, "message/stream")
+
+
+class TestAgentCardCache(unittest.IsolatedAsyncioTestCase):
+    """Test the on-disk card cache and conditional revalidation."""
+
+    URL = "http://localhost:9125"
+
+    async def asyncSetUp(self):
+        from agentbeats.agent_executor import BeatsAgent
+
+        self._tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+        env = mock.patch.dict(os.environ, {"AGENTBEATS_CACHE_DIR": self._tmp.name})
+        env.start()
+        self.addCleanup(env.stop)
+        os.environ.pop("AGENTBEATS_DISABLE_CACHE", None)
+
+        agent = BeatsAgent("cards", "0.0.0.0", 9125, "openai", "o4-mini")
+        agent.agent_card_json = _card(self.URL + "/")
+        agent._make_app()
+        self.app = agent.get_app()
+        self.statuses = []
+        self.managers = []
+
+    async def asyncTearDown(self):
+        for manager in self.managers:
+            await manager.close()
+
+    def _manager(self, reachable=True, **kwargs):
+        async def _record(response):
+            self.statuses.append(response.status_code)
+
+        def _refuse(request):
+            raise httpx.ConnectError("connection refused", request=request)
+
+        transport = (httpx.ASGITransport(app=self.app) if reachable
+                     else httpx.MockTransport(_refuse))
+        manager = A2AClientManager(http_kwargs={"transport": transport,
+                                                "event_hooks": {"response": [_record]}},
+                                   **kwargs)
+        self.managers.append(manager)
+        return manager
+
+    async def test_card_survives_restart(self):
+        """Test that a new manager uses the stored card without a request."""
+        card = await self._manager().get_card(self.URL)
+        self.assertIsNotNone(load_cached_card(self.URL).etag)
+
+        manager = self._manager()
+        self.assertEqual(await manager.get_card(self.URL), card)
+        self.assertEqual(self.statuses, [200])
+        self.assertEqual(manager.stats()["targets"][self.URL]["disk_hits"], 1)
+
+    async def test_expired_card_is_revalidated(self):
+        """Test that an expired card is revalidated with If-None-Match (304)."""
+        await self._manager().get_card(self.URL)
+        manager = self._manager(card_ttl=0)
+        await manager.get_card(self.URL)
+
+        self.assertEqual(self.statuses, [200, 304])
+        self.assertEqual(manager.stats()["targets"][self.URL]["card_revalidations"], 1)
+
+    async def test_stale_card_served_when_unreachable(self):
+        """Test that an expired card is used within max_stale if the agent is down."""
+        card = await self._manager().get_card(self.URL)
+
+        manager = self._manager(reachable=False, card_ttl=0)
+        self.assertEqual(await manager.get_card(self.URL), card)
+        self.assertEqual(manager.stats()["targets"][self.URL]["stale_served"], 1)
+
+        with self.assertRaises(A2AClientHTTPError):
+            await self._manager(reachable=False, card_ttl=0, max_stale=0).get_card(self.URL)
+
+    async def test_disk_cache_disabled(self):
+        """Test that disk_cache=False neither reads nor writes the store."""
+        await self._manager(disk_cache=False).get_card(self.URL)
+        self.assertIsNone(load_cached_card(self.URL))
+
+
+class TestStreamMessageToAgent(unittest.IsolatedAsyncioTestCase):
+    """Test the streaming iterator and its cutoffs."""
+
+    async def asyncSetUp(self):
+        self.manager = None
+
+    async def asyncTearDown(self):
+        await self.manager.close()
+
+    async def _collect(self, agents, **kwargs):
+        self.manager = A2AClientManager(
+            http_kwargs={"transport": httpx.MockTransport(agents)})
+        with mock.patch.object(a2a, "get_a2a_client_manager", return_value=self.manager):
+            return [chunk async for chunk in
+                    a2a.stream_message_to_agent("http://agent-a:9000", "go", **kwargs)]
+
+    async def test_typed_chunks_in_order(self):
+        """Test that events are yielded as typed chunks."""
+        agents = FakeAgents(events=[TASK, _artifact("one "), _artifact("two"), COMPLETED])
+        chunks = await self._collect(agents)
+
+        self.assertEqual([type(c) for c in chunks], [ArtifactChunk, ArtifactChunk, StatusChunk])
+        self.assertEqual(chunks[0].text, "one ")
+        self.assertEqual(chunks[0].task_id, "t1")
+        self.assertTrue(chunks[-1].final)
+        self.assertEqual(chunks[-1].state, "completed")
+        self.assertEqual(agents.cancelled, [])
+
+    async def test_max_bytes_cutoff_cancels_task(self):
+        """Test that exceeding max_bytes truncates, stops and cancels the task."""
+        agents = FakeAgents(events=[TASK, _artifact("abcdef"), _artifact("ghij"), COMPLETED])
+        chunks = await self._collect(agents, max_bytes=8)
+
+        self.assertEqual([c.text for c in chunks[:-1]], ["abcdef", "gh"])
+        self.assertIsInstance(chunks[-1], CutoffChunk)
+        self.assertEqual(chunks[-1].reason, "max_bytes")
+        self.assertEqual(chunks[-1].received_bytes, 8)
+        self.assertEqual(agents.cancelled, ["t1"])
+
+    async def test_max_time_cutoff_cancels_task(self):
+        """Test that a stalled responder is cut off after max_time."""
+        agents = FakeAgents(stall=True)
+        chunks = await self._collect(agents, max_time=0.2)
+
+        self.assertEqual(len(chunks), 1)
+        self.assertEqual(chunks[0].reason, "max_time")
+        self.assertEqual(agents.cancelled, ["t1"])
+
+    async def test_send_message_reports_cutoff(self):
+        """Test that send_message_to_agent marks a cut-off response."""
+        agents = FakeAgents(events=[TASK, _artifact("x" * 100), COMPLETED])
+        self.manager = A2AClientManager(
+            http_kwargs={"transport": httpx.MockTransport(agents)})
+        with mock.patch.object(a2a, "get_a2a_client_manager", return_value=self.manager):
+            response = await a2a.send_message_to_agent("http://agent-a:9000", "go", max_bytes=10)
+        self.assertTrue(response.startswith("x" * 10))
+        self.assertIn("[response cut off: max_bytes reached]", response)
+
+
+class TestExecutorCancel(unittest.IsolatedAsyncioTestCase):
+    """Test that tasks/cancel stops a running agent turn."""
+
+    async def test_cancel_running_task(self):
+        """Test that cancel stops invoke_agent and reports the canceled state."""
+        from a2a.server.request_handlers import DefaultRequestHandler
+        from a2a.server.tasks import InMemoryTaskStore
+        from a2a.types import Message, MessageSendParams, Part, Role, TaskIdParams, TextPart
+        from agentbeats.agent_executor import AgentBeatsExecutor
+
+        executor = AgentBeatsExecutor(_card("http://localhost/"), "openai", "o4-mini")
+        started = asyncio.Event()
+
+        async def _slow_turn(context):
+            started.set()
+            await asyncio.sleep(30)
+
+        executor.invoke_agent = _slow_turn
+        handler = DefaultRequestHandler(agent_executor=executor, task_store=InMemoryTaskStore())
+        params = MessageSendParams(message=Message(
+            role=Role.user, parts=[Part(TextPart(text="hi"))], messageId="m1"))
+
+        events = []
+
+        async def _consume():
+            async for event in handler.on_message_send_stream(params):
+                events.append(event)
+
+        consumer = asyncio.create_task(_consume())
+        await asyncio.wait_for(started.wait(), 5)
+        while len(events) < 2:      # task + "working..." status
+            await asyncio.sleep(0.01)
+        task_id = events[0].id
+        result = await asyncio.wait_for(handler.on_cancel_task(TaskIdParams(id=task_id)), 5)
+        # the SDK re-raises the producer's cancellation into the stream consumer
+        await asyncio.wait([consumer], timeout=5)
+
+        self.assertTrue(consumer.done())
+        self.assertEqual(result.status.state.value, "canceled")
+        self.assertEqual(events[-1].status.state.value, "canceled")
+        self.assertEqual(executor._running_tasks, {})
+
+
+class TestFanOut(unittest.IsolatedAsyncioTestCase):
+    """Test concurrency limits, quorum and deadline modes of the fan-out helpers."""
+
+    async def asyncSetUp(self):
+        self.delays = {"http://a": 0.01, "http://b": 0.05, "http://c": 5}
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.cancelled = []
+        patcher = mock.patch.object(a2a, "send_message_to_agent", self._fake_send)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def _fake_send(self, url, message, **kwargs):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delays[url])
+            return f"{url} got {message}"
+        except asyncio.CancelledError:
+            self.cancelled.append(url)
+            raise
+        finally:
+            self.in_flight -= 1
+
+    async def test_first_n_cancels_stragglers(self):
+        """Test that first_n returns early and cancels the slow target."""
+        results = await a2a.send_message_to_agents(list(self.delays), "hi", first_n=2)
+
+        self.assertEqual(list(results), list(self.delays))
+        self.assertEqual(results["http://a"], "http://a got hi")
+        self.assertEqual(results["http://c"], "Error: Cancelled after first 2 responses")
+        self.assertEqual(self.cancelled, ["http://c"])
+
+    async def test_deadline(self):
+        """Test that deadline returns whatever finished in time."""
+        results = await a2a.send_messages_to_agents(list(self.delays), ["1", "2", "3"],
+                                                    deadline=0.5)
+        self.assertEqual(results["http://b"], "http://b got 2")
+        self.assertEqual(results["http://c"], "Error: Deadline of 0.5 seconds reached")
+        self.assertEqual(self.cancelled, ["http://c"])
+
+    async def test_per_target_timeout(self):
+        """Test that the per-target timeout still yields an error string."""
+        results = await a2a.send_message_to_agents(list(self.delays), "hi", timeout=0.5)
+        self.assertEqual(results["http://c"], "Error: Timeout after 0.5 seconds")
+
+    async def test_max_concurrency(self):
+        """Test that no more than max_concurrency sends run at once."""
+        self.delays = {f"http://{i}": 0.01 for i in range(6)}
+        results = await a2a.send_message_to_agents(list(self.delays), "hi", max_concurrency=2)
+        self.assertEqual(len(results), 6)
+        self.assertEqual(self.max_in_flight, 2)
+
+
+class TestRetryAndCircuitBreaker(unittest.IsolatedAsyncioTestCase):
+    """Test retry classification, backoff and per-target breakers."""
+
+    URL = "http://agent-a:9000"
+
+    async def asyncSetUp(self):
+        reset_circuit_breakers()
+        self.card_ok = True
+        self.message_status = 500
+        self.attempts = 0
+        self.manager = A2AClientManager(
+            http_kwargs={"transport": httpx.MockTransport(self._handler)})
+        patcher = mock.patch.object(a2a, "get_a2a_client_manager", return_value=self.manager)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def asyncTearDown(self):
+        await self.manager.close()
+        reset_circuit_breakers()
+        configure_circuit_breakers(failure_threshold=5, recovery_timeout=30.0)
+
+    def _handler(self, request):
+        self.attempts += 1
+        if not self.card_ok:
+            raise httpx.ConnectError("connection refused", request=request)
+        if request.url.path == "/.well-known/agent.json":
+            return httpx.Response(200, json=_card(self.URL + "/"))
+        if self.message_status != 200:
+            return httpx.Response(self.message_status, text="boom")
+        return httpx.Response(200, text=_sse(_artifact("ok"), COMPLETED),
+                              headers={"content-type": "text/event-stream"})
+
+    async def test_connect_errors_are_retried(self):
+        """Test that an unreachable agent is retried up to max_attempts."""
+        self.card_ok = False
+        with self.assertRaises(Exception):
+            await a2a.send_message_to_agent(self.URL, "hi",
+                                            retry=RetryPolicy(max_attempts=3, base_delay=0))
+        self.assertEqual(self.attempts, 3)
+
+    async def test_server_errors_retried_only_when_idempotent(self):
+        """Test that a 5xx after delivery is only retried for idempotent sends."""
+        policy = RetryPolicy(max_attempts=3, base_delay=0)
+        with self.assertRaises(Exception):
+            await a2a.send_message_to_agent(self.URL, "hi", retry=policy)
+        self.assertEqual(self.attempts, 2)          # card + one message attempt
+
+        self.attempts = 0
+        with self.assertRaises(Exception):
+            await a2a.send_message_to_agent(self.URL, "hi", retry=policy, idempotent=True)
+        self.assertEqual(self.attempts, 3)
+
+    async def test_breaker_opens_and_recovers(self):
+        """Test that the breaker fails fast while open and closes after a good trial."""
+        configure_circuit_breakers(failure_threshold=2, recovery_timeout=60)
+        for _ in range(2):
+            with self.assertRaises(Exception):
+                await a2a.send_message_to_agent(self.URL, "hi")
+        self.assertFalse(is_agent_available(self.URL))
+        self.assertEqual(get_circuit_states()[self.URL]["state"], "open")
+
+        attempts = self.attempts
+        with self.assertRaises(CircuitOpenError):
+            await a2a.send_message_to_agent(self.URL, "hi")
+        self.assertEqual(self.attempts, attempts)   # nothing was sent
+        results = await a2a.send_message_to_agents([self.URL], "hi")
+        self.assertTrue(results[self.URL].startswith("Error: Circuit open"))
+
+        self.message_status = 200
+        with mock.patch("agentbeats.utils.agents.resilience.time.monotonic",
+                        return_value=10 ** 9):
+            self.assertEqual(get_circuit_states()[self.URL]["state"], "half_open")
+            self.assertEqual(await a2a.send_message_to_agent(self.URL, "hi"), "ok")
+        self.assertEqual(get_circuit_states()[self.URL]["state"], "closed")
+
+    def test_half_open_admits_one_trial(self):
+        """Test that a half-open breaker lets exactly one caller through until it reports back."""
+        breaker = CircuitBreaker(self.URL, failure_threshold=1, recovery_timeout=10)
+        clock = mock.patch("agentbeats.utils.agents.resilience.time.monotonic", return_value=100.0)
+        now = clock.start()
+        self.addCleanup(clock.stop)
+        breaker.record_failure()
+
+        now.return_value = 111.0
+        breaker.check()                             # the trial
+        for _ in range(3):
+            with self.assertRaises(CircuitOpenError):
+                breaker.check()
+        self.assertTrue(breaker.snapshot()["trial_in_flight"])
+
+        breaker.record_failure()                    # failed trial: open again
+        self.assertEqual(breaker.state, "open")
+        now.return_value = 122.0
+        breaker.check()
+        # a trial that never reports back expires after recovery_timeout
+        now.return_value = 133.0
+        breaker.check()
+        breaker.record_success()
+        self.assertEqual(breaker.state, "closed")
+        breaker.check()
+        breaker.check()
+        self.assertEqual(breaker.total_rejected, 3)
+
+    def test_backoff_is_bounded(self):
+        """Test that jittered delays stay within the exponential cap."""
+        policy = RetryPolicy(base_delay=1, max_delay=5, multiplier=2)
+        for attempt in range(6):
+            self.assertLessEqual(policy.delay(attempt), min(5, 2 ** attempt))
+
+
+class TestA2ASession(unittest.IsolatedAsyncioTestCase):
+    """Test context pinning, task continuation and stats of A2ASession."""
+
+    URL = "http://agent-a:9000"
+
+    async def asyncSetUp(self):
+        reset_circuit_breakers()
+        self.sent = []
+        self.failures = []                      # raised by the next message requests
+        self.next_state = "completed"
+        self.manager = A2AClientManager(
+            http_kwargs={"transport": httpx.MockTransport(self._handler)})
+        patcher = mock.patch.object(a2a, "get_a2a_client_manager", return_value=self.manager)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def asyncTearDown(self):
+        await self.manager.close()
+
+    def _handler(self, request):
+        if request.url.path == "/.well-known/agent.json":
+            return httpx.Response(200, json=_card(self.URL + "/"))
+        if self.failures:
+            raise self.failures.pop()
+        message = json.loads(request.content)["params"]["message"]
+        self.sent.append(message)
+        context_id = message["contextId"]
+        status = {"kind": "status-update", "taskId": "t1", "contextId": context_id,
+                  "final": True, "status": {"state": self.next_state}}
+        reply = dict(_artifact(f"turn {len(self.sent)}"), contextId=context_id)
+        return httpx.Response(200, text=_sse(reply, status),
+                              headers={"content-type": "text/event-stream"})
+
+    async def test_context_is_pinned(self):
+        """Test that every message of a session carries the same contextId."""
+        session = A2ASession(self.URL)
+        self.assertEqual(await session.send("one"), "turn 1")
+        self.assertEqual(await session.send("two"), "turn 2")
+
+        self.assertEqual({m["contextId"] for m in self.sent}, {session.context_id})
+        self.assertNotIn("taskId", self.sent[1])
+
+        session.reset()
+        await session.send("three")
+        self.assertNotEqual(self.sent[2]["contextId"], self.sent[0]["contextId"])
+
+    async def test_input_required_continues_task(self):
+        """Test that a follow-up answers the task waiting for input."""
+        session = A2ASession(self.URL)
+        self.next_state = "input-required"
+        await session.send("start")
+        self.assertEqual(session.task_id, "t1")
+
+        self.next_state = "completed"
+        await session.send("more input")
+        self.assertEqual(self.sent[1]["taskId"], "t1")
+        self.assertIsNone(session.task_id)
+
+    async def test_stats(self):
+        """Test per-session message counters and latency figures."""
+        session = A2ASession(self.URL)
+        for text in ("a", "b", "c"):
+            await session.send(text)
+        stats = session.stats()
+
+        self.assertEqual(stats["messages"], 3)
+        self.assertEqual(stats["errors"], 0)
+        self.assertEqual(stats["bytes_received"], len("turn 1turn 2turn 3"))
+        self.assertGreaterEqual(stats["max_latency"], stats["avg_latency"])
+        self.assertIsNotNone(stats["avg_first_chunk_latency"])
+
+    async def test_retried_send_counts_once(self):
+        """Test that a retried send is one message and its extra attempts count as retries."""
+        self.failures = [httpx.ConnectError("connection refused")]
+        session = A2ASession(self.URL, retry=RetryPolicy(max_attempts=3, base_delay=0))
+        self.assertEqual(await session.send("hi"), "turn 1")
+        stats = session.stats()
+
+        self.assertEqual(stats["messages"], 1)
+        self.assertEqual(stats["retries"], 1)
+        self.assertEqual(stats["errors"], 0)
+
+
+class TestLoopbackTransport(unittest.IsolatedAsyncioTestCase):
+    """Test in-process dispatch to agents served from the same loop."""
+
+    URL = "http://localhost:9123/"
+
+    async def asyncSetUp(self):
+        from agentbeats.agent_executor import BeatsAgent
+
+        reset_circuit_breakers()
+        self.agent = BeatsAgent("local", "0.0.0.0", 9123, "openai", "o4-mini")
+        self.agent.agent_card_json = _card(self.URL)
+        self.agent._make_app()
+        self.executor = self.agent.request_handler.agent_executor
+
+        async def _echo(context):
+            return f"echo: {context.get_user_input()}"
+
+        self.executor.invoke_agent = _echo
+
+        # HTTP goes straight into the ASGI app, so both paths can be compared
+        self.manager = A2AClientManager(
+            http_kwargs={"transport": httpx.ASGITransport(app=self.agent.get_app())})
+        patcher = mock.patch.object(a2a, "get_a2a_client_manager", return_value=self.manager)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def asyncTearDown(self):
+        from agentbeats.utils.agents.loopback import unregister_local_agent
+
+        unregister_local_agent(self.agent.request_handler)
+        await self.manager.close()
+
+    async def _chunks(self, url):
+        return [(type(c).__name__, c.text, getattr(c, "state", None))
+                async for c in a2a.stream_message_to_agent(url, "hi")]
+
+    async def test_same_chunks_as_http(self):
+        """Test that loopback yields exactly what the HTTP path yields."""
+        over_http = await self._chunks(self.URL)
+        self.assertEqual(self.manager.stats()["open_clients"], 1)
+
+        self.agent._register_loopback()
+        await self.manager.close()
+        in_process = await self._chunks("http://127.0.0.1:9123")
+
+        self.assertEqual(in_process, over_http)
+        self.assertIn(("ArtifactChunk", "echo: hi", None), in_process)
+        self.assertEqual(self.manager.stats()["open_clients"], 0)   # no HTTP used
+
+    async def test_disabled_by_env(self):
+        """Test that AGENTBEATS_DISABLE_LOOPBACK forces HTTP."""
+        self.agent._register_loopback()
+        with mock.patch.dict("os.environ", {"AGENTBEATS_DISABLE_LOOPBACK": "1"}):
+            await a2a.send_message_to_agent(self.URL, "hi")
+        self.assertEqual(self.manager.stats()["open_clients"], 1)
+
+    async def test_cutoff_cancels_local_task(self):
+        """Test that a loopback max_time cutoff cancels the running turn."""
+        async def _stall(context):
+            await asyncio.sleep(30)
+
+        self.executor.invoke_agent = _stall
+        self.agent._register_loopback()
+        chunks = [c async for c in a2a.stream_message_to_agent(self.URL, "hi", max_time=0.3)]
+
+        self.assertIsInstance(chunks[-1], CutoffChunk)
+        self.assertEqual(self.executor._running_tasks, {})
+
+    async def test_handler_error_reaches_caller(self):
+        """Test that a failing loopback handler raises to the caller and counts for the breaker."""
+        async def _fail(params, context=None):
+            raise ConnectionError("agent crashed")
+            yield
+
+        self.agent._register_loopback()
+        with mock.patch.object(self.agent.request_handler, "on_message_send_stream", _fail):
+            with self.assertRaises(ConnectionError):
+                await a2a.send_message_to_agent(self.URL, "hi")
+        self.assertEqual(get_circuit_states()[self.URL.rstrip("/")]["consecutive_failures"], 1)
+
+        await a2a.send_message_to_agent(self.URL, "hi")
+        self.assertEqual(get_circuit_states()[self.URL.rstrip("/")]["consecutive_failures"], 0)
+
+    async def test_lifespan_registers_and_closes(self):
+        """Test that lifespan startup registers the agent and shutdown closes its push client."""
+        from agentbeats.utils.agents.loopback import get_local_handler
+
+        messages = asyncio.Queue()
+        sent = []
+
+        async def _send(message):
+            sent.append(message["type"])
+
+        server = asyncio.create_task(self.agent.get_app()(
+            {"type": "lifespan", "asgi": {"version": "3.0"}, "state": {}},
+            messages.get, _send))
+        await messages.put({"type": "lifespan.startup"})
+        while not sent:
+            await asyncio.sleep(0.01)
+        self.assertIs(get_local_handler(self.URL), self.agent.request_handler)
+
+        await messages.put({"type": "lifespan.shutdown"})
+        await asyncio.wait_for(server, 5)
+        self.assertEqual(sent, ["lifespan.startup.complete", "lifespan.shutdown.complete"])
+        self.assertIsNone(get_local_handler(self.URL))
+        self.assertTrue(self.agent._push_client.is_closed)
+
+    async def test_sessions_keep_separate_histories(self):
+        """Test that interleaved sessions with one agent each see only their own turns."""
+        class _Result:
+            def __init__(self, items):
+                self.items = items
+                self.final_output = " | ".join(m["content"] for m in items if m["role"] == "user")
+
+            def to_input_list(self):
+                return self.items + [{"role": "assistant", "content": self.final_output}]
+
+        async def _run(agent, items, max_turns):
+            return _Result(list(items))
+
+        del self.executor.invoke_agent          # back to the real turn handling
+        self.executor.main_agent = object()
+        self.executor.max_conversations = 2
+        first, second = A2ASession(self.URL), A2ASession(self.URL)
+        with mock.patch("agentbeats.agent_executor.Runner.run", _run), \
+                redirect_stdout(io.StringIO()):
+            await first.send("a1")
+            await second.send("b1")
+            # replies follow the "working..." status text
+            self.assertTrue((await first.send("a2")).endswith("...a1 | a2"))
+            self.assertTrue((await second.send("b2")).endswith("...b1 | b2"))
+            await A2ASession(self.URL).send("c1")
+
+        # bounded: the least recently used conversation was dropped
+        self.assertEqual(len(self.executor.chat_histories), 2)
+        self.assertIn(second.context_id, self.executor.chat_histories)
+        self.assertNotIn(first.context_id, self.executor.chat_histories)
+
+    async def test_short_reply_is_single_message(self):
+        """Test that short=True gets one Message back over HTTP and loopback."""
+        from a2a.types import Message
+
+        seen = []
+        handler = self.agent.request_handler
+        original = handler.on_message_send
+
+        async def _spy(params, context=None):
+            result = await original(params, context)
+            seen.append(result)
+            return result
+
+        handler.on_message_send = _spy
+        over_http = await a2a.send_message_to_agent(self.URL, "hi", short=True)
+        self.agent._register_loopback()
+        in_process = await a2a.send_message_to_agent(self.URL, "hi", short=True)
+
+        self.assertEqual(over_http, "echo: hi")
+        self.assertEqual(in_process, over_http)
+        self.assertEqual(len(seen), 2)
+        self.assertTrue(all(isinstance(r, Message) and r.task_id is None for r in seen))
+
+    async def test_short_rejects_cutoffs(self):
+        """Test that short=True cannot be combined with max_bytes / max_time."""
+        with self.assertRaises(ValueError):
+            await a2a.send_message_to_agent(self.URL, "hi", short=True, max_bytes=10)
+
+
+class TestCompressionAndLimits(unittest.IsolatedAsyncioTestCase):
+    """Test negotiated compression, request limits and artifact truncation."""
+
+    URL = "http://localhost:9126/"
+
+    async def asyncSetUp(self):
+        from agentbeats.agent_executor import BeatsAgent
+
+        reset_circuit_breakers()
+        self.agent = BeatsAgent("big", "0.0.0.0", 9126, "openai", "o4-mini")
+        self.agent.agent_card_json = _card(self.URL)
+        self.responses = []
+
+        async def _record(response):
+            self.responses.append(response)
+
+        async def _echo(context):
+            return context.get_user_input()
+
+        self.agent._make_app()
+        self.agent.request_handler.agent_executor.invoke_agent = _echo
+        self.manager = A2AClientManager(
+            http_kwargs={"transport": httpx.ASGITransport(app=self.agent.get_app()),
+                         "event_hooks": {"response": [_record]}})
+        patcher = mock.patch.object(a2a, "get_a2a_client_manager", return_value=self.manager)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def asyncTearDown(self):
+        await self.manager.close()
+
+    def _remake(self, **limits):
+        executor = self.agent.request_handler.agent_executor
+        for name, value in limits.items():
+            setattr(self.agent, name, value)
+        self.agent._make_app()
+        self.agent.request_handler.agent_executor.invoke_agent = executor.invoke_agent
+        self.manager.http_kwargs["transport"] = httpx.ASGITransport(app=self.agent.get_app())
+
+    async def test_large_payloads_compressed_both_ways(self):
+        """Test that big requests and replies are sent compressed and arrive intact."""
+        payload = "nmap output line\n" * 2000
+        reply = await a2a.send_message_to_agent(self.URL, payload, short=True)
+
+        self.assertEqual(reply, payload.strip())
+        send = self.responses[-1]
+        self.assertEqual(send.headers["content-encoding"], "gzip")
+        self.assertEqual(send.request.headers["content-encoding"], "gzip")
+        self.assertLess(int(send.request.headers["content-length"]), len(payload) // 10)
+
+    async def test_small_payloads_sent_plain(self):
+        """Test that short exchanges skip compression."""
+        await a2a.send_message_to_agent(self.URL, "hi", short=True)
+        self.assertNotIn("content-encoding", self.responses[-1].headers)
+        self.assertNotIn("content-encoding", self.responses[-1].request.headers)
+
+    async def test_request_size_limit(self):
+        """Test that requests over max_request_size are rejected with 413."""
+        self._remake(max_request_size=4096)
+        client = await self.manager.get_http_client(self.URL)
+        response = await client.post(self.URL, content=b"x" * 5000)
+        self.assertEqual(response.status_code, 413)
+
+        bomb = gzip.compress(b"{" + b" " * 100000 + b"}")
+        response = await client.post(self.URL, content=bomb,
+                                     headers={"content-encoding": "gzip"})
+        self.assertEqual(response.status_code, 413)
+
+    async def test_truncated_artifact_points_to_full_text(self):
+        """Test that long replies are truncated with a link to the full artifact."""
+        self._remake(max_artifact_bytes=300)
+        payload = "".join(f"line {i}\n" for i in range(500))
+        chunks = [c async for c in a2a.stream_message_to_agent(self.URL, payload)]
+        artifact = next(c for c in chunks if isinstance(c, ArtifactChunk))
+
+        self.assertLess(len(artifact.text), 600)
+        self.assertTrue(artifact.text.startswith("line 0\n"))
+        self.assertTrue(artifact.text.endswith("line 499\n"))
+        self.assertIn(artifact.full_url, artifact.text)
+        self.assertEqual(await a2a.fetch_full_artifact(artifact.full_url), payload)
+
+    def test_truncated_text_fits_limit(self):
+        """Test that truncate_text stays within max_bytes and counts the omitted bytes."""
+        from agentbeats.utils.agents.artifacts import truncate_text
+
+        text = "é" * 1000 + "x" * 1000       # multi-byte characters cut on either side
+        for max_bytes in (200, 301, 1000):
+            result, metadata = truncate_text(text, max_bytes, "http://localhost:9125/artifacts/abc")
+            self.assertLessEqual(len(result.encode()), max_bytes)
+            head, _, tail = result.partition("\n\n[... truncated: ")
+            omitted = int(tail.split(" ", 1)[0])
+            tail = tail.split("...]\n\n", 1)[1]
+            self.assertEqual(omitted, len(text.encode()) - len((head + tail).encode()))
+            self.assertEqual(metadata["agentbeats.full_size"], len(text.encode()))
+
+
+class TestPushNotifications(unittest.IsolatedAsyncioTestCase):
+    """Test non-blocking sends with results delivered to a webhook."""
+
+    URL = "http://localhost:9124/"
+
+    async def asyncSetUp(self):
+        from agentbeats.agent_executor import BeatsAgent
+
+        reset_circuit_breakers()
+        self.agent = BeatsAgent("push", "0.0.0.0", 9124, "openai", "o4-mini")
+        self.agent.agent_card_json = _card(self.URL)
+        self.agent._make_app()
+
+        async def _slow_echo(context):
+            await asyncio.sleep(0.3)
+            return f"echo: {context.get_user_input()}"
+
+        self.agent.request_handler.agent_executor.invoke_agent = _slow_echo
+        self.manager = A2AClientManager(
+            http_kwargs={"transport": httpx.ASGITransport(app=self.agent.get_app())})
+        patcher = mock.patch.object(a2a, "get_a2a_client_manager", return_value=self.manager)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch("agentbeats.utils.agents.push.get_a2a_client_manager",
+                             return_value=self.manager)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.receiver = await PushNotificationReceiver().start()
+
+    async def asyncTearDown(self):
+        from agentbeats.utils.agents.loopback import unregister_local_agent
+
+        unregister_local_agent(self.agent.request_handler)
+        await self.receiver.stop()
+        await self.manager.close()
+
+    async def _round_trip(self):
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        task_id = await send_message_with_push(self.URL, "hi", self.receiver)
+        self.assertLess(loop.time() - start, 0.3)       # returned before the turn ended
+        result = await self.receiver.wait_for_result(task_id, timeout=5)
+        self.assertEqual(result, "echo: hi")
+        # nothing is kept once the result has been handed out
+        self.assertIsNone(self.receiver.get_task(task_id))
+        self.assertEqual(self.receiver._results, {})
+
+    async def test_push_over_http(self):
+        """Test message/send with blocking=false over HTTP."""
+        await self._round_trip()
+
+    async def test_push_over_loopback(self):
+        """Test the same flow for an agent hosted in this process."""
+        self.agent._register_loopback()
+        await self._round_trip()
+        self.assertEqual(self.manager.stats()["open_clients"], 0)
+
+    async def test_card_advertises_push(self):
+        """Test that the agent card enables the pushNotifications capability."""
+        card = await self.manager.get_card(self.URL)
+        self.assertTrue(card.capabilities.push_notifications)
+
+    async def test_unclaimed_tasks_capped(self):
+        """Test that snapshots of tasks nobody waits for are bounded by max_tasks."""
+        from a2a.types import Task
+
+        self.receiver.max_tasks = 2
+        for i in range(5):
+            state = "completed" if i < 4 else "working"
+            self.receiver._on_notification(Task.model_validate(
+                dict(TASK, id=f"t{i}", status={"state": state})))
+        self.assertEqual(list(self.receiver._tasks), ["t3", "t4"])
+        self.assertEqual(set(self.receiver._results), {"t3"})
+        self.assertEqual((await self.receiver.wait_for_task("t3", timeout=1)).id, "t3")
+
+    async def test_rejects_wrong_token(self):
+        """Test that notifications without the receiver's token are refused."""
+        async with httpx.AsyncClient() as client:
+            response = await client.post(self.receiver.url, json=TASK,
+                                         headers={"X-A2A-Notification-Token": "wrong"})
+        self.assertEqual(response.status_code, 401)
+        self.assertIsNone(self.receiver.get_task("t1"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+"""
+Tests for the AgentBeats on-disk caches.
+"""
+
+import os
+import json
+import asyncio
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import agents
+from agents.tool_context import ToolContext
+from agentbeats.cache import cached_function_tool, tool_schema_cache_stats
+
+
+def lookup_flag(host: str, port: int = 22) -> str:
+    """Look up the flag on a host.
+
+    Args:
+        host: Host to query.
+        port: SSH port.
+    """
+    return f"{host}:{port}"
+
+
+class TestToolSchemaCache(unittest.TestCase):
+    """Test the persistent function_tool schema cache."""
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self._env = patch.dict(os.environ, {"AGENTBEATS_CACHE_DIR": self._tmp.name})
+        self._env.start()
+
+    def tearDown(self):
+        self._env.stop()
+        self._tmp.cleanup()
+
+    def test_miss_then_hit(self):
+        """Test that the second build reuses the cached schema."""
+        before = tool_schema_cache_stats()
+        cold = cached_function_tool(lookup_flag, name_override="lookup")
+
+        with patch.object(agents, "function_tool", wraps=agents.function_tool) as spy:
+            warm = cached_function_tool(lookup_flag, name_override="lookup")
+            spy.assert_not_called()
+
+        after = tool_schema_cache_stats()
+        self.assertEqual(after["misses"] - before["misses"], 1)
+        self.assertEqual(after["hits"] - before["hits"], 1)
+        self.assertEqual(warm.name, "lookup")
+        self.assertEqual(warm.description, cold.description)
+        self.assertEqual(warm.params_json_schema, cold.params_json_schema)
+
+        files = os.listdir(os.path.join(self._tmp.name, "tool_schemas"))
+        self.assertEqual(len(files), 1)
+
+    def test_cached_tool_invokes_function(self):
+        """Test that a tool built from cache still runs the function."""
+        cached_function_tool(lookup_flag)
+        warm = cached_function_tool(lookup_flag)
+
+        arguments = json.dumps({"host": "arena", "port": 2222})
+        ctx = ToolContext(context=None, tool_name="lookup_flag",
+                          tool_call_id="call_1", tool_arguments=arguments)
+        result = asyncio.run(warm.on_invoke_tool(ctx, arguments))
+        self.assertEqual(result, "arena:2222")
+
+    def test_name_is_part_of_key(self):
+        """Test that a different tool name does not hit the same entry."""
+        cached_function_tool(lookup_flag, name_override="a")
+        other = cached_function_tool(lookup_flag, name_override="b")
+
+        self.assertEqual(other.name, "b")
+
+    def test_cache_disabled(self):
+        """Test that AGENTBEATS_DISABLE_CACHE bypasses the cache."""
+        with patch.dict(os.environ, {"AGENTBEATS_DISABLE_CACHE": "1"}):
+            cached_function_tool(lookup_flag)
+
+        self.assertFalse(os.path.exists(os.path.join(self._tmp.name, "tool_schemas")))
+
+    def test_unusable_cache_dir(self):
+        """Test that an unusable cache dir falls back to uncached work instead of raising."""
+        from agentbeats.utils.agents.card_cache import (CachedCard, clear_card_cache,
+                                                        load_cached_card, store_cached_card)
+        from agentbeats.utils.environment.build_cache import load_build_record, store_build_record
+
+        blocker = os.path.join(self._tmp.name, "not-a-dir")
+        open(blocker, "w").close()
+        before = tool_schema_cache_stats()
+        with patch.dict(os.environ, {"AGENTBEATS_CACHE_DIR": os.path.join(blocker, "cache")}):
+            tool = cached_function_tool(lookup_flag, name_override="lookup")
+
+            store_cached_card(CachedCard("http://agent:9000", {"name": "a"}, 0.0))
+            self.assertIsNone(load_cached_card("http://agent:9000"))
+            clear_card_cache()
+            store_build_record(self._tmp.name, "digest", ["sha256:4f1c2b8e9a7d"], 1.0)
+            self.assertIsNone(load_build_record(self._tmp.name))
+
+        self.assertEqual(tool.name, "lookup")
+        self.assertEqual(tool_schema_cache_stats()["uncacheable"] - before["uncacheable"], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
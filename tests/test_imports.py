@@ -0,0 +1,79 @@
+"""
+Import-time regression tests for the AgentBeats package.
+"""
+
+import os
+import sys
+import json
+import subprocess
+import unittest
+
+# Cold `import agentbeats` must stay below this many seconds. It is measured
+# in a fresh interpreter; override with AGENTBEATS_IMPORT_BUDGET on slow CI.
+IMPORT_BUDGET_SECONDS = float(os.getenv("AGENTBEATS_IMPORT_BUDGET", "0.25"))
+
+# Heavy dependencies that a plain `import agentbeats` must not load
+HEAVY_MODULES = [
+    "agents", "openai", "a2a", "fastapi", "uvicorn",
+    "paramiko", "requests", "httpx",
+]
+
+_PROBE = """
+import sys, time, json
+start = time.perf_counter()
+import agentbeats
+elapsed = time.perf_counter() - start
+print(json.dumps({"elapsed": elapsed,
+                  "loaded": [m for m in %r if m in sys.modules]}))
+""" % (HEAVY_MODULES,)
+
+
+def _cold_import():
+    output = subprocess.check_output([sys.executable, "-c", _PROBE], text=True)
+    return json.loads(output.strip().splitlines()[-1])
+
+
+class TestLazyImports(unittest.TestCase):
+    """Test that the top-level package imports lazily."""
+
+    def test_no_heavy_modules_on_import(self):
+        """Test that heavy dependencies are not loaded by `import agentbeats`."""
+        result = _cold_import()
+        self.assertEqual(result["loaded"], [])
+
+    def test_import_time_budget(self):
+        """Test that a cold `import agentbeats` stays within budget."""
+        # best of three, to keep a busy machine from failing the test
+        elapsed = min(_cold_import()["elapsed"] for _ in range(3))
+        self.assertLess(elapsed, IMPORT_BUDGET_SECONDS)
+
+    def test_lazy_attributes_resolve(self):
+        """Test that public names still resolve on first access."""
+        import agentbeats
+        from agentbeats.agent_executor import BeatsAgent
+        from agentbeats.utils.commands import SSHClient
+
+        self.assertIs(agentbeats.BeatsAgent, BeatsAgent)
+        self.assertIs(agentbeats.SSHClient, SSHClient)
+        self.assertIs(agentbeats.utils.SSHClient, SSHClient)
+        with self.assertRaises(AttributeError):
+            agentbeats.does_not_exist
+
+    def test_utils_all_matches_subpackages(self):
+        """Test that agentbeats.utils.__all__ lists every subpackage name and all of them resolve."""
+        import importlib
+        import agentbeats.utils as utils
+
+        exported = set()
+        for name in ("agents", "environment", "commands", "assets"):
+            exported |= set(importlib.import_module(f"agentbeats.utils.{name}").__all__)
+        self.assertEqual(set(utils.__all__), exported)
+        self.assertLessEqual(exported, set(dir(utils)))
+
+        namespace = {}
+        exec("from agentbeats.utils import *", namespace)
+        self.assertLessEqual(exported, set(namespace))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,206 @@
+"""
+Tests for the AgentBeats agent launcher.
+"""
+
+import io
+import os
+import sys
+import tempfile
+import subprocess
+import unittest
+from pathlib import Path
+from contextlib import redirect_stderr
+from unittest.mock import patch, MagicMock
+
+from fastapi.testclient import TestClient
+
+from agentbeats import resource_limits
+from agentbeats.agent_launcher import BeatsAgentLauncher
+from agentbeats.cli import main as cli_main
+from agentbeats.resource_limits import (
+    AgentResourceLimits, AgentResourceGuard, parse_memory_size
+)
+
+
+def _make_launcher(**kwargs):
+    return BeatsAgentLauncher(
+        agent_card="agent_card.toml",
+        launcher_host="localhost",
+        launcher_port=8000,
+        agent_host="localhost",
+        agent_port=8001,
+        model_type="openai",
+        model_name="o4-mini",
+        mcp_list=[],
+        tool_list=["tools.py"],
+        backend_url="http://localhost:9000/",
+        **kwargs,
+    )
+
+
+def _fake_cgroup_tree(test):
+    """
+    A cgroup v2 root in a temp dir with the launcher in the non-root group
+    /svc, so no test touches the real /sys/fs/cgroup.
+    """
+    tmp = tempfile.TemporaryDirectory()
+    test.addCleanup(tmp.cleanup)
+    root = Path(tmp.name)
+    parent = root / "svc"
+    parent.mkdir()
+    (root / "cgroup.controllers").write_text("cpu memory\n")
+    (parent / "cgroup.controllers").write_text("cpu memory pids\n")
+    (parent / "cgroup.subtree_control").write_text("\n")
+    for patcher in (patch.object(resource_limits, "_CGROUP_ROOT", root),
+                    patch.object(resource_limits, "_own_cgroup", return_value=parent)):
+        patcher.start()
+        test.addCleanup(patcher.stop)
+    return root, parent
+
+
+class TestResourceLimits(unittest.TestCase):
+    """Test resource limit parsing and enforcement."""
+
+    def setUp(self):
+        self.root, self.parent = _fake_cgroup_tree(self)
+
+    def test_parse_memory_size(self):
+        """Test parsing of memory sizes with units."""
+        self.assertEqual(parse_memory_size("1024"), 1024)
+        self.assertEqual(parse_memory_size("512M"), 512 * 1024 ** 2)
+        self.assertEqual(parse_memory_size("2g"), 2 * 1024 ** 3)
+        self.assertEqual(parse_memory_size("1.5kb"), 1536)
+        with self.assertRaises(ValueError):
+            parse_memory_size("lots")
+
+    def test_from_cli_empty(self):
+        """Test that no CLI limits means no limits object."""
+        self.assertIsNone(AgentResourceLimits.from_cli())
+        limits = AgentResourceLimits.from_cli(memory_limit="256M", fd_limit=64)
+        self.assertEqual(limits.memory_bytes, 256 * 1024 ** 2)
+        self.assertEqual(limits.max_open_files, 64)
+        self.assertIsNone(limits.cpu_cores)
+
+    @unittest.skipUnless(sys.platform.startswith("linux"), "rlimits are Linux only")
+    def test_fd_limit_applied_to_child(self):
+        """Test that the file descriptor limit reaches the child process."""
+        guard = AgentResourceGuard("test", AgentResourceLimits(max_open_files=123))
+        output = subprocess.check_output(
+            [sys.executable, "-c",
+             "import resource; print(resource.getrlimit(resource.RLIMIT_NOFILE)[0])"],
+            preexec_fn=guard.preexec_fn(),
+            text=True,
+        )
+        self.assertEqual(output.strip(), "123")
+
+    @unittest.skipUnless(sys.platform.startswith("linux"), "cgroups are Linux only")
+    def test_cgroup_created_beside_launcher_leaf(self):
+        """Test that the launcher leaves its group before delegating controllers."""
+        root, parent = self.root, self.parent
+        guard = AgentResourceGuard("8001", AgentResourceLimits(memory_bytes=1024 ** 3, cpu_cores=0.5))
+        self.assertEqual(guard.mechanism, "cgroup")
+        self.assertEqual((parent / "agentbeats-launcher" / "cgroup.procs").read_text(),
+                         str(os.getpid()))
+        self.assertEqual((parent / "cgroup.subtree_control").read_text(), "+memory +cpu")
+        self.assertEqual((parent / "agentbeats-8001" / "memory.max").read_text(), str(1024 ** 3))
+        self.assertEqual((parent / "agentbeats-8001" / "cpu.max").read_text(), "50000 100000")
+
+        # a second guard, started from inside the leaf, uses the same parent
+        (parent / "cgroup.subtree_control").write_text("memory cpu\n")
+        with patch.object(resource_limits, "_own_cgroup",
+                          return_value=parent / "agentbeats-launcher"):
+            guard = AgentResourceGuard("8002", AgentResourceLimits(memory_bytes=1024 ** 2))
+        self.assertEqual(guard.cgroup_path, parent / "agentbeats-8002")
+
+    @unittest.skipUnless(sys.platform.startswith("linux"), "rlimits are Linux only")
+    def test_cgroup_join_failure_falls_back_to_rlimits(self):
+        """Test that an agent unable to join its cgroup still starts, with rlimits."""
+        root, parent = self.root, self.parent
+        guard = AgentResourceGuard("8001", AgentResourceLimits(memory_bytes=2 * 1024 ** 3))
+        guard.cgroup_path = root / "gone"         # cgroup.procs can't be written
+        proc = subprocess.Popen(
+            [sys.executable, "-c",
+             "import resource; print(resource.getrlimit(resource.RLIMIT_DATA)[0])"],
+            preexec_fn=guard.preexec_fn(), stdout=subprocess.PIPE, text=True)
+        output, _ = proc.communicate()
+
+        self.assertEqual(output.strip(), str(2 * 1024 ** 3))
+        self.assertFalse(guard.confirm_cgroup(proc.pid))
+        self.assertEqual(guard.mechanism, "rlimit")
+
+        # the cgroup stays configured: a restarted agent that joins it is limited by it
+        self.assertEqual(guard.cgroup_path, root / "gone")
+        guard.cgroup_path = parent / "agentbeats-8001"
+        (guard.cgroup_path / "cgroup.procs").write_text("4243\n")
+        self.assertTrue(guard.confirm_cgroup(4243))
+        self.assertEqual(guard.mechanism, "cgroup")
+
+    def test_cli_rejects_bad_memory_limit(self):
+        """Test that an invalid --memory_limit is a usage error, not a traceback."""
+        argv = ["agentbeats", "run", "card.toml", "--backend", "http://localhost:9000",
+                "--memory_limit", "lots"]
+        stderr = io.StringIO()
+        with patch.object(sys, "argv", argv), redirect_stderr(stderr), \
+                self.assertRaises(SystemExit) as exit_info:
+            cli_main()
+        self.assertEqual(exit_info.exception.code, 2)
+        self.assertIn("--memory_limit", stderr.getvalue())
+
+
+class TestBeatsAgentLauncher(unittest.TestCase):
+    """Test launcher command construction and status endpoints."""
+
+    def setUp(self):
+        _fake_cgroup_tree(self)
+
+    def test_agent_cmd(self):
+        """Test the agent command line built by the launcher."""
+        launcher = _make_launcher()
+        cmd = launcher._agent_cmd()
+
+        self.assertEqual(cmd[:2], ["agentbeats", "run_agent"])
+        self.assertIn("--tool", cmd)
+        self.assertEqual(launcher.backend_url, "http://localhost:9000")
+
+    @patch("agentbeats.agent_launcher.subprocess.Popen")
+    def test_start_agent_with_limits(self, mock_popen):
+        """Test that limits are passed to the agent process."""
+        launcher = _make_launcher(resource_limits=AgentResourceLimits(max_open_files=256))
+        launcher._start_agent()
+
+        _, kwargs = mock_popen.call_args
+        self.assertIsNotNone(kwargs.get("preexec_fn"))
+
+    @patch("agentbeats.agent_launcher.subprocess.Popen")
+    def test_start_agent_without_limits(self, mock_popen):
+        """Test that no preexec hook is installed without limits."""
+        launcher = _make_launcher()
+        launcher._start_agent()
+
+        _, kwargs = mock_popen.call_args
+        self.assertNotIn("preexec_fn", kwargs)
+
+    def test_status_and_metrics(self):
+        """Test that status and metrics report limits and memory state."""
+        launcher = _make_launcher(
+            resource_limits=AgentResourceLimits(memory_bytes=1024 ** 3)
+        )
+        proc = MagicMock()
+        proc.poll.return_value = None
+        proc.pid = 4242
+        launcher._agent_proc = proc
+        client = TestClient(launcher._build_app())
+
+        status = client.get("/status").json()
+        self.assertEqual(status["pid"], 4242)
+        self.assertEqual(status["limits"]["memory_bytes"], 1024 ** 3)
+        self.assertIn("memory", status)
+
+        metrics = client.get("/metrics").json()
+        self.assertTrue(metrics["agent_running"])
+        self.assertEqual(metrics["restart_count"], 0)
+        self.assertIn("limit_mechanism", metrics)
+
+
+if __name__ == '__main__':
+    unittest.main()
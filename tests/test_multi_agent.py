@@ -0,0 +1,116 @@
+"""
+Tests for hosting several agents in one process.
+"""
+
+import os
+import tempfile
+import textwrap
+import unittest
+
+from fastapi.testclient import TestClient
+
+import agentbeats
+from agentbeats.multi_agent import MultiAgentHost, load_manifest
+
+CARD = textwrap.dedent("""
+    name = "{name}"
+    description = "Test agent."
+    url = "http://localhost:80/{name}/"
+    version = "1.0.0"
+    defaultInputModes = ["text"]
+    defaultOutputModes = ["text"]
+    skills = []
+
+    [capabilities]
+    streaming = true
+""")
+
+TOOLS = textwrap.dedent("""
+    import agentbeats as ab
+
+    @ab.tool
+    def {name}_tool() -> str:
+        \"\"\"Tool of agent {name}.\"\"\"
+        return "{name}"
+""")
+
+
+class TestToolRegistryScope(unittest.TestCase):
+    """Test per-agent tool registries."""
+
+    def test_scope_isolates_registrations(self):
+        """Test that scoped registrations do not leak into the global registry."""
+        before = agentbeats.get_registered_tools()
+        with agentbeats.tool_registry_scope() as scoped:
+            @agentbeats.tool
+            def scoped_tool():
+                return "scoped"
+            self.assertEqual(agentbeats.get_registered_tools(), [scoped_tool])
+
+        self.assertEqual(scoped, [scoped_tool])
+        self.assertEqual(agentbeats.get_registered_tools(), before)
+
+
+class TestMultiAgentHost(unittest.TestCase):
+    """Test manifest loading and request routing."""
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.dir = self._tmp.name
+        for name in ("green", "red"):
+            with open(os.path.join(self.dir, f"{name}.toml"), "w") as f:
+                f.write(CARD.format(name=name))
+            with open(os.path.join(self.dir, f"{name}_tools.py"), "w") as f:
+                f.write(TOOLS.format(name=name))
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def _write_manifest(self, body):
+        path = os.path.join(self.dir, "manifest.toml")
+        with open(path, "w") as f:
+            f.write(textwrap.dedent(body))
+        return path
+
+    def test_manifest_requires_path_or_port(self):
+        """Test that an agent needs exactly one of path or port."""
+        path = self._write_manifest("""
+            [[agent]]
+            card = "green.toml"
+        """)
+        with self.assertRaises(ValueError):
+            load_manifest(path)
+
+    def test_path_mounted_agents(self):
+        """Test that agents get their own tools and are routed by prefix."""
+        path = self._write_manifest("""
+            port = 80
+            [[agent]]
+            card = "green.toml"
+            tools = ["green_tools.py"]
+            path = "/green"
+
+            [[agent]]
+            card = "red.toml"
+            tools = ["red_tools.py"]
+            path = "red"
+        """)
+        server, specs = load_manifest(path)
+        host = MultiAgentHost(specs, host="127.0.0.1", port=server["port"])
+        with TestClient(host.build_app()) as client:
+            self.assertEqual([len(a.tool_list) for a in host.agents], [1, 1])
+            self.assertEqual([a.tool_list[0].name for a in host.agents],
+                             ["green_tool", "red_tool"])
+
+            green = client.get("/green/.well-known/agent.json").json()
+            red = client.get("/red/.well-known/agent.json").json()
+            self.assertEqual(green["name"], "green")
+            self.assertEqual(red["name"], "red")
+            self.assertEqual(client.get("/blue/.well-known/agent.json").status_code, 404)
+
+        # lifespan shutdown closes every agent's push notification client
+        self.assertTrue(all(a._push_client.is_closed for a in host.agents))
+
+
+if __name__ == '__main__':
+    unittest.main()
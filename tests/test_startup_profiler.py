@@ -0,0 +1,46 @@
+"""
+Tests for the AgentBeats startup profiler.
+"""
+
+import unittest
+
+from agentbeats.startup_profiler import parse_importtime, _folded_stacks
+
+
+IMPORTTIME_OUTPUT = """\
+import time: self [us] | cumulative | imported package
+import time:       100 |        100 |     leaf_a
+import time:        50 |         50 |     leaf_b
+import time:       200 |        350 |   middle
+import time:        10 |        360 | top
+import time:        30 |         30 | other
+some unrelated stderr line
+""".splitlines()
+
+
+class TestImportTimeParsing(unittest.TestCase):
+    """Test parsing of `python -X importtime` output."""
+
+    def test_parse_tree(self):
+        """Test that nesting is rebuilt from indentation."""
+        roots = parse_importtime(IMPORTTIME_OUTPUT)
+
+        self.assertEqual([r.name for r in roots], ["top", "other"])
+        middle = roots[0].children[0]
+        self.assertEqual(middle.name, "middle")
+        self.assertEqual(middle.cumulative_us, 350)
+        self.assertEqual([c.name for c in middle.children], ["leaf_a", "leaf_b"])
+
+    def test_folded_stacks(self):
+        """Test collapsed-stack output for flame graphs."""
+        roots = parse_importtime(IMPORTTIME_OUTPUT)
+        phases = [{"name": "agent card", "seconds": 0.002, "error": None}]
+        lines = _folded_stacks(phases, roots)
+
+        self.assertIn("startup;agent card 2000", lines)
+        self.assertIn("imports;top;middle;leaf_a 100", lines)
+        self.assertIn("imports;other 30", lines)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,16 +2,40 @@
 Tests for the AgentBeats utils modules.
 """
 
+import io
+import os
+import time
+import asyncio
+import uuid
+import hashlib
+import tempfile
+import threading
+import subprocess
 import unittest
+from pathlib import Path
+from contextlib import redirect_stdout
 from unittest.mock import patch, MagicMock
 import json
 
+import paramiko
+
 # Import utils functions
-from agentbeats.utils.commands.ssh import SSHClient, create_ssh_connect_tool
+from agentbeats.utils.commands.ssh import AsyncSSHClient, SSHClient, create_ssh_connect_tool
+from agentbeats.utils.commands.ssh_auth import check_passwords, check_passwords_async
+from agentbeats.utils.commands.ssh_pool import SSHConnectionPool, reset_ssh_pool
+from agentbeats.utils.environment import (setup_container, cleanup_container, check_container_health,
+                                         build_cache_stats)
+from agentbeats.utils.environment.build_cache import DockerIgnore, load_build_record
+from tests.ssh_server import LocalSSHServer, ScriptedResponse
 
 
 class TestCommandsUtils(unittest.TestCase):
     """Test command execution utilities."""
+
+    def setUp(self):
+        # connections made with one test's mocks must not be reused by the next
+        reset_ssh_pool()
+        self.addCleanup(reset_ssh_pool)
     
     def test_ssh_client_creation(self):
         """Test SSH client creation."""
@@ -124,5 +148,976 @@ class TestCommandsUtils(unittest.TestCase):
             pass
 
 
+def _mock_paramiko_client(active=True):
+    client = MagicMock()
+    client.get_transport.return_value.is_active.return_value = active
+    return client
+
+
+@patch('paramiko.SSHClient')
+class TestSSHConnectionPool(unittest.TestCase):
+    """Test sharing, health checks and eviction of pooled SSH connections."""
+
+    CREDS = {"username": "user", "password": "pw", "port": "2222"}
+
+    def setUp(self):
+        self.pool = SSHConnectionPool(max_size=2, idle_timeout=60)
+
+    def test_clients_share_one_connection(self, mock_ssh_client):
+        """Test that clients for the same host and credentials share a transport."""
+        mock_ssh_client.side_effect = lambda: _mock_paramiko_client()
+        first = SSHClient("host", dict(self.CREDS), pool=self.pool)
+        second = SSHClient("host", dict(self.CREDS), pool=self.pool)
+
+        self.assertTrue(first.connect())
+        self.assertTrue(second.connect())
+
+        self.assertIs(first.client, second.client)
+        self.assertEqual(mock_ssh_client.call_count, 1)
+        first.client.connect.assert_called_once_with(
+            hostname="host", port=2222, username="user", password="pw", timeout=10)
+        first.client.get_transport.return_value.set_keepalive.assert_called_once_with(30)
+        self.assertEqual(self.pool.stats()["reuses"], 1)
+
+    def test_other_credentials_get_own_connection(self, mock_ssh_client):
+        """Test that a different password is not served the pooled connection."""
+        mock_ssh_client.side_effect = lambda: _mock_paramiko_client()
+        first = self.pool.acquire("host", self.CREDS)
+        second = self.pool.acquire("host", dict(self.CREDS, password="other"))
+        self.assertIsNot(first, second)
+        self.assertEqual(self.pool.stats()["open_connections"], 2)
+
+    def test_dead_connection_is_replaced(self, mock_ssh_client):
+        """Test that a connection failing its health check is reconnected."""
+        dead = _mock_paramiko_client()
+        mock_ssh_client.side_effect = [dead, _mock_paramiko_client()]
+        self.pool.release(self.pool.acquire("host", self.CREDS))
+        dead.get_transport.return_value.is_active.return_value = False
+
+        client = self.pool.acquire("host", self.CREDS)
+
+        self.assertIsNot(client, dead)
+        dead.close.assert_called_once()
+        self.assertEqual(self.pool.stats()["health_failures"], 1)
+
+    def test_idle_connections_are_evicted(self, mock_ssh_client):
+        """Test that connections idle past idle_timeout are closed."""
+        mock_ssh_client.side_effect = lambda: _mock_paramiko_client()
+        pool = SSHConnectionPool(idle_timeout=0)
+        idle = pool.acquire("host", self.CREDS)
+        pool.release(idle)
+
+        pool.acquire("other", self.CREDS)
+
+        idle.close.assert_called_once()
+        self.assertEqual(list(pool.stats()["connections"]), ["user@other:2222"])
+
+    def test_max_size(self, mock_ssh_client):
+        """Test that a full pool evicts idle connections and never keeps busy extras."""
+        mock_ssh_client.side_effect = lambda: _mock_paramiko_client()
+        a = self.pool.acquire("a", self.CREDS)
+        b = self.pool.acquire("b", self.CREDS)
+        extra = self.pool.acquire("c", self.CREDS)         # a and b are borrowed
+        self.assertEqual(self.pool.stats()["open_connections"], 2)
+        self.pool.release(extra)
+        extra.close.assert_called_once()
+
+        self.pool.release(a)
+        # closing the evicted connection must not block other pool users
+        a.close.side_effect = lambda: self.assertFalse(self.pool._lock.locked())
+        self.pool.acquire("d", self.CREDS)                 # evicts idle a
+        a.close.assert_called_once()
+        b.close.assert_not_called()
+
+    def test_key_locks_are_freed(self, mock_ssh_client):
+        """Test that a key's lock goes away with its last connection."""
+        mock_ssh_client.side_effect = lambda: _mock_paramiko_client()
+        pool = SSHConnectionPool(max_size=1, idle_timeout=60)
+        a = pool.acquire("a", self.CREDS)
+        self.assertEqual(len(pool._key_locks), 1)
+
+        pool.release(a)
+        b = pool.acquire("b", self.CREDS)                  # evicts idle a
+        self.assertEqual([k[0] for k in pool._key_locks], ["b"])
+
+        pool.discard(b)
+        mock_ssh_client.side_effect = OSError("Connection refused")
+        with self.assertRaises(OSError):
+            pool.acquire("c", self.CREDS)
+        self.assertEqual(pool._key_locks, {})
+
+    def test_execute_reconnects_broken_transport(self, mock_ssh_client):
+        """Test that execute retries once on a fresh connection if the channel cannot open."""
+        import paramiko
+
+        broken = _mock_paramiko_client()
+        broken.exec_command.side_effect = paramiko.SSHException("SSH session not active")
+        fresh = _mock_paramiko_client()
+        stdout = MagicMock()
+        stdout.read.return_value = b"ok"
+        stdout.channel.recv_exit_status.return_value = 0
+        fresh.exec_command.return_value = (MagicMock(), stdout, MagicMock(**{"read.return_value": b""}))
+        mock_ssh_client.side_effect = [broken, fresh]
+
+        ssh_client = SSHClient("host", dict(self.CREDS), pool=self.pool)
+        result = ssh_client.execute("id")
+
+        self.assertIn("Success:", result)
+        broken.close.assert_called_once()
+        self.assertIs(ssh_client.client, fresh)
+
+
+@patch('paramiko.SSHClient')
+class TestAsyncSSHClient(unittest.IsolatedAsyncioTestCase):
+    """Test the asyncio SSH client."""
+
+    CREDS = {"username": "user", "password": "pw"}
+
+    def _slow_client(self, delay):
+        client = _mock_paramiko_client()
+
+        def _exec(command):
+            stdout = MagicMock()
+            stdout.read.side_effect = lambda: (time.sleep(delay), command.encode())[1]
+            stdout.channel.recv_exit_status.return_value = 0
+            return MagicMock(), stdout, MagicMock(**{"read.return_value": b""})
+
+        client.exec_command.side_effect = _exec
+        return client
+
+    async def test_commands_run_concurrently(self, mock_ssh_client):
+        """Test that concurrent executes share the transport and don't block the loop."""
+        mock_ssh_client.return_value = self._slow_client(0.3)
+        pool = SSHConnectionPool()
+        async with AsyncSSHClient("host", self.CREDS, pool=pool) as ssh:
+            start = time.perf_counter()
+            results = await asyncio.gather(*(ssh.execute(f"echo {i}") for i in range(8)))
+            elapsed = time.perf_counter() - start
+
+        self.assertLess(elapsed, 1.0)
+        self.assertTrue(all(r.startswith("Success:") for r in results))
+        self.assertIn("echo 7", results[7])
+        self.assertEqual(mock_ssh_client.call_count, 1)
+        self.assertEqual(pool.stats()["connections"]["user@host:22"]["borrowers"], 0)
+
+    async def test_sftp_methods_are_awaitable(self, mock_ssh_client):
+        """Test that the SFTP session returned by open_sftp is awaitable."""
+        client = _mock_paramiko_client()
+        client.open_sftp.return_value.listdir.return_value = ["flag.txt"]
+        mock_ssh_client.return_value = client
+        ssh = AsyncSSHClient("host", self.CREDS, pool=SSHConnectionPool())
+
+        sftp = await ssh.open_sftp()
+
+        self.assertEqual(await sftp.listdir("/root"), ["flag.txt"])
+        client.open_sftp.return_value.listdir.assert_called_once_with("/root")
+
+
+class FakeChannel:
+    """Session channel replaying scripted stdout / stderr chunks."""
+
+    def __init__(self, stdout=(), stderr=(), exit_status=0, hang=False):
+        self.stdout = list(stdout)
+        self.stderr = list(stderr)
+        self.exit_status = exit_status
+        self.hang = hang
+        self.command = None
+        self.closed = False
+
+    def exec_command(self, command):
+        self.command = command
+
+    def sendall(self, data):
+        self.stdin = getattr(self, "stdin", b"") + data
+
+    def shutdown_write(self):
+        pass
+
+    def recv_ready(self):
+        return bool(self.stdout)
+
+    def recv(self, size):
+        return self.stdout.pop(0)
+
+    def recv_stderr_ready(self):
+        return bool(self.stderr)
+
+    def recv_stderr(self, size):
+        return self.stderr.pop(0)
+
+    def exit_status_ready(self):
+        return not self.hang and not self.stdout and not self.stderr
+
+    def recv_exit_status(self):
+        return self.exit_status
+
+    def close(self):
+        self.closed = True
+
+
+@patch('paramiko.SSHClient')
+class TestStreamingExecution(unittest.IsolatedAsyncioTestCase):
+    """Test streaming, size-capped command execution."""
+
+    CREDS = {"username": "user", "password": "pw"}
+
+    def _client(self, mock_ssh_client, channel):
+        client = _mock_paramiko_client()
+        client.get_transport.return_value.open_session.return_value = channel
+        mock_ssh_client.return_value = client
+        return SSHClient("host", dict(self.CREDS), pool=SSHConnectionPool())
+
+    def test_output_capped_to_head_and_tail(self, mock_ssh_client):
+        """Test that run keeps head and tail, counts all bytes and streams every chunk."""
+        chunks = [f"line {i}\n".encode() for i in range(1000)]
+        channel = FakeChannel(stdout=chunks, stderr=[b"warn\n"], exit_status=1)
+        seen = []
+
+        result = self._client(mock_ssh_client, channel).run(
+            "find / -name '*flag*'", max_output=100,
+            on_output=lambda stream, text: seen.append((stream, text)))
+
+        self.assertEqual(result.exit_status, 1)
+        self.assertFalse(result.ok)
+        self.assertTrue(result.stdout_truncated)
+        self.assertFalse(result.stderr_truncated)
+        self.assertEqual(result.stdout_bytes, sum(len(c) for c in chunks))
+        self.assertTrue(result.stdout.startswith("line 0\n"))
+        self.assertTrue(result.stdout.endswith("line 999\n"))
+        self.assertIn("bytes omitted", result.stdout)
+        self.assertLess(len(result.stdout), 200)
+        self.assertEqual(result.stderr, "warn\n")
+        self.assertEqual(len(seen), 1001)
+        self.assertTrue(result.to_text().startswith("Warning: Command: find"))
+        self.assertTrue(channel.closed)
+
+    def test_timeout_stops_command(self, mock_ssh_client):
+        """Test that a command running past the timeout is stopped."""
+        channel = FakeChannel(stdout=[b"partial"], hang=True)
+        result = self._client(mock_ssh_client, channel).run("sleep 100", timeout=0.2)
+
+        self.assertTrue(result.timed_out)
+        self.assertIsNone(result.exit_status)
+        self.assertEqual(result.stdout, "partial")
+        self.assertTrue(channel.closed)
+        self.assertGreaterEqual(result.duration, 0.2)
+
+    async def test_async_stream(self, mock_ssh_client):
+        """Test that AsyncSSHClient.stream yields chunks in order and then the result."""
+        channel = FakeChannel(stdout=[b"a", b"b"], stderr=[b"e"])
+        client = _mock_paramiko_client()
+        client.get_transport.return_value.open_session.return_value = channel
+        mock_ssh_client.return_value = client
+        ssh = AsyncSSHClient("host", dict(self.CREDS), pool=SSHConnectionPool())
+
+        async with ssh.stream("cat") as stream:
+            chunks = [(c.stream, c.text) async for c in stream]
+
+        self.assertEqual([c for c in chunks if c[0] == "stdout"], [("stdout", "a"), ("stdout", "b")])
+        self.assertIn(("stderr", "e"), chunks)
+        self.assertEqual(stream.result.exit_status, 0)
+        self.assertEqual(stream.result.stdout, "ab")
+
+    async def test_async_stream_break_stops_command(self, mock_ssh_client):
+        """Test that leaving the stream block early cancels the command and closes the channel."""
+        channel = FakeChannel(stdout=[b"line 1\n"], hang=True)
+        client = _mock_paramiko_client()
+        client.get_transport.return_value.open_session.return_value = channel
+        mock_ssh_client.return_value = client
+        ssh = AsyncSSHClient("host", dict(self.CREDS), pool=SSHConnectionPool())
+
+        async with ssh.stream("tail -f /var/log/app.log") as stream:
+            async for chunk in stream:
+                break
+
+        self.assertEqual(chunk.text, "line 1\n")
+        self.assertTrue(stream.result.cancelled)
+        self.assertIsNone(stream.result.exit_status)
+        self.assertTrue(channel.closed)
+
+        with self.assertRaises(RuntimeError):
+            async for chunk in ssh.stream("cat"):
+                pass
+
+    async def test_async_run_cancel(self, mock_ssh_client):
+        """Test that cancelling AsyncSSHClient.run closes the channel."""
+        channel = FakeChannel(hang=True)
+        client = _mock_paramiko_client()
+        client.get_transport.return_value.open_session.return_value = channel
+        mock_ssh_client.return_value = client
+        ssh = AsyncSSHClient("host", dict(self.CREDS), pool=SSHConnectionPool())
+
+        with self.assertRaises(asyncio.TimeoutError):
+            await asyncio.wait_for(ssh.run("sleep 100"), timeout=0.2)
+        for _ in range(100):
+            if channel.closed:
+                break
+            await asyncio.sleep(0.01)
+        self.assertTrue(channel.closed)
+
+
+class ScriptChannel(FakeChannel):
+    """Session channel that runs the command with the local shell once its stdin is closed."""
+
+    def shutdown_write(self):
+        proc = subprocess.run(["sh", "-c", self.command], input=self.stdin, capture_output=True)
+        # split the output at odd offsets to exercise marker parsing
+        self.stdout = [proc.stdout[i:i + 7] for i in range(0, len(proc.stdout), 7)]
+        self.stderr = [proc.stderr[i:i + 5] for i in range(0, len(proc.stderr), 5)]
+        self.exit_status = proc.returncode
+
+
+@patch('paramiko.SSHClient')
+class TestExecuteMany(unittest.TestCase):
+    """Test batched execution of several commands."""
+
+    CREDS = {"username": "user", "password": "pw"}
+    COMMANDS = ["echo hi", "ls /nonexistent-dir", "printf abc; exit 3", "cd /tmp && pwd"]
+
+    def _client(self, mock_ssh_client, channels):
+        client = _mock_paramiko_client()
+        client.get_transport.return_value.open_session.side_effect = channels
+        mock_ssh_client.return_value = client
+        return SSHClient("host", dict(self.CREDS), pool=SSHConnectionPool()), client
+
+    def test_script_mode_is_one_channel(self, mock_ssh_client):
+        """Test that script mode runs all commands on one channel and splits the results."""
+        channel = ScriptChannel()
+        ssh_client, client = self._client(mock_ssh_client, [channel])
+
+        results = ssh_client.execute_many(self.COMMANDS)
+
+        self.assertEqual(client.get_transport.return_value.open_session.call_count, 1)
+        self.assertEqual([r.command for r in results], self.COMMANDS)
+        self.assertEqual([r.exit_status for r in results], [0, 2, 3, 0])
+        self.assertEqual(results[0].stdout, "hi\n")
+        self.assertIn("nonexistent-dir", results[1].stderr)
+        self.assertEqual(results[1].stdout, "")
+        self.assertEqual(results[2].stdout, "abc")
+        self.assertEqual(results[3].stdout, "/tmp\n")
+
+    def test_script_mode_timeout(self, mock_ssh_client):
+        """Test that commands cut off by the batch timeout have no exit status."""
+        channel = FakeChannel(hang=True)
+        ssh_client, _ = self._client(mock_ssh_client, [channel])
+
+        results = ssh_client.execute_many(["true", "sleep 100"], timeout=0.1)
+
+        self.assertTrue(all(r.timed_out and r.exit_status is None for r in results))
+        self.assertTrue(channel.closed)
+
+    def test_parallel_mode(self, mock_ssh_client):
+        """Test that parallel mode opens one channel per command on the same transport."""
+        channels = [FakeChannel(stdout=[f"out {i}".encode()], exit_status=i) for i in range(3)]
+        ssh_client, client = self._client(mock_ssh_client, channels)
+
+        results = ssh_client.execute_many(["a", "b", "c"], mode="parallel")
+
+        self.assertEqual(client.get_transport.return_value.open_session.call_count, 3)
+        self.assertEqual(sorted(r.exit_status for r in results), [0, 1, 2])
+        self.assertEqual([r.command for r in results], ["a", "b", "c"])
+        self.assertTrue(all(c.closed for c in channels))
+
+    def test_unknown_mode(self, mock_ssh_client):
+        """Test that an unknown mode is rejected."""
+        ssh_client, _ = self._client(mock_ssh_client, [])
+        with self.assertRaises(ValueError):
+            ssh_client.execute_many(["true"], mode="serial")
+
+
+class ShellChannel:
+    """Session channel backed by a local shell process reading commands from stdin."""
+
+    def __init__(self):
+        self.closed = False
+        self.proc = None
+        self.stdout, self.stderr = [], []
+        self.readers = []
+
+    def exec_command(self, command):
+        self.proc = subprocess.Popen(["sh", "-c", command], stdin=subprocess.PIPE,
+                                     stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        for pipe, chunks in ((self.proc.stdout, self.stdout), (self.proc.stderr, self.stderr)):
+            reader = threading.Thread(target=self._read, args=(pipe, chunks), daemon=True)
+            reader.start()
+            self.readers.append(reader)
+
+    @staticmethod
+    def _read(pipe, chunks):
+        # small reads, to exercise marker parsing across chunks
+        while True:
+            data = os.read(pipe.fileno(), 7)
+            if not data:
+                return
+            chunks.append(data)
+
+    def sendall(self, data):
+        self.proc.stdin.write(data)
+        self.proc.stdin.flush()
+
+    def recv_ready(self):
+        return bool(self.stdout)
+
+    def recv(self, size):
+        return self.stdout.pop(0)
+
+    def recv_stderr_ready(self):
+        return bool(self.stderr)
+
+    def recv_stderr(self, size):
+        return self.stderr.pop(0)
+
+    def exit_status_ready(self):
+        return self.proc.poll() is not None and not any(r.is_alive() for r in self.readers)
+
+    def recv_exit_status(self):
+        return self.proc.wait()
+
+    def close(self):
+        self.closed = True
+        if self.proc.poll() is None:
+            self.proc.kill()
+        self.proc.wait()
+        self.proc.stdin.close()
+
+
+@patch('paramiko.SSHClient')
+class TestPersistentShell(unittest.TestCase):
+    """Test command execution in a persistent shell."""
+
+    CREDS = {"username": "user", "password": "pw"}
+
+    def _client(self, mock_ssh_client, count=1):
+        channels = [ShellChannel() for _ in range(count)]
+        client = _mock_paramiko_client()
+        client.get_transport.return_value.open_session.side_effect = channels
+        mock_ssh_client.return_value = client
+        ssh_client = SSHClient("host", dict(self.CREDS), pool=SSHConnectionPool(),
+                               persistent_shell=True)
+        self.addCleanup(ssh_client.disconnect)
+        return ssh_client, channels
+
+    def test_state_persists_on_one_channel(self, mock_ssh_client):
+        """Test that directory and environment persist and only one channel is opened."""
+        ssh_client, channels = self._client(mock_ssh_client)
+
+        self.assertEqual(ssh_client.run_in_shell("cd /tmp").exit_status, 0)
+        self.assertEqual(ssh_client.run_in_shell("export X=5").exit_status, 0)
+        result = ssh_client.run_in_shell("echo $X; pwd")
+
+        self.assertEqual(result.stdout, "5\n/tmp\n")
+        self.assertEqual(result.stderr, "")
+        self.assertFalse(channels[0].closed)
+
+    def test_errors_keep_shell_open(self, mock_ssh_client):
+        """Test that failing commands and syntax errors report a status without closing the shell."""
+        ssh_client, channels = self._client(mock_ssh_client)
+
+        failed = ssh_client.run_in_shell("ls /nonexistent-dir")
+        syntax = ssh_client.run_in_shell('echo "unterminated')
+        after = ssh_client.run_in_shell("printf abc")
+
+        self.assertEqual(failed.exit_status, 2)
+        self.assertIn("nonexistent-dir", failed.stderr)
+        self.assertNotEqual(syntax.exit_status, 0)
+        self.assertEqual((after.exit_status, after.stdout), (0, "abc"))
+        self.assertFalse(channels[0].closed)
+
+    def test_exit_and_timeout_reopen_shell(self, mock_ssh_client):
+        """Test that exiting or timing out closes the shell and the next command opens a new one."""
+        ssh_client, channels = self._client(mock_ssh_client, count=3)
+
+        exited = ssh_client.run_in_shell("echo bye; exit 3")
+        timed_out = ssh_client.run_in_shell("sleep 5", timeout=0.2)
+        after = ssh_client.run_in_shell("echo ok")
+
+        self.assertEqual((exited.exit_status, exited.stdout), (3, "bye\n"))
+        self.assertTrue(timed_out.timed_out)
+        self.assertIsNone(timed_out.exit_status)
+        self.assertTrue(channels[0].closed and channels[1].closed)
+        self.assertEqual(after.stdout, "ok\n")
+
+    def test_execute_uses_shell(self, mock_ssh_client):
+        """Test that execute() goes through the shell and keeps its report format."""
+        ssh_client, _ = self._client(mock_ssh_client)
+
+        ssh_client.execute("cd /tmp")
+        result = ssh_client.execute("pwd")
+
+        self.assertEqual(result, "Success: Command: pwd\nExit Status: 0\nOutput:\n/tmp\n")
+
+
+class FakeSFTP:
+    """In-memory SFTP session."""
+
+    def __init__(self):
+        self.files = {}
+        self.modes = {}
+        self.puts = 0
+        self.channel = MagicMock(closed=False)
+
+    def get_channel(self):
+        return self.channel
+
+    def putfo(self, fl, remotepath, file_size=0, callback=None, confirm=True):
+        self.files[remotepath] = fl.read()
+        self.puts += 1
+
+    def getfo(self, remotepath, fl, callback=None):
+        fl.write(self.files[remotepath])
+        return len(self.files[remotepath])
+
+    def stat(self, path):
+        return MagicMock(st_mode=0o100000 | self.modes.get(path, 0o644))
+
+    def chmod(self, path, mode):
+        self.modes[path] = mode
+
+    def close(self):
+        self.channel.closed = True
+
+
+@patch('paramiko.SFTPClient.from_transport')
+@patch('paramiko.SSHClient')
+class TestSFTPTransfers(unittest.TestCase):
+    """Test SFTP upload and download helpers."""
+
+    CREDS = {"username": "user", "password": "pw"}
+    PATH = "/tmp/custom_service.py"
+
+    def _client(self, mock_ssh_client, mock_from_transport):
+        sftp = FakeSFTP()
+        mock_from_transport.return_value = sftp
+
+        def _sha256sum_channel():
+            # the remote `sha256sum` answers from the fake SFTP files
+            data = sftp.files.get(self.PATH)
+            if data is None:
+                return FakeChannel(stderr=[b"No such file or directory\n"], exit_status=1)
+            digest = hashlib.sha256(data).hexdigest()
+            return FakeChannel(stdout=[f"{digest}  {self.PATH}\n".encode()])
+
+        client = _mock_paramiko_client()
+        client.get_transport.return_value.open_session.side_effect = _sha256sum_channel
+        mock_ssh_client.return_value = client
+        return SSHClient("host", dict(self.CREDS), pool=SSHConnectionPool()), sftp
+
+    def test_unchanged_upload_is_skipped(self, mock_ssh_client, mock_from_transport):
+        """Test that identical content is sent once and the SFTP session is reused."""
+        ssh_client, sftp = self._client(mock_ssh_client, mock_from_transport)
+
+        self.assertTrue(ssh_client.upload_bytes("print('hi')\n", self.PATH, mode=0o755))
+        self.assertFalse(ssh_client.upload_bytes("print('hi')\n", self.PATH, mode=0o755))
+
+        self.assertEqual(sftp.puts, 1)
+        self.assertEqual(sftp.files[self.PATH], b"print('hi')\n")
+        self.assertEqual(sftp.modes[self.PATH], 0o755)
+        self.assertEqual(mock_from_transport.call_count, 1)
+
+    def test_changed_or_forced_upload(self, mock_ssh_client, mock_from_transport):
+        """Test that changed content, or skip_unchanged=False, is uploaded again."""
+        ssh_client, sftp = self._client(mock_ssh_client, mock_from_transport)
+
+        ssh_client.upload_bytes(b"v1", self.PATH)
+        self.assertTrue(ssh_client.upload_bytes(b"v2", self.PATH))
+        self.assertTrue(ssh_client.upload_bytes(b"v2", self.PATH, skip_unchanged=False))
+
+        self.assertEqual(sftp.puts, 3)
+        self.assertEqual(sftp.files[self.PATH], b"v2")
+
+    def test_file_round_trip(self, mock_ssh_client, mock_from_transport):
+        """Test uploading a local file and downloading it back."""
+        ssh_client, _ = self._client(mock_ssh_client, mock_from_transport)
+        with tempfile.TemporaryDirectory() as tmp:
+            source = os.path.join(tmp, "service.py")
+            with open(source, "wb") as f:
+                f.write(b"x" * 100000)
+
+            self.assertTrue(ssh_client.upload(source, self.PATH))
+            self.assertFalse(ssh_client.upload(source, self.PATH))
+            target = os.path.join(tmp, "copy.py")
+            self.assertEqual(ssh_client.download(self.PATH, target), 100000)
+            with open(target, "rb") as f:
+                self.assertEqual(f.read(), b"x" * 100000)
+        self.assertEqual(ssh_client.download_bytes(self.PATH), b"x" * 100000)
+
+
+class FakeAuthTransport:
+    """Transport accepting one password and dropping the connection after max_tries failures."""
+
+    def __init__(self, sock, password="s3cret", max_tries=3):
+        self.password = password
+        self.max_tries = max_tries
+        self.failures = 0
+        self.active = True
+
+    def start_client(self, timeout=None):
+        pass
+
+    def is_active(self):
+        return self.active
+
+    def auth_password(self, username, password):
+        if not self.active or self.failures >= self.max_tries:
+            self.active = False
+            raise paramiko.SSHException("No existing session")
+        if password == self.password:
+            return []
+        self.failures += 1
+        raise paramiko.AuthenticationException("Authentication failed.")
+
+    def close(self):
+        self.active = False
+
+
+@patch('socket.create_connection')
+@patch('paramiko.Transport', side_effect=FakeAuthTransport)
+class TestPasswordChecks(unittest.TestCase):
+    """Test concurrent password checks."""
+
+    def test_finds_password_and_reuses_connections(self, mock_transport, mock_connect):
+        """Test that several attempts share a connection and the right password is found."""
+        passwords = [f"wrong{i}" for i in range(7)] + ["s3cret"]
+
+        result = check_passwords("arena", "root", passwords, workers=1)
+
+        self.assertEqual(result.password, "s3cret")
+        self.assertEqual(result.attempts, 8)
+        self.assertEqual(result.outcomes["wrong0"], "failed")
+        self.assertEqual(result.outcomes["s3cret"], "success")
+        # 3 failures per connection, then a reconnect
+        self.assertEqual(result.connections, 3)
+        self.assertGreater(result.attempts_per_second, 0)
+
+    def test_stops_at_first_success(self, mock_transport, mock_connect):
+        """Test that the remaining candidates are not tried after a success."""
+        passwords = ["s3cret"] + [f"wrong{i}" for i in range(20)]
+
+        result = check_passwords("arena", "root", passwords, workers=2)
+
+        self.assertEqual(result.password, "s3cret")
+        self.assertLessEqual(result.attempts, 3)
+        self.assertIn("not tried", result.outcomes.values())
+
+    def test_connection_errors_are_reported(self, mock_transport, mock_connect):
+        """Test that an unreachable host yields per-password errors and no password."""
+        mock_connect.side_effect = OSError("Connection refused")
+
+        result = check_passwords("arena", "root", ["a", "b"], workers=2)
+
+        self.assertIsNone(result.password)
+        self.assertTrue(all(o.startswith("error: ") for o in result.outcomes.values()))
+
+    def test_async_variant(self, mock_transport, mock_connect):
+        """Test that check_passwords_async returns the same result."""
+        result = asyncio.run(check_passwords_async("arena", "root", ["x", "s3cret"], workers=2))
+        self.assertEqual(result.password, "s3cret")
+
+
+class TestLocalSSHServer(unittest.TestCase):
+    """Test the SSH helpers end to end against the in-process SSH server."""
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.root = tmp.name
+        self.server = LocalSSHServer(
+            self.root,
+            credentials={"root": "toor"},
+            responses={"whoami": "root\n",
+                       "false": ScriptedResponse(stderr="nope\n", exit_status=1)},
+            local_shell=True,
+            max_auth_tries=3,
+        ).start()
+        self.addCleanup(self.server.stop)
+        self.pool = SSHConnectionPool()
+        self.addCleanup(self.pool.close_all)
+
+    def _client(self, **kwargs):
+        return SSHClient(self.server.host, self.server.client_credentials(), pool=self.pool, **kwargs)
+
+    def test_scripted_and_local_commands(self):
+        """Test scripted responses, local shell commands and a rejected password."""
+        ssh_client = self._client()
+
+        self.assertEqual(ssh_client.execute("whoami"),
+                         "Success: Command: whoami\nExit Status: 0\nOutput:\nroot\n")
+        self.assertEqual(ssh_client.run("false").stderr, "nope\n")
+        self.assertEqual(ssh_client.run("echo $((6 * 7))").stdout, "42\n")
+        self.assertEqual(self.server.commands, ["whoami", "false", "echo $((6 * 7))"])
+
+        bad = SSHClient(self.server.host, {"username": "root", "password": "wrong",
+                                           "port": self.server.port}, pool=self.pool)
+        with redirect_stdout(io.StringIO()):
+            self.assertFalse(bad.connect())
+
+    def test_batches_shell_and_timeouts(self):
+        """Test execute_many, the persistent shell and a timed out command over real SSH."""
+        ssh_client = self._client(persistent_shell=True)
+
+        results = ssh_client.execute_many(["echo a", "echo b >&2; exit 4"])
+        self.assertEqual([(r.exit_status, r.stdout, r.stderr) for r in results],
+                         [(0, "a\n", ""), (4, "", "b\n")])
+        ssh_client.execute("cd /tmp")
+        self.assertEqual(ssh_client.run_in_shell("pwd").stdout, "/tmp\n")
+        result = ssh_client.run("sleep 5", timeout=0.2)
+        self.assertTrue(result.timed_out)
+
+    def test_batch_survives_pkill(self):
+        """Test that `pkill -f` in a batch cannot match the batch shell itself."""
+        ssh_client = self._client()
+        token = uuid.uuid4().hex
+        # the pattern matches the text of the third command, but not pkill itself
+        results = ssh_client.execute_many(
+            ["echo one", f"pkill -f 'echo {token[:-1]}[{token[-1]}]'; true", f"echo {token}"])
+        self.assertEqual([(r.exit_status, r.stdout) for r in results],
+                         [(0, "one\n"), (0, ""), (0, token + "\n")])
+
+        # a batch shell that dies leaves the remaining commands failed, not pending
+        results = ssh_client.execute_many(["echo one", "kill -9 $$", "echo three"])
+        self.assertEqual(results[0].exit_status, 0)
+        self.assertEqual([r.error for r in results[1:]],
+                         ["batch script ended during this command", "batch script ended before this command"])
+        self.assertFalse(results[2].timed_out or results[2].cancelled)
+        self.assertIn("Exit Status: failed (batch script ended before this command)",
+                      results[2].to_text())
+
+    def test_sftp_transfers(self):
+        """Test uploads (skipped when unchanged) and downloads over SFTP."""
+        ssh_client = self._client()
+        path = "service.py"     # relative to sftp_root, also the shell's working directory
+
+        self.assertTrue(ssh_client.upload_bytes("print('hi')\n" * 5000, path, mode=0o755))
+        self.assertFalse(ssh_client.upload_bytes("print('hi')\n" * 5000, path, mode=0o755))
+        self.assertEqual(os.stat(os.path.join(self.root, path)).st_mode & 0o777, 0o755)
+        self.assertEqual(ssh_client.download_bytes(path), b"print('hi')\n" * 5000)
+        # SFTP paths cannot leave sftp_root
+        self.assertEqual(ssh_client.download_bytes("../" + path), b"print('hi')\n" * 5000)
+
+    def test_password_checks(self):
+        """Test that check_passwords finds the password, reconnecting after max_auth_tries."""
+        passwords = [f"wrong{i}" for i in range(5)] + ["toor"]
+
+        result = check_passwords(self.server.host, "root", passwords, port=self.server.port,
+                                 workers=1)
+
+        self.assertEqual(result.password, "toor")
+        self.assertEqual(result.attempts, 6)
+        self.assertEqual(result.connections, 2)
+
+    def test_latency(self):
+        """Test that latency is added to every round trip."""
+        self.server.latency = 0.05
+        ssh_client = self._client()
+        ssh_client.connect()
+
+        start = time.monotonic()
+        ssh_client.run("whoami")
+
+        self.assertGreaterEqual(time.monotonic() - start, 0.1)
+
+
+FAKE_COMPOSE = """#!/bin/sh
+echo "$@" >> calls.log
+case "$*" in
+  *images*)
+    echo 'WARN[0000] compose.yml: the attribute `version` is obsolete' >&2
+    echo "${COMPOSE_IMAGE:-sha256:4f1c2b8e9a7d}" ;;
+  *up*)
+    echo "Building arena"
+    echo "step 1/2" >&2
+    trap 'kill $!; exit 143' TERM
+    sleep "${COMPOSE_SLEEP:-0}" &
+    wait $!
+    echo "Started"
+    exit "${COMPOSE_STATUS:-0}" ;;
+esac
+"""
+
+FAKE_DOCKER = """#!/bin/sh
+if [ "$1" = image ]; then
+  exit "${IMAGE_MISSING:-0}"
+fi
+echo "WARNING: Up to 3 newer CLI versions are available" >&2
+echo "${CONTAINER_STATUS-Up 3 minutes (healthy)}"
+"""
+
+
+class TestDockerEnvironment(unittest.IsolatedAsyncioTestCase):
+    """Test the asyncio docker / docker-compose helpers with fake binaries."""
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.bin_dir = os.path.join(tmp.name, "bin")
+        self.arena = os.path.join(tmp.name, "arena")
+        os.makedirs(self.bin_dir)
+        os.makedirs(self.arena)
+        for name, script in (("docker-compose", FAKE_COMPOSE), ("docker", FAKE_DOCKER)):
+            path = os.path.join(self.bin_dir, name)
+            with open(path, "w") as f:
+                f.write(script)
+            os.chmod(path, 0o755)
+        with open(os.path.join(self.arena, "Dockerfile"), "w") as f:
+            f.write("FROM alpine\n")
+        with open(os.path.join(self.arena, ".dockerignore"), "w") as f:
+            f.write("calls.log\nlogs/\n")
+        env = patch.dict(os.environ, {"PATH": self.bin_dir + os.pathsep + os.environ["PATH"],
+                                      "AGENTBEATS_CACHE_DIR": os.path.join(tmp.name, "cache")})
+        env.start()
+        self.addCleanup(env.stop)
+        os.environ.pop("AGENTBEATS_DISABLE_CACHE", None)
+
+    def _calls(self):
+        with open(os.path.join(self.arena, "calls.log")) as f:
+            return f.read().splitlines()
+
+    async def _setup(self, **config):
+        """Run setup_container on the test arena; returns (ok, the `up` command used)."""
+        open(os.path.join(self.arena, "calls.log"), "w").close()
+        with redirect_stdout(io.StringIO()):
+            ok = await setup_container({"docker_dir": self.arena, **config})
+        ups = [call for call in self._calls() if call.startswith("up")]
+        return ok, ups[-1]
+
+    async def test_logs_streamed_line_by_line(self):
+        """Test that setup streams every output line and keeps the event loop free."""
+        os.environ["COMPOSE_SLEEP"] = "0.3"
+        lines, ticks = [], []
+
+        async def _ticker():
+            while True:
+                ticks.append(time.monotonic())
+                await asyncio.sleep(0.02)
+
+        ticker = asyncio.create_task(_ticker())
+        with redirect_stdout(io.StringIO()):
+            ok = await setup_container({"docker_dir": self.arena, "compose_file": "compose.yml",
+                                        "build_args": {"ROOT_PASSWORD": "pw"}},
+                                       on_log=lines.append)
+        ticker.cancel()
+
+        self.assertTrue(ok)
+        # stdout and stderr are read separately, so only their own order is kept
+        self.assertEqual(sorted(lines), ["Building arena", "Started", "step 1/2"])
+        self.assertEqual(lines[-1], "Started")
+        self.assertEqual(self._calls(), ["-f compose.yml down", "-f compose.yml up -d --build",
+                                         "-f compose.yml images -q"])
+        self.assertGreater(len(ticks), 5)
+
+    async def test_failure_and_async_callback(self):
+        """Test that a failing build returns False and async callbacks are awaited."""
+        os.environ["COMPOSE_STATUS"] = "1"
+        lines = []
+
+        async def _on_log(line):
+            lines.append(line)
+
+        output = io.StringIO()
+        with redirect_stdout(output):
+            ok = await setup_container({"docker_dir": self.arena}, on_log=_on_log)
+
+        self.assertFalse(ok)
+        self.assertIn("Started", lines)
+        self.assertIn("Failed to start Docker environment: ", output.getvalue())
+        self.assertIn("step 1/2", output.getvalue())
+
+    async def test_cancel_stops_build(self):
+        """Test that cancelling setup terminates docker-compose."""
+        os.environ["COMPOSE_SLEEP"] = "30"
+        lines = []
+        with redirect_stdout(io.StringIO()):
+            task = asyncio.create_task(setup_container({"docker_dir": self.arena},
+                                                       on_log=lines.append))
+            while "step 1/2" not in lines:
+                await asyncio.sleep(0.01)
+            start = time.monotonic()
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+
+        self.assertLess(time.monotonic() - start, 5)
+        self.assertNotIn("Started", lines)
+
+    async def test_cleanup_and_health(self):
+        """Test cleanup_container and check_container_health."""
+        with redirect_stdout(io.StringIO()):
+            self.assertTrue(await cleanup_container("ctf", self.arena))
+        self.assertEqual(self._calls(), ["down --volumes --remove-orphans"])
+        self.assertTrue(await check_container_health("ctf-password-brute-force"))
+
+        # the warning on stderr is not taken for the status
+        os.environ["CONTAINER_STATUS"] = ""
+        self.assertFalse(await check_container_health("ctf-password-brute-force"))
+
+    async def test_build_cache_skips_unchanged_arena(self):
+        """Test that an unchanged arena is started from its cached images."""
+        before = build_cache_stats()
+        self.assertEqual(await self._setup(), (True, "up -d --build"))
+        self.assertEqual(await self._setup(), (True, "up -d --no-build"))
+
+        # files excluded by .dockerignore don't invalidate the cache
+        os.makedirs(os.path.join(self.arena, "logs"))
+        with open(os.path.join(self.arena, "logs", "auth.log"), "w") as f:
+            f.write("runtime output\n")
+        self.assertEqual(await self._setup(), (True, "up -d --no-build"))
+
+        with open(os.path.join(self.arena, "Dockerfile"), "a") as f:
+            f.write("RUN true\n")
+        self.assertEqual(await self._setup(), (True, "up -d --build"))
+        self.assertEqual(await self._setup(), (True, "up -d --no-build"))
+
+        stats = build_cache_stats()
+        self.assertEqual(stats["hits"] - before["hits"], 3)
+        self.assertEqual(stats["misses"] - before["misses"], 2)
+        self.assertGreaterEqual(stats["time_saved"], before["time_saved"])
+
+    async def test_build_cache_invalidation(self):
+        """Test that build args, missing or replaced images and disabling the cache force a build."""
+        await self._setup(build_args={"ROOT_PASSWORD": "a"})
+        self.assertEqual(await self._setup(build_args={"ROOT_PASSWORD": "b"}),
+                         (True, "up -d --build"))
+
+        os.environ["IMAGE_MISSING"] = "1"
+        self.assertEqual(await self._setup(build_args={"ROOT_PASSWORD": "b"}),
+                         (True, "up -d --build"))
+        del os.environ["IMAGE_MISSING"]
+
+        # the tag now points to an image built outside setup_container
+        os.environ["COMPOSE_IMAGE"] = "sha256:9d0e3a6b5c21"
+        ok, _ = await self._setup(build_args={"ROOT_PASSWORD": "b"})
+        self.assertTrue(ok)
+        self.assertEqual([c for c in self._calls() if c.startswith("up")],
+                         ["up -d --no-build", "up -d --build"])
+
+        os.environ["AGENTBEATS_DISABLE_CACHE"] = "1"
+        self.assertEqual(await self._setup(build_args={"ROOT_PASSWORD": "b"}),
+                         (True, "up -d --build"))
+        self.assertNotIn("images -q", self._calls())
+        self.assertEqual(await self._setup(build_args={"ROOT_PASSWORD": "b"}, build_cache=False),
+                         (True, "up -d --build"))
+
+    async def test_build_record_holds_image_ids_only(self):
+        """Test that compose warnings are not recorded as images and build args reach `images`."""
+        # a build arg the compose file would interpolate into the image
+        build_args = {"COMPOSE_IMAGE": "sha256:77aa55cc33ee"}
+        ok, _ = await self._setup(build_args=build_args)
+        self.assertTrue(ok)
+        self.assertEqual(load_build_record(Path(self.arena))["images"], ["sha256:77aa55cc33ee"])
+        self.assertEqual(await self._setup(build_args=build_args), (True, "up -d --no-build"))
+
+    def test_dockerignore_rules(self):
+        """Test .dockerignore matching: root-relative globs, ** and ! exceptions."""
+        with open(os.path.join(self.arena, ".dockerignore"), "w") as f:
+            f.write("# comment\n*.md\n**/*.pyc\nlogs/\n!logs/keep.txt\n")
+        ignore = DockerIgnore(Path(self.arena))
+        self.assertTrue(ignore.ignored("README.md"))
+        self.assertFalse(ignore.ignored("docs/guide.md"))
+        self.assertTrue(ignore.ignored("pkg/sub/mod.pyc"))
+        self.assertTrue(ignore.ignored("logs/auth.log"))
+        self.assertFalse(ignore.ignored("logs/keep.txt"))
+        self.assertFalse(ignore.ignored("Dockerfile"))
+
+
 if __name__ == '__main__':
     unittest.main() 
\ No newline at end of file